@@ -0,0 +1,306 @@
+'''A two tier cache backend. A small in-process LRU sits in front of a shared
+store (by default the file based cache), so popular pages are served without
+touching the disk.
+
+Entries in the shared store soft expire: they are kept for STALE_PERIOD
+seconds after their timeout. The first request to find an expired entry is
+told it is a miss and re-renders the page, while other requests for the
+same key keep getting the stale copy until the new one is set. That
+request is picked with add on the shared store, so the shared backend's add
+must be atomic, like memcached's or FileCache's. Django's file based
+cache checks for the key and then writes it, so two processes can both
+win.
+
+Copies in the in-process tier are kept for at most LOCAL_TIMEOUT seconds,
+which bounds how long a change made in one worker can go unnoticed by the
+others. get_many_shared reads past the in-process tier for keys that can't
+wait that long.
+
+Example settings:
+
+CACHES = {
+    'default': {
+        'BACKEND': 'clearcache.backends.TieredCache',
+        'LOCATION': '/var/tmp/django_cache',
+        'KEY_PREFIX': 'gu',
+        'OPTIONS': {
+            'SHARED_BACKEND': 'clearcache.backends.FileCache',
+            'LOCAL_MAX_ENTRIES': 500,
+            'LOCAL_TIMEOUT': 10,
+            'STALE_PERIOD': 60,
+        }
+    }
+}
+'''
+
+import os
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.utils.module_loading import import_string
+
+REFRESH_KEY_SUFFIX = ":refresh"
+ADD_KEY_SUFFIX = ":add"
+LOCK_FILE_SUFFIX = ".lock"
+
+# Counters are per process. They are shown on the clear cache page.
+STAT_NAMES = ["local_hits", "shared_hits", "stale_hits", "misses", "sets"]
+
+# Django creates a cache object per thread, so the in-process tier and the
+# counters are kept here, keyed by location, to be shared by the threads.
+_locals = {}
+_locks = {}
+_stats = {}
+
+
+def raw_key(key, key_prefix, version):
+    '''The tiered cache has already made the key by the time it reaches the
+    shared store.
+    '''
+    return key
+
+
+class FileCache(FileBasedCache):
+    '''The file based cache lists the whole cache directory on every set to
+    decide whether to cull. This only checks every CULL_INTERVAL seconds.
+
+    add is made atomic by holding a lock file, created with O_EXCL, while
+    it checks for the key and writes it. A lock file older than
+    LOCK_TIMEOUT seconds was left by a process that died holding it.
+    '''
+
+    def __init__(self, dir, params):
+        options = dict(params.get('OPTIONS', {}))
+        self._cull_interval = int(options.pop('CULL_INTERVAL', 60))
+        self._lock_timeout = int(options.pop('LOCK_TIMEOUT', 10))
+        params = dict(params)
+        params['OPTIONS'] = options
+        super().__init__(dir, params)
+        self._next_cull = 0
+
+    def _cull(self):
+        now = time.time()
+        if now < self._next_cull:
+            return
+        self._next_cull = now + self._cull_interval
+        super()._cull()
+
+    def _lock(self, path):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            pass
+        try:
+            if os.path.getmtime(path) > time.time() - self._lock_timeout:
+                return False
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        path = self._key_to_file(key, version) + LOCK_FILE_SUFFIX
+        # Another process is adding the key
+        if not self._lock(path):
+            return False
+        try:
+            return super().add(key, value, timeout, version)
+        finally:
+            os.remove(path)
+
+
+class TieredCache(BaseCache):
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self._local_max_entries = int(options.pop('LOCAL_MAX_ENTRIES', 500))
+        self._local_timeout = int(options.pop('LOCAL_TIMEOUT', 10))
+        self._stale_period = int(options.pop('STALE_PERIOD', 60))
+        self._refresh_timeout = int(options.pop('REFRESH_TIMEOUT', 30))
+        shared_backend = options.pop('SHARED_BACKEND',
+                                     'clearcache.backends.FileCache')
+        params = dict(params)
+        params['OPTIONS'] = options
+        super().__init__(params)
+        shared_params = dict(params)
+        shared_params['KEY_PREFIX'] = ''
+        shared_params['KEY_FUNCTION'] = raw_key
+        # Expiry is decided here, so the shared store keeps entries until
+        # they have also been stale for STALE_PERIOD.
+        shared_params['TIMEOUT'] = None
+        self._shared = import_string(shared_backend)(location, shared_params)
+        self._local = _locals.setdefault(location, OrderedDict())
+        self._lock = _locks.setdefault(location, Lock())
+        self.stats = _stats.setdefault(location,
+                                       dict.fromkeys(STAT_NAMES, 0))
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] = self.stats[name] + 1
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+    # The in-process tier
+
+    def _get_local(self, key):
+        with self._lock:
+            try:
+                pickled, expiry, local_expiry = self._local[key]
+            except KeyError:
+                return None
+            if local_expiry <= time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+        return pickle.loads(pickled), expiry
+
+    def _set_local(self, key, value, expiry):
+        local_expiry = time.time() + self._local_timeout
+        if expiry is not None:
+            local_expiry = min(local_expiry, expiry)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (pickled, expiry, local_expiry)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _delete_local(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    # The shared tier
+
+    def _get_shared_timeout(self, expiry):
+        if expiry is None:
+            return None
+        return max(expiry - time.time(), 0) + self._stale_period
+
+    def _get_shared(self, key):
+        entry = self._shared.get(key)
+        # Ignore entries written by a plain backend before switching over
+        if not isinstance(entry, tuple) or len(entry) != 2:
+            return None
+        return entry
+
+    def _get_entry(self, key):
+        entry = self._get_local(key)
+        if entry is not None:
+            self._count("local_hits")
+            return entry
+        entry = self._get_shared(key)
+        if entry is None:
+            return None
+        expiry, value = entry
+        self._count("shared_hits")
+        if expiry is None or expiry > time.time():
+            self._set_local(key, value, expiry)
+        return value, expiry
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self._get_entry(key)
+        if entry is None:
+            self._count("misses")
+            return default
+        value, expiry = entry
+        if expiry is not None and expiry <= time.time():
+            # Only the request that wins the refresh lock sees a miss
+            if self._shared.add(key + REFRESH_KEY_SUFFIX, True,
+                                self._refresh_timeout):
+                self._count("misses")
+                return default
+            self._count("stale_hits")
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._count("sets")
+        expiry = self.get_backend_timeout(timeout)
+        if expiry is not None and expiry <= time.time():
+            self._delete(key)
+            return
+        self._set_local(key, value, expiry)
+        self._shared.set(key, (expiry, value),
+                         self._get_shared_timeout(expiry))
+        self._shared.delete(key + REFRESH_KEY_SUFFIX)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expiry = self.get_backend_timeout(timeout)
+        if expiry is not None and expiry <= time.time():
+            return False
+        # Stale entries are still in the shared store, so its add can't
+        # be used directly. It guards the check and set instead.
+        if not self._shared.add(key + ADD_KEY_SUFFIX, True,
+                                self._refresh_timeout):
+            return False
+        try:
+            entry = self._get_shared(key)
+            if entry is not None and (entry[0] is None or
+                                      entry[0] > time.time()):
+                return False
+            self._set_local(key, value, expiry)
+            self._shared.set(key, (expiry, value),
+                             self._get_shared_timeout(expiry))
+            return True
+        finally:
+            self._shared.delete(key + ADD_KEY_SUFFIX)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        entry = self._get_shared(key)
+        if entry is None:
+            return False
+        expiry = self.get_backend_timeout(timeout)
+        self._delete_local(key)
+        self._shared.set(key, (expiry, entry[1]),
+                         self._get_shared_timeout(expiry))
+        return True
+
+    def _delete(self, key):
+        self._delete_local(key)
+        self._shared.delete(key)
+        self._shared.delete(key + REFRESH_KEY_SUFFIX)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self._get_entry(key)
+        return entry is not None and (entry[1] is None or
+                                      entry[1] > time.time())
+
+    def get_many_shared(self, keys, version=None):
+        '''Reads the keys from the shared store only.'''
+        values = {}
+        now = time.time()
+        for key in keys:
+            entry = self._get_shared(self.make_key(key, version=version))
+            if entry is not None and (entry[0] is None or entry[0] > now):
+                values[key] = entry[1]
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self._shared.clear()
@@ -3,3 +3,14 @@ from django import forms
 class ClearCacheForm(forms.Form):
     keys = forms.CharField(label='Cache keys if any', max_length=100,
                                 required=False)
+
+
+class PurgeArticleForm(forms.Form):
+    article = forms.CharField(label='Article slug or URL', max_length=400)
+
+    def clean_article(self):
+        slug = self.cleaned_data['article'].strip().rstrip('/')
+        slug = slug.rpartition('/')[2]
+        if not slug:
+            raise forms.ValidationError("Enter an article slug or URL.")
+        return slug
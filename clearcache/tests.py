@@ -1,3 +1,260 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
 
-# Create your tests here.
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.utils.cache import get_cache_key
+from django.utils import timezone
+from newsroom.models import Article, Category, Topic
+
+from .backends import LOCK_FILE_SUFFIX, FileCache, TieredCache
+from .utils import DEPENDENCY_KEY_PREFIX, LATEST, STAMP_KEY_PREFIX, \
+    add_dependencies, is_purged
+
+
+class DependencyTest(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name="News", slug="news")
+        self.topic = Topic.objects.create(name="Water", slug="water")
+        self.article = Article.objects.create(title="Test dependencies",
+                                              slug="test-dependencies",
+                                              category=self.category,
+                                              published=timezone.now())
+        self.article.topics.add(self.topic)
+        self.other = Article.objects.create(title="Unrelated article",
+                                            slug="unrelated-article",
+                                            category=self.category,
+                                            published=timezone.now())
+        # The page cache outlives test runs
+        for url in ["/article/test-dependencies/",
+                    "/article/unrelated-article/", "/topic/water/",
+                    "/category/news/", "/category/features/",
+                    "/sitenews/rss/"]:
+            cache.delete(self.get_page_key(url))
+
+    def get_page_key(self, url):
+        if url.startswith("/article/"):
+            key_prefix = "article"
+        elif url.startswith("/sitenews/"):
+            key_prefix = "feed"
+        else:
+            key_prefix = ""
+        return get_cache_key(RequestFactory().get(url), key_prefix, 'GET')
+
+    def is_cached(self, url):
+        '''Whether the page would be served from the cache.'''
+        key = self.get_page_key(url)
+        return key is not None and cache.get(key) is not None and \
+            not is_purged(key)
+
+    def test_article_save_purges_only_its_pages(self):
+        urls = ["/article/test-dependencies/", "/article/unrelated-article/",
+                "/topic/water/"]
+        client = Client()
+        for url in urls:
+            client.get(url)
+            self.assertTrue(self.is_cached(url))
+        rendered, dependencies = cache.get(
+            DEPENDENCY_KEY_PREFIX + self.get_page_key("/topic/water/"))
+        self.assertIn("newsroom.article:" + str(self.article.pk),
+                      dependencies)
+        self.article.save()
+        self.assertFalse(self.is_cached("/article/test-dependencies/"))
+        self.assertFalse(self.is_cached("/topic/water/"))
+        for url in urls:
+            client.get(url)
+        # Only the pages showing the article are purged, including the one
+        # linking to it as the next article
+        self.other.title = "Still unrelated"
+        self.other.save()
+        self.assertFalse(self.is_cached("/article/unrelated-article/"))
+        self.assertFalse(self.is_cached("/article/test-dependencies/"))
+        self.assertTrue(self.is_cached("/topic/water/"))
+
+    def test_list_changes(self):
+        features = Category.objects.create(name="Features", slug="features")
+        client = Client()
+        # Creating the category purged the cached pages
+        client.get("/category/news/")
+        self.assertTrue(self.is_cached("/category/news/"))
+        stamp_key = STAMP_KEY_PREFIX + "newsroom.category:" + \
+            str(self.category.pk)
+        stamp = cache.get(stamp_key)
+        # A change that doesn't move the article between lists only marks
+        # them as changed
+        time.sleep(0.01)
+        self.other.title = "Renamed"
+        self.other.save()
+        self.assertGreater(cache.get(stamp_key), stamp)
+        client.get("/category/features/")
+        self.assertTrue(self.is_cached("/category/features/"))
+        # Moving it purges both the old and the new category's pages
+        self.other.category = features
+        self.other.save()
+        self.assertFalse(self.is_cached("/category/news/"))
+        self.assertFalse(self.is_cached("/category/features/"))
+
+    def test_feed_cache(self):
+        self.assertEqual(self.article.cached_enclosure_type, "image/png")
+        client = Client()
+        response = client.get("/sitenews/rss/")
+        self.assertContains(response, 'type="image/png"')
+        self.assertTrue(self.is_cached("/sitenews/rss/"))
+        Article.objects.create(title="Newly published", slug="newly-published",
+                               category=self.category,
+                               published=timezone.now())
+        self.assertFalse(self.is_cached("/sitenews/rss/"))
+        response = client.get("/sitenews/rss/")
+        self.assertContains(response, "Newly published")
+        self.article.title = "Edited title"
+        self.article.save()
+        self.assertFalse(self.is_cached("/sitenews/rss/"))
+        self.assertContains(client.get("/sitenews/rss/"), "Edited title")
+
+    def test_conditional_get(self):
+        client = Client()
+        for url in ["/article/test-dependencies/", "/topic/water/",
+                    "/sitenews/rss/"]:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            response = client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(response.status_code, 304)
+            time.sleep(0.01)
+            self.article.save()
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+        # The stamps set when the cache is cold validate later requests
+        cache.delete(STAMP_KEY_PREFIX + LATEST)
+        etag = client.get("/sitenews/rss/")["ETag"]
+        self.assertEqual(client.get("/sitenews/rss/",
+                                    HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_purge_article_view(self):
+        request = type("Request", (), {})()
+        add_dependencies(request, self.article, None, "latest")
+        self.assertEqual(request.cache_dependencies,
+                         {"newsroom.article:" + str(self.article.pk),
+                          "latest"})
+        Client().get("/article/test-dependencies/")
+        self.assertTrue(self.is_cached("/article/test-dependencies/"))
+        User.objects.create_user("editor", "editor@example.com", "abcde",
+                                 is_staff=True)
+        client = Client()
+        client.login(username="editor", password="abcde")
+        response = client.post("/cache/purgearticle",
+                               {"article": "/article/test-dependencies/"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Purged the cached pages")
+        self.assertFalse(self.is_cached("/article/test-dependencies/"))
+
+    def test_staff_shared_fragments(self):
+        User.objects.create_user("staff", "staff@example.com", "abcde",
+                                 is_staff=True)
+        user = User.objects.create_user("editor", "editor@example.com",
+                                        "abcde", is_staff=True)
+        user.user_permissions.add(
+            Permission.objects.get(codename="change_article"))
+        url = "/article/test-dependencies/"
+        fragment = "newsroom/article_content.html"
+
+        def get_rendered(client):
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return [t.name for t in response.templates]
+
+        # Staff who can't edit get the fragment a reader rendered
+        self.assertIn(fragment, get_rendered(Client()))
+        staff = Client()
+        staff.login(username="staff", password="abcde")
+        self.assertNotIn(fragment, get_rendered(staff))
+        # Editors get an editable copy, with the form rendered every time
+        editor = Client()
+        editor.login(username="editor", password="abcde")
+        self.assertIn(fragment, get_rendered(editor))
+        self.assertNotIn(fragment, get_rendered(editor))
+        self.assertContains(editor.get(url), 'id="article_form"')
+        self.article.title = "Shared fragment"
+        self.article.save()
+        self.assertIn(fragment, get_rendered(staff))
+        self.assertContains(staff.get(url), "Shared fragment")
+        # Editing an article the page links to renders it again too
+        self.assertContains(staff.get(url), "Unrelated article")
+        self.other.title = "Renamed neighbour"
+        self.other.save()
+        self.assertContains(staff.get(url), "Renamed neighbour")
+        self.assertContains(Client().get(url), "Renamed neighbour")
+
+
+class TieredCacheTest(TestCase):
+
+    def setUp(self):
+        self.cache = TieredCache("test-tiered-cache", {
+            'OPTIONS': {
+                'SHARED_BACKEND':
+                'django.core.cache.backends.locmem.LocMemCache',
+                'LOCAL_MAX_ENTRIES': 2,
+                'STALE_PERIOD': 60,
+            }
+        })
+        self.cache.clear()
+        for name in self.cache.stats:
+            self.cache.stats[name] = 0
+
+    def test_tiers(self):
+        self.cache.set("a", "page a")
+        self.assertEqual(self.cache.get("a"), "page a")
+        self.assertEqual(self.cache.get_stats()["local_hits"], 1)
+        # As seen by another worker process
+        self.cache._local.clear()
+        self.assertEqual(self.cache.get("a"), "page a")
+        self.assertEqual(self.cache.get("a"), "page a")
+        self.assertEqual(self.cache.get_stats()["shared_hits"], 1)
+        self.assertEqual(self.cache.get_stats()["local_hits"], 2)
+        self.assertEqual(self.cache.get("b", "missing"), "missing")
+        self.assertEqual(self.cache.get_stats()["misses"], 1)
+        # The local tier only keeps the most recently used entries
+        self.cache.set("b", "page b")
+        self.cache.set("c", "page c")
+        self.assertNotIn(self.cache.make_key("a"), self.cache._local)
+        self.assertEqual(self.cache.get("a"), "page a")
+        self.cache.delete("a")
+        self.assertEqual(self.cache.get("a"), None)
+
+    def test_stale_while_revalidate(self):
+        self.cache.set("page", "old page", 1)
+        key = self.cache.make_key("page")
+        expiry, value = self.cache._shared.get(key)
+        self.cache._shared.set(key, (time.time() - 1, value), 60)
+        self.cache._local.clear()
+        # The first request to see the expired page re-renders it and the
+        # others are served the stale copy in the meantime.
+        self.assertEqual(self.cache.get("page"), None)
+        self.assertEqual(self.cache.get("page"), "old page")
+        self.assertEqual(self.cache.get_stats()["stale_hits"], 1)
+        self.cache.set("page", "new page")
+        self.assertEqual(self.cache.get("page"), "new page")
+
+    def test_atomic_add(self):
+        with tempfile.TemporaryDirectory() as location:
+            shared = FileCache(location, {'OPTIONS': {'LOCK_TIMEOUT': 10}})
+            self.assertTrue(shared.add("lock", True))
+            self.assertFalse(shared.add("lock", True))
+            # Another process holds the lock while it adds the key
+            path = shared._key_to_file("other") + LOCK_FILE_SUFFIX
+            open(path, "w").close()
+            self.assertFalse(shared.add("other", True))
+            self.assertFalse(shared.has_key("other"))
+            # One left by a process that died is taken over
+            os.utime(path, (time.time() - 60, time.time() - 60))
+            self.assertTrue(shared.add("other", True))
+            self.assertFalse(os.path.exists(path))
+        self.assertTrue(self.cache.add("a", "page a"))
+        self.assertFalse(self.cache.add("a", "page b"))
+        self.assertEqual(self.cache.get("a"), "page a")
@@ -7,4 +7,5 @@ app_name = 'cache'
 
 urlpatterns = [
     url(r'^clearcache$', views.clear_cache, name='clearcache'),
+    url(r'^purgearticle$', views.purge_article, name='purgearticle'),
 ]
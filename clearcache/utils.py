@@ -0,0 +1,206 @@
+'''Tracks which cached pages depend on which objects, so that saving an
+object purges only the pages that show it instead of clearing the whole
+cache.
+
+Views declare what a page depends on with add_dependencies. Pages cached
+with cache_page_with_dependencies keep a record, under their own cache key,
+of when they were rendered and what they depend on. purge stamps the time a
+dependency was purged, and a cached page is only served if none of its
+dependencies were purged after it was rendered. Each page and each
+dependency has its own keys, so nothing is read, changed and written back
+by processes racing each other.
+
+touch stamps the time a dependency last changed without purging the pages
+that depend on it, and purge does both. The last_changed decorator uses
+these stamps to answer conditional GETs with a 304 without rendering the
+page.
+'''
+
+import datetime
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import get_cache_key
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+
+DEPENDENCY_KEY_PREFIX = "cachedeps_"
+PURGE_KEY_PREFIX = "lastpurge_"
+STAMP_KEY_PREFIX = "laststamp_"
+
+# Dependency of pages that list the latest articles, like the home page
+LATEST = "latest"
+
+
+def get_dependency(obj, pk=None):
+    '''Pass a model class and pk to avoid fetching the object.'''
+    if pk is None:
+        pk = obj.pk
+    return obj._meta.label_lower + ":" + str(pk)
+
+
+def add_dependencies(request, *dependencies):
+    if not hasattr(request, "cache_dependencies"):
+        request.cache_dependencies = set()
+    for dependency in dependencies:
+        if isinstance(dependency, str):
+            request.cache_dependencies.add(dependency)
+        elif dependency is not None:
+            request.cache_dependencies.add(get_dependency(dependency))
+
+
+def get_many_shared(keys):
+    '''Reads keys that other processes write straight from the shared
+    store of a TieredCache, bypassing its in-process tier.
+    '''
+    return getattr(cache, "get_many_shared", cache.get_many)(keys)
+
+
+def get_page_key(request, key_prefix):
+    return get_cache_key(request, key_prefix or '', 'GET', cache=cache)
+
+
+def record_dependencies(request, key_prefix, timeout):
+    '''Records when the page was rendered and what it depends on.
+    Dependencies that have never been purged are stamped as purged when
+    the page was rendered, because a missing stamp reads as purged.
+    '''
+    page_key = get_page_key(request, key_prefix)
+    if page_key is None:
+        return
+    dependencies = getattr(request, "cache_dependencies", set())
+    rendered = request.cache_rendered
+    keys = [PURGE_KEY_PREFIX + dependency for dependency in dependencies]
+    purged = get_many_shared(keys)
+    for key in keys:
+        if key not in purged:
+            cache.add(key, rendered, None)
+    cache.set(DEPENDENCY_KEY_PREFIX + page_key,
+              (rendered, sorted(dependencies)), timeout)
+
+
+def is_purged(page_key):
+    '''Returns True unless the cached page was rendered after its
+    dependencies were last purged.
+    '''
+    record = cache.get(DEPENDENCY_KEY_PREFIX + page_key)
+    if record is None:
+        return True
+    rendered, dependencies = record
+    keys = [PURGE_KEY_PREFIX + dependency for dependency in dependencies]
+    purged = get_many_shared(keys)
+    return len(purged) < len(keys) or \
+        any(stamp > rendered for stamp in purged.values())
+
+
+def touch(*dependencies):
+    '''Returns the stamp set.'''
+    now = time.time()
+    cache.set_many({STAMP_KEY_PREFIX + dependency: now
+                    for dependency in dependencies}, None)
+    return now
+
+
+def get_stamp(*dependencies):
+    '''Returns the last time any of the dependencies changed, as a Unix
+    time. Dependencies without a stamp, e.g. after the cache was cleared,
+    are taken to have changed now.
+    '''
+    if not dependencies:
+        return None
+    keys = [STAMP_KEY_PREFIX + dependency for dependency in dependencies]
+    stamps = cache.get_many(keys)
+    missing = [dependency for dependency, key in zip(dependencies, keys)
+               if key not in stamps]
+    if missing:
+        return touch(*missing)
+    return max(stamps.values())
+
+
+def get_request_stamp(request, get_dependencies, *args, **kwargs):
+    '''Staff don't get the cached pages, so don't answer them with 304s.'''
+    if request.user.is_staff:
+        return None
+    if not hasattr(request, "cache_stamp"):
+        request.cache_stamp = get_stamp(*get_dependencies(request, *args,
+                                                          **kwargs))
+    return request.cache_stamp
+
+
+def last_changed(get_dependencies):
+    '''Adds ETag and Last-Modified validators to a view from the stamps of
+    the dependencies returned by get_dependencies, which is called with the
+    view's arguments.
+    '''
+
+    def etag_func(request, *args, **kwargs):
+        stamp = get_request_stamp(request, get_dependencies, *args, **kwargs)
+        if stamp is None:
+            return None
+        return repr(stamp)
+
+    def last_modified_func(request, *args, **kwargs):
+        stamp = get_request_stamp(request, get_dependencies, *args, **kwargs)
+        if stamp is None:
+            return None
+        return datetime.datetime.fromtimestamp(stamp, timezone.utc)
+
+    return condition(etag_func=etag_func,
+                     last_modified_func=last_modified_func)
+
+
+def purge(*dependencies):
+    '''Purges the cached pages that depend on any of the dependencies.
+    Returns the number of dependencies purged.
+    '''
+    dependencies = [dependency if isinstance(dependency, str)
+                    else get_dependency(dependency)
+                    for dependency in dependencies]
+    now = time.time()
+    stamps = {STAMP_KEY_PREFIX + dependency: now
+              for dependency in dependencies}
+    stamps.update({PURGE_KEY_PREFIX + dependency: now
+                   for dependency in dependencies})
+    cache.set_many(stamps, None)
+    return len(dependencies)
+
+
+def cache_page_with_dependencies(timeout, key_prefix=None):
+    '''Works like cache_page but also records the dependencies the view
+    added to the request with the page, and deletes the cached page
+    instead of serving it once one of them is purged.
+    '''
+
+    def _decorator(view):
+
+        def rendering_view(request, *args, **kwargs):
+            request.cache_rendered = time.time()
+            return view(request, *args, **kwargs)
+
+        cached_view = cache_page(timeout, key_prefix=key_prefix)(
+            rendering_view)
+
+        def record(request, response):
+            if hasattr(request, "cache_rendered") and \
+               response.status_code == 200:
+                record_dependencies(request, key_prefix, timeout)
+
+        def _view(request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD'):
+                page_key = get_page_key(request, key_prefix)
+                if page_key is not None and is_purged(page_key):
+                    cache.delete(page_key)
+            response = cached_view(request, *args, **kwargs)
+            # Template responses are only cached after they are rendered
+            if hasattr(response, "add_post_render_callback") and \
+               not response.is_rendered:
+                response.add_post_render_callback(
+                    lambda r: record(request, r))
+            else:
+                record(request, response)
+            return response
+
+        return _view
+
+    return _decorator
@@ -3,9 +3,27 @@ from django.http import HttpResponseRedirect
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.core.cache import caches
+from newsroom.dependencies import purge_article as purge_article_pages
+from newsroom.models import Article
+from pgsearch.cache import getSearchStats
 import sys
 
-from .forms import ClearCacheForm
+from .forms import ClearCacheForm, PurgeArticleForm
+
+
+def get_cache_stats():
+    cache = caches["default"]
+    if hasattr(cache, "get_stats"):
+        return sorted(cache.get_stats().items())
+    return None
+
+
+def render_clear_cache(request, form, purge_form):
+    return render(request, 'clearcache/clearcache.html',
+                  {'form': form,
+                   'purge_form': purge_form,
+                   'stats': get_cache_stats(),
+                   'search_stats': getSearchStats()})
 
 @staff_member_required
 def clear_cache(request):
@@ -22,16 +40,42 @@ def clear_cache(request):
                       str(sys.exc_info()[0])
                 messages.add_message(request, messages.ERROR, msg)
             form = ClearCacheForm()
-            return render(request, 'clearcache/clearcache.html',
-                          {'form': None })
+            return render_clear_cache(request, None, PurgeArticleForm())
         else:
             messages.add_message(request, messages.ERROR,
                                  "There was a problem clearing the cache.")
-            return render(request, 'clearcache/clearcache.html',
-                          {'form': form})
+            return render_clear_cache(request, form, PurgeArticleForm())
 
     # if a GET (or any other method) we'll create a blank form
     else:
         form = ClearCacheForm()
 
-    return render(request, 'clearcache/clearcache.html', {'form': form})
+    return render_clear_cache(request, form, PurgeArticleForm())
+
+
+'''Purges only the cached pages that show an article: its own page and the
+lists it appears in. Much cheaper than clearing the whole cache.
+'''
+
+
+@staff_member_required
+def purge_article(request):
+    if request.method == 'POST':
+        form = PurgeArticleForm(request.POST)
+        if form.is_valid():
+            slug = form.cleaned_data['article']
+            try:
+                article = Article.objects.get(slug=slug)
+            except Article.DoesNotExist:
+                messages.add_message(request, messages.ERROR,
+                                     "There is no article " + slug + ".")
+            else:
+                purge_article_pages(article)
+                messages.add_message(request, messages.INFO,
+                                     "Purged the cached pages for " +
+                                     article.title + ".")
+                form = PurgeArticleForm()
+    else:
+        form = PurgeArticleForm(initial={'article':
+                                         request.GET.get('article', '')})
+    return render_clear_cache(request, ClearCacheForm(), form)
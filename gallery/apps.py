@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class GalleryConfig(AppConfig):
     name = 'gallery'
+
+    def ready(self):
+        # Connects the signals that stamp when the gallery changed
+        from . import dependencies
@@ -0,0 +1,45 @@
+'''Stamps the time the gallery last changed, so that the gallery pages and
+feeds can answer conditional GETs without being rendered, and drops the
+cached feed bodies.
+'''
+
+from clearcache.utils import cache_page_with_dependencies, last_changed, \
+    purge
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from newsroom.fragments import get_fragment_dependency
+
+from . import settings
+from .models import Album, Keyword, Photograph
+
+GALLERY = "gallery"
+
+
+def get_gallery_dependencies(request, *args, **kwargs):
+    return [GALLERY, get_fragment_dependency("blocks_Gallery_Front")]
+
+
+def get_feed_dependencies(request):
+    return [GALLERY]
+
+
+gallery_changed = last_changed(get_gallery_dependencies)
+
+
+def feed_changed(feed):
+    '''The feed bodies are cached until the gallery changes.'''
+    return last_changed(get_feed_dependencies)(
+        cache_page_with_dependencies(settings.FEED_CACHE_PERIOD,
+                                     key_prefix='feed')(feed))
+
+
+# Signals
+
+
+@receiver([post_save, post_delete], sender=Album)
+@receiver([post_save, post_delete], sender=Keyword)
+@receiver([post_save, post_delete], sender=Photograph)
+@receiver(m2m_changed, sender=Photograph.albums.through)
+@receiver(m2m_changed, sender=Photograph.keywords.through)
+def touch_gallery(sender, **kwargs):
+    purge(GALLERY)
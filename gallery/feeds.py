@@ -2,10 +2,9 @@ from django.contrib.syndication.views import Feed
 from django.utils.feedgenerator import Atom1Feed
 from django.urls import reverse
 from .models  import Photograph
+from .dependencies import GALLERY
+from clearcache.utils import add_dependencies
 from django.contrib.sites.models import Site
-from django.conf import settings
-
-import os
 
 class LatestPhotosRssFeed(Feed):
     title = "GroundUp Images"
@@ -31,23 +30,19 @@ class LatestPhotosRssFeed(Feed):
         return photograph.modified
 
     def item_enclosure_url(self, photograph):
-
-        url = photograph.image.version_generate("medium").url
-
+        url = photograph.get_enclosure()[0]
         full_url = 'http://%s%s' % (Site.objects.get_current().domain, url)
         return full_url
 
     def item_enclosure_length(self, photograph):
-        return photograph.image.version_generate("medium").filesize
-
+        return photograph.get_enclosure()[1]
 
     def item_enclosure_mime_type(self, photograph):
-        suffix = photograph.image.version_generate("medium").url[-3:]
+        return photograph.get_enclosure()[2]
 
-        if suffix.lower() == "png":
-            return "image/png"
-        else:
-            return "image/jpeg"
+    def __call__(self, request, *args, **kwargs):
+        add_dependencies(request, GALLERY)
+        return super().__call__(request, *args, **kwargs)
 
 class LatestFeaturedPhotosRssFeed(LatestPhotosRssFeed):
     title = "GroundUp Featured Photos"
@@ -0,0 +1,28 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photograph',
+            name='cached_enclosure_length',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='photograph',
+            name='cached_enclosure_type',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='photograph',
+            name='cached_enclosure_url',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:32
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0002_enclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photograph',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+    ]
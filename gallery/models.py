@@ -1,10 +1,12 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.urls import reverse
 from django.utils.html import format_html
 import random
 
 from filebrowser.fields import FileBrowseField
-from newsroom.models import Author
+from newsroom import utils
+from newsroom.models import Author, ImageVersion
 
 from . import settings
 
@@ -80,6 +82,15 @@ class Photograph(models.Model):
     created = models.DateTimeField(auto_now_add=True, editable=False)
     modified = models.DateTimeField(auto_now=True, editable=False)
     keywords = models.ManyToManyField(Keyword, blank=True)
+    # The feed enclosure
+    cached_enclosure_url = models.CharField(blank=True, max_length=500,
+                                            editable=False)
+    cached_enclosure_length = models.PositiveIntegerField(default=0,
+                                                          editable=False)
+    cached_enclosure_type = models.CharField(blank=True, max_length=50,
+                                             editable=False)
+    # Weighted full text index maintained by a database trigger (pgsearch)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = PhotographQuerySet.as_manager()
 
@@ -92,11 +103,39 @@ class Photograph(models.Model):
 
     def thumbnail(self):
         return format_html(
-            '<img src="/media/{}" alt="{}">',
-            str(self.image.version_generate("thumbnail")),
+            '<img src="{}" alt="{}">',
+            ImageVersion.get_url(self.image, "thumbnail"),
             self.suggested_caption
         )
 
+    def calc_enclosure(self):
+        image_version = ImageVersion.get_ready(self.image, "medium")
+        if image_version:
+            url = image_version.url
+            length = image_version.filesize
+        else:
+            url = self.image.url
+            length = self.image.filesize
+        return url, length or 0, utils.getImageMimeType(url)
+
+    def set_enclosure(self):
+        try:
+            enclosure = self.calc_enclosure()
+        except:
+            enclosure = ("", 0, "")
+        self.cached_enclosure_url, self.cached_enclosure_length, \
+            self.cached_enclosure_type = enclosure
+
+    def get_enclosure(self):
+        if not self.cached_enclosure_url:
+            self.set_enclosure()
+        return self.cached_enclosure_url, self.cached_enclosure_length, \
+            self.cached_enclosure_type
+
+    def save(self, *args, **kwargs):
+        self.set_enclosure()
+        super(Photograph, self).save(*args, **kwargs)
+
     # def save(self, *args, **kwargs):
     #     super(Photograph, self).save(*args, **kwargs)
     #     print("Pk:", self.pk)
@@ -1,18 +1,25 @@
 from django.conf.urls import url
 from . import views
 from . import feeds
+from .dependencies import feed_changed, gallery_changed
 
 app_name = "gallery"
 
 urlpatterns = [
-    url(r'^$', views.gallery_front, name='gallery.front'),
-    url(r'^albums/$', views.album_list, name='album.list'),
-    url(r'^album/([0-9]+)/$', views.album_detail, name='album.detail'),
-    url(r'^photos/$', views.photo_list, name='photo.list'),
-    url(r'^photos/([-\s\w]+)/$', views.photo_list, name='photo.list'),
-    url(r'^photo/([0-9]+)/$', views.photo_detail, name='photo.detail'),
-    url(r'^siteimages/all/rss/$', feeds.LatestPhotosRssFeed()),
-    url(r'^siteimages/all/atom/$', feeds.LatestPhotosAtomFeed()),
-    url(r'^siteimages/featured/rss/$', feeds.LatestFeaturedPhotosRssFeed()),
-    url(r'^siteimages/featured/atom/$', feeds.LatestFeaturedPhotosAtomFeed()),
+    url(r'^$', gallery_changed(views.gallery_front), name='gallery.front'),
+    url(r'^albums/$', gallery_changed(views.album_list), name='album.list'),
+    url(r'^album/([0-9]+)/$', gallery_changed(views.album_detail),
+        name='album.detail'),
+    url(r'^photos/$', gallery_changed(views.photo_list), name='photo.list'),
+    url(r'^photos/([-\s\w]+)/$', gallery_changed(views.photo_list),
+        name='photo.list'),
+    url(r'^photo/([0-9]+)/$', gallery_changed(views.photo_detail),
+        name='photo.detail'),
+    url(r'^siteimages/all/rss/$', feed_changed(feeds.LatestPhotosRssFeed())),
+    url(r'^siteimages/all/atom/$',
+        feed_changed(feeds.LatestPhotosAtomFeed())),
+    url(r'^siteimages/featured/rss/$',
+        feed_changed(feeds.LatestFeaturedPhotosRssFeed())),
+    url(r'^siteimages/featured/atom/$',
+        feed_changed(feeds.LatestFeaturedPhotosAtomFeed())),
 ]
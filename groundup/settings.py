@@ -207,9 +207,15 @@ SITE_ID = 1
 # except:
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'BACKEND': 'clearcache.backends.TieredCache',
         'LOCATION': '/var/tmp/django_cache',
         'KEY_PREFIX': 'gu',
+        'OPTIONS': {
+            'SHARED_BACKEND': 'clearcache.backends.FileCache',
+            'LOCAL_MAX_ENTRIES': 500,
+            'LOCAL_TIMEOUT': 10,
+            'STALE_PERIOD': 60,
+        }
     }
 }
 
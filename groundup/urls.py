@@ -21,40 +21,21 @@ from django.conf.urls.static import static
 from django.views.generic.base import TemplateView
 from django.views.generic.base import RedirectView
 
-from django.contrib.flatpages.sitemaps import FlatPageSitemap
 from django.contrib.flatpages import views
 
-from django.contrib.sitemaps import GenericSitemap
-from django.contrib.sitemaps.views import sitemap
-
-from newsroom.models import Article
-from newsroom.models import Author
-
-from gallery.models import Photograph
+from newsroom import sitemaps
+from pgsearch.views import AutocompleteLookup
 
 from filebrowser.sites import site
 
 from ajax_select import urls as ajax_select_urls
 
-article_dict = {
-    'queryset': Article.objects.published(),
-    'date_field': 'published',
-}
-
-author_dict = {
-    'queryset': Author.objects.all(),
-    'date_field': 'modified',
-}
-
-photo_dict = {
-    'queryset': Photograph.objects.all(),
-    'date_field': 'modified',
-}
-
 app_name = 'groundup'
 
 urlpatterns = [
     path('admin/filebrowser/', site.urls),
+    path('grappelli/lookup/autocomplete/',
+         AutocompleteLookup.as_view(), name="grp_autocomplete_lookup"),
     path('grappelli/', include('grappelli.urls')),
     url(r'^ajax_select/', include(ajax_select_urls)),
     path('admin/login/', RedirectView.as_view(url='/accounts/login/')),
@@ -69,17 +50,11 @@ urlpatterns = [
     path('', include('allauth_2fa.urls')),
     path('accounts/', include('allauth.urls')),
 
-    url(r'^sitemap\.xml$', sitemap,
-         {'sitemaps':
-         {'articles': GenericSitemap(article_dict,
-                                      priority=0.5),
-          'authors': GenericSitemap(author_dict,
-                                    priority=0.5,
-                                    changefreq='weekly'),
-          'photos': GenericSitemap(photo_dict,
-                                   priority=0.5),
-          'flatpages': FlatPageSitemap}},
-        name='django.contrib.sitemaps.views.sitemap'),
+    url(r'^sitemap\.xml$', sitemaps.index, name='sitemap'),
+    url(r'^sitemap-pages\.xml$', sitemaps.pages, name='sitemap.pages'),
+    url(r'^sitemap-(?P<name>[a-z]+)-'
+        r'(?P<shard>[0-9]{4}(?:-[0-9]{2})?)\.xml$',
+        sitemaps.section, name='sitemap.section'),
     path('cache/', include('clearcache.urls', namespace="cache")),
     url(r'^robots\.txt',
          TemplateView.as_view(template_name='robots.txt',
@@ -4,6 +4,7 @@ from django import forms
 from django.contrib import admin
 from django.contrib.flatpages.admin import FlatPageAdmin
 from django.contrib.flatpages.models import FlatPage
+from django.shortcuts import render
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 from filebrowser.settings import ADMIN_VERSIONS, VERSIONS
@@ -13,7 +14,7 @@ from republisher.admin import RepublisherInline
 from socialmedia.admin import TweetInline
 from socialmedia.common import SCHEDULE_RESULTS
 
-from . import models, utils
+from . import bulk, models, utils
 
 # Used to select sizes of images
 IMAGE_SIZE_CHOICES = [(item, VERSIONS[item]['verbose_name'],)
@@ -67,6 +68,117 @@ class ArticleForm(forms.ModelForm):
         super(ArticleForm, self).clean(*args, **kwargs)
 
 
+class BulkChangeForm(forms.Form):
+    '''Changes made to the articles selected in the change list. Only the
+    fields that are set are changed.
+    '''
+    category = forms.ModelChoiceField(models.Category.objects.all(),
+                                      required=False)
+    region = forms.ModelChoiceField(models.Region.objects.all(),
+                                    required=False)
+    add_topic = forms.ModelChoiceField(models.Topic.objects.all(),
+                                       required=False)
+    remove_topic = forms.ModelChoiceField(models.Topic.objects.all(),
+                                          required=False)
+
+
+'''Change list actions. These use the set-based updates in bulk.py instead
+of saving each article.
+'''
+
+
+def publish_articles(modeladmin, request, queryset):
+    num_articles = bulk.publish(queryset, request.user)
+    modeladmin.message_user(request, "Published %d articles." % num_articles)
+
+
+publish_articles.short_description = "Publish selected articles now"
+
+
+def unpublish_articles(modeladmin, request, queryset):
+    num_articles = bulk.unpublish(queryset, request.user)
+    modeladmin.message_user(request,
+                            "Unpublished %d articles." % num_articles)
+
+
+unpublish_articles.short_description = "Unpublish selected articles"
+
+
+def make_sticky(modeladmin, request, queryset):
+    num_articles = bulk.set_stickiness(queryset, 1, request.user)
+    modeladmin.message_user(request,
+                            "Made %d articles sticky." % num_articles)
+
+
+make_sticky.short_description = "Make selected articles sticky"
+
+
+def make_unsticky(modeladmin, request, queryset):
+    num_articles = bulk.set_stickiness(queryset, 0, request.user)
+    modeladmin.message_user(request,
+                            "Made %d articles unsticky." % num_articles)
+
+
+make_unsticky.short_description = "Make selected articles unsticky"
+
+
+def include_in_rss(modeladmin, request, queryset):
+    num_articles = bulk.set_include_in_rss(queryset, True, request.user)
+    modeladmin.message_user(request, "Included %d articles in the RSS feeds."
+                            % num_articles)
+
+
+include_in_rss.short_description = "Include selected articles in RSS"
+
+
+def exclude_from_rss(modeladmin, request, queryset):
+    num_articles = bulk.set_include_in_rss(queryset, False, request.user)
+    modeladmin.message_user(request,
+                            "Excluded %d articles from the RSS feeds."
+                            % num_articles)
+
+
+exclude_from_rss.short_description = "Exclude selected articles from RSS"
+
+
+def change_articles(modeladmin, request, queryset):
+    '''Asks for the new category, region or topics on an intermediate page,
+    which posts back to this action with apply set.
+    '''
+    if "apply" in request.POST:
+        form = BulkChangeForm(request.POST)
+        if form.is_valid():
+            # The changes can take articles out of a filtered change list
+            pks = list(queryset.values_list("pk", flat=True))
+            articles = models.Article.objects.filter(pk__in=pks)
+            changes = [
+                (bulk.set_category, form.cleaned_data["category"]),
+                (bulk.set_region, form.cleaned_data["region"]),
+                (bulk.add_topic, form.cleaned_data["add_topic"]),
+                (bulk.remove_topic, form.cleaned_data["remove_topic"]),
+            ]
+            num_changes = 0
+            for change, value in changes:
+                if value is not None:
+                    num_changes = num_changes + \
+                        change(articles, value, request.user)
+            modeladmin.message_user(request, "Made %d changes to %d articles."
+                                    % (num_changes, len(pks)))
+            return None
+    else:
+        form = BulkChangeForm()
+    return render(request, "admin/newsroom/article/bulk_change.html",
+                  {"title": "Change articles",
+                   "form": form,
+                   "articles": queryset,
+                   "opts": modeladmin.model._meta,
+                   "action_checkbox_name": admin.ACTION_CHECKBOX_NAME})
+
+
+change_articles.short_description = \
+    "Change category, region or topics of selected articles"
+
+
 class ArticleAdmin(admin.ModelAdmin):
     form = ArticleForm
     list_display = ('title', 'created', 'modified', 'published',
@@ -76,6 +188,9 @@ class ArticleAdmin(admin.ModelAdmin):
     date_hierarchy = 'modified'
     ordering = ['-modified', ]
     list_filter = ['published', 'category', 'region', 'topics']
+    actions = [publish_articles, unpublish_articles, make_sticky,
+               make_unsticky, include_in_rss, exclude_from_rss,
+               change_articles, ]
     raw_id_fields = ('author_01', 'author_02', 'author_03', 'author_04',
                      'author_05', 'topics', 'main_topic', )
     autocomplete_lookup_fields = {
@@ -155,6 +270,12 @@ class ArticleAdmin(admin.ModelAdmin):
         obj.user = request.user
         obj.save()
 
+    # Topics are only saved after save_model, so the related article
+    # index is updated here.
+    def save_related(self, request, form, formsets, change):
+        super(ArticleAdmin, self).save_related(request, form, formsets, change)
+        form.instance.update_related()
+
     class Media:
         css = {'all': ('/static/newsroom/css/admin_enhance.css', )}
         js = [
@@ -207,7 +328,20 @@ class AuthorAdmin(admin.ModelAdmin):
     }
 
 admin.site.register(models.Author, AuthorAdmin)
-admin.site.register(models.MostPopular)
+
+
+class MostPopularArticleInline(admin.TabularInline):
+    model = models.MostPopularArticle
+    raw_id_fields = ('article', )
+    extra = 0
+
+
+class MostPopularAdmin(admin.ModelAdmin):
+    inlines = [
+        MostPopularArticleInline,
+    ]
+
+admin.site.register(models.MostPopular, MostPopularAdmin)
 
 # Define a new FlatPageAdmin
 class FlatPageAdmin(FlatPageAdmin):
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class NewsroomConfig(AppConfig):
+    name = 'newsroom'
+
+    def ready(self):
+        # Connects the signals that invalidate cached fragments and pages,
+        # queue the versions of uploaded images, track the versions
+        # concurrent editors see and update the pre-rendered pages
+        from . import dependencies, fragments, imageversions, prerender, \
+            presence
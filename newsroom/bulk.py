@@ -0,0 +1,180 @@
+'''Editorial changes to many articles at once: publishing and unpublishing,
+stickiness, the category, region and topics, and inclusion in the RSS
+feeds.
+
+These are set-based updates in batches of BATCH_SIZE articles instead of a
+save per article, so they don't pay for the byline, typography and image
+calculations of Article.save. Updates don't send the model signals, so
+what those saves would have done for the changed fields is done here:
+
+- the version is bumped so that editors with an article open are told it
+  has changed, keeping the cached public body current if it was
+- the pages of the articles and of the lists they leave or join are purged
+- the next and previous articles and the recommended pool are reset when
+  publish times change
+- the related article index is rebuilt when the category, region or topics
+  change
+- the pre-rendered pages the articles appear on, before and after the
+  change, are removed to be rendered again
+'''
+
+from clearcache.utils import LATEST, get_dependency, purge
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import prerender, presence
+from .dependencies import AUTHOR_FIELDS, get_region_dependencies
+from .models import Article, Author, Category, Topic
+
+BATCH_SIZE = 500
+
+# The related article scores depend on these
+RELATED_FIELDS = ("category", "region", "main_topic",)
+
+
+def get_batches(pks):
+    for start in range(0, len(pks), BATCH_SIZE):
+        yield pks[start:start + BATCH_SIZE]
+
+
+def get_list_dependencies(pks):
+    '''Returns the dependencies of the lists the articles are in, as
+    get_article_list_dependencies does for one article, but with two
+    queries per batch.
+    '''
+    dependencies = set()
+    region_ids = set()
+    now = timezone.now()
+    for batch in get_batches(pks):
+        published = Article.objects.filter(pk__in=batch, published__lte=now)
+        for row in published.values_list("category_id", "region_id",
+                                          *AUTHOR_FIELDS):
+            dependencies.add(get_dependency(Category, row[0]))
+            if row[1]:
+                region_ids.add(row[1])
+            dependencies.update(get_dependency(Author, author_id)
+                                for author_id in row[2:] if author_id)
+        topic_ids = Article.topics.through.objects. \
+            filter(article__in=published). \
+            values_list("topic_id", flat=True).distinct()
+        dependencies.update(get_dependency(Topic, topic_id)
+                            for topic_id in topic_ids)
+    if dependencies:
+        dependencies.add(LATEST)
+    for region_id in region_ids:
+        dependencies.update(get_region_dependencies(region_id))
+    return dependencies
+
+
+def change_articles(queryset, values, user=None, change=None,
+                    related=False):
+    '''Sets the fields in values on the articles in the queryset. change,
+    if given, is called with each batch of primary keys for changes that
+    aren't field updates. Set related to rebuild the related article index
+    even if no field in RELATED_FIELDS changes. Returns the number of
+    articles changed.
+    '''
+    pks = list(queryset.order_by().values_list("pk", flat=True))
+    if not pks:
+        return 0
+    dependencies = get_list_dependencies(pks)
+    if prerender.is_enabled():
+        urls = prerender.get_articles_urls(pks)
+    values = dict(values, modified=timezone.now())
+    if user is not None:
+        values["user"] = user
+    with transaction.atomic():
+        for batch in get_batches(pks):
+            if change:
+                change(batch)
+            articles = Article.objects.filter(pk__in=batch)
+            articles.filter(cached_public_body_version=F("version")). \
+                update(version=F("version") + 1,
+                       cached_public_body_version=F("version") + 1,
+                       **values)
+            articles.exclude(cached_public_body_version=F("version")). \
+                update(version=F("version") + 1, **values)
+    dependencies.update(get_list_dependencies(pks))
+    purge(*dependencies, *[get_dependency(Article, pk) for pk in pks])
+    cache.delete_many([presence.get_version_key(pk) for pk in pks])
+    if "published" in values:
+        Article.touch_neighbours_generation()
+        cache.delete(Article.get_recommended_pool_key())
+    if related or set(values) & set(RELATED_FIELDS):
+        for batch in get_batches(pks):
+            for article in Article.objects.filter(pk__in=batch):
+                article.update_related()
+    if prerender.is_enabled():
+        prerender.expire(urls | prerender.get_articles_urls(pks))
+    return len(pks)
+
+
+def publish(queryset, user=None):
+    '''Publishes the articles that aren't published yet now.'''
+    now = timezone.now()
+    return change_articles(
+        queryset.filter(Q(published__isnull=True) | Q(published__gt=now)),
+        {"published": now}, user)
+
+
+def unpublish(queryset, user=None):
+    return change_articles(queryset.filter(published__isnull=False),
+                           {"published": None}, user)
+
+
+def set_stickiness(queryset, stickiness, user=None):
+    return change_articles(queryset.exclude(stickiness=stickiness),
+                           {"stickiness": stickiness}, user)
+
+
+def make_top_story(article):
+    '''Makes the article the only sticky one. The user isn't recorded on
+    the articles made unsticky, which nobody chose to change.
+    '''
+    set_stickiness(Article.objects.filter(stickiness__gt=0).
+                   exclude(pk=article.pk), 0)
+    return set_stickiness(Article.objects.filter(pk=article.pk), 1)
+
+
+def set_include_in_rss(queryset, include_in_rss, user=None):
+    return change_articles(queryset.exclude(include_in_rss=include_in_rss),
+                           {"include_in_rss": include_in_rss}, user)
+
+
+def set_category(queryset, category, user=None):
+    return change_articles(queryset.exclude(category=category),
+                           {"category": category}, user)
+
+
+def set_region(queryset, region, user=None):
+    if region is None:
+        queryset = queryset.filter(region__isnull=False)
+    else:
+        queryset = queryset.exclude(region=region)
+    return change_articles(queryset, {"region": region}, user)
+
+
+def add_topic(queryset, topic, user=None):
+    Through = Article.topics.through
+
+    def change(pks):
+        Through.objects.bulk_create([Through(article_id=pk, topic=topic)
+                                     for pk in pks])
+
+    return change_articles(queryset.exclude(topics=topic), {}, user, change,
+                           related=True)
+
+
+def remove_topic(queryset, topic, user=None):
+    '''Also clears the main topic of the articles where it was the topic.'''
+
+    def change(pks):
+        Article.topics.through.objects.filter(article_id__in=pks,
+                                              topic=topic).delete()
+        Article.objects.filter(pk__in=pks, main_topic=topic). \
+            update(main_topic=None)
+
+    return change_articles(queryset.filter(topics=topic), {}, user, change,
+                           related=True)
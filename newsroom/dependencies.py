@@ -0,0 +1,183 @@
+'''Records what the cached newsroom pages depend on and purges those pages
+when the objects they show are saved or deleted.
+
+Every page depends on the articles it shows. The article lists also depend
+on the category, topic, region or author they list, and the home page and
+opinion list depend on the latest articles. Saving an article purges its
+own page and every cached list that shows it. Saving a published article,
+or publishing or unpublishing one, also marks the lists it belongs in, and
+belonged in before the save, as changed. Those lists are only purged if the
+change can add the article to them, drop it or move it: a change to a
+field in LIST_FIELDS or to its topics.
+
+Articles with a future publish time go live without being saved. The time
+the next one does is kept in the cache, and purge_scheduled, called when
+the page dependencies are looked up, purges the lists of the articles that
+have gone live once that time has passed.
+'''
+
+from clearcache.utils import LATEST, get_dependency, purge, touch
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import Article, Author, Category, Region, Topic
+
+AUTHOR_FIELDS = ("author_01_id", "author_02_id", "author_03_id",
+                 "author_04_id", "author_05_id",)
+
+# The fields that decide which lists an article is in and where
+LIST_FIELDS = ("published", "stickiness", "category_id",
+               "region_id",) + AUTHOR_FIELDS
+
+SCHEDULED_KEY = "newsroom_next_scheduled"
+SCHEDULED_LOCK_KEY = SCHEDULED_KEY + "_lock"
+SCHEDULED_LOCK_TIMEOUT = 60
+
+# Sent with the articles that purge_scheduled found had gone live
+scheduled_published = Signal(providing_args=["articles"])
+
+
+def get_region_dependencies(region_id):
+    '''An article in a region is also listed on the pages of the regions
+    that contain it.
+    '''
+    try:
+        region = Region.objects.get(pk=region_id)
+    except Region.DoesNotExist:
+        return []
+    return [get_dependency(Region, pk)
+            for pk in [region.pk] + region.get_ancestor_ids()]
+
+
+def get_article_list_dependencies(article):
+    dependencies = [LATEST, get_dependency(Category, article.category_id)]
+    if article.region_id:
+        dependencies = dependencies + \
+            get_region_dependencies(article.region_id)
+    if article.pk:
+        dependencies = dependencies + \
+            [get_dependency(Topic, pk) for pk in
+             article.topics.values_list("pk", flat=True)]
+    for name in AUTHOR_FIELDS:
+        author_id = getattr(article, name)
+        if author_id:
+            dependencies.append(get_dependency(Author, author_id))
+    return dependencies
+
+
+def get_loaded_list_dependencies(article):
+    '''The lists the article was in when it was loaded, before any change
+    to its category, region or authors.
+    '''
+    loaded_values = getattr(article, "_loaded_values", None) or {}
+    dependencies = []
+    if loaded_values.get("category_id"):
+        dependencies.append(get_dependency(Category,
+                                           loaded_values["category_id"]))
+    if loaded_values.get("region_id"):
+        dependencies = dependencies + \
+            get_region_dependencies(loaded_values["region_id"])
+    for name in AUTHOR_FIELDS:
+        if loaded_values.get(name):
+            dependencies.append(get_dependency(Author, loaded_values[name]))
+    return dependencies
+
+
+def purge_article(article, lists_changed=True):
+    '''Purges the cached pages showing the article. If it is or was
+    published, the lists it is in and was in are purged too if
+    lists_changed is set, and otherwise only touched: the list pages
+    depend on each article they show, so purging the article is enough for
+    them to show its new title or summary. Returns the number of
+    dependencies purged.
+    '''
+    num_purged = purge(article)
+    if article.is_published() or \
+       article.published != getattr(article, "_loaded_published", None):
+        dependencies = set(get_article_list_dependencies(article) +
+                           get_loaded_list_dependencies(article))
+        if lists_changed:
+            num_purged = num_purged + purge(*dependencies)
+        else:
+            touch(*dependencies)
+    return num_purged
+
+
+def get_next_scheduled(now):
+    return Article.objects.filter(published__gt=now). \
+        order_by("published").values_list("published", flat=True).first()
+
+
+def purge_scheduled():
+    '''Purges the lists of the articles that have gone live since the next
+    scheduled publish time was last found. Returns the number of articles.
+    '''
+    now = timezone.now()
+    # (next publish time or None,) or None if it isn't known
+    scheduled = cache.get(SCHEDULED_KEY)
+    if scheduled is not None and (scheduled[0] is None or
+                                  scheduled[0] > now):
+        return 0
+    # Another process is doing it
+    if not cache.add(SCHEDULED_LOCK_KEY, True, SCHEDULED_LOCK_TIMEOUT):
+        return 0
+    try:
+        articles = []
+        if scheduled is not None:
+            articles = list(Article.objects.filter(
+                published__gte=scheduled[0], published__lte=now))
+        for article in articles:
+            purge_article(article)
+        if articles:
+            Article.touch_neighbours_generation()
+            cache.delete(Article.get_recommended_pool_key())
+            scheduled_published.send(sender=Article, articles=articles)
+        cache.set(SCHEDULED_KEY, (get_next_scheduled(now),), None)
+    finally:
+        cache.delete(SCHEDULED_LOCK_KEY)
+    return len(articles)
+
+
+# Signals
+
+
+@receiver(post_save, sender=Article)
+def purge_saved_article_pages(sender, instance, **kwargs):
+    changed = instance.get_changed_fields()
+    purge_article(instance,
+                  changed is None or bool(changed & set(LIST_FIELDS)))
+    if instance.published and instance.published > timezone.now():
+        scheduled = cache.get(SCHEDULED_KEY)
+        if scheduled is not None and (scheduled[0] is None or
+                                      instance.published < scheduled[0]):
+            cache.set(SCHEDULED_KEY, (instance.published,), None)
+
+
+@receiver(post_delete, sender=Article)
+def purge_article_pages(sender, instance, **kwargs):
+    purge_article(instance)
+
+
+@receiver(m2m_changed, sender=Article.topics.through)
+def purge_article_topic_pages(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    if action == "pre_clear":
+        if reverse:
+            purge(instance, *instance.article_set.all())
+        else:
+            purge(instance, *instance.topics.all())
+    elif action in ["post_add", "post_remove"]:
+        if reverse:
+            purge(instance, *Article.objects.filter(pk__in=pk_set))
+        else:
+            purge(instance, *Topic.objects.filter(pk__in=pk_set))
+
+
+@receiver([post_save, post_delete], sender=Author)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Region)
+@receiver([post_save, post_delete], sender=Topic)
+def purge_section_pages(sender, instance, **kwargs):
+    purge(instance)
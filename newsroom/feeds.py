@@ -1,10 +1,7 @@
-import os
-
-from django.conf import settings
+from clearcache.utils import LATEST, add_dependencies
 from django.contrib.sites.models import Site
 from django.contrib.syndication.views import Feed
 from django.utils.feedgenerator import Atom1Feed
-from newsroom.settings import LOGO
 
 from .models import Article
 
@@ -34,40 +31,21 @@ class LatestArticlesRssFeed(Feed):
         return article.modified
 
     def item_enclosure_url(self, article):
-        if article.primary_image:
-            try:
-                url = article.primary_image.version_generate("medium").url
-            except:
-                url = settings.STATIC_URL + LOGO
-        else:
-            url = settings.STATIC_URL + LOGO
+        url = article.get_enclosure()[0]
         full_url = 'http://%s%s' % (Site.objects.get_current().domain, url)
         return full_url
 
     def item_enclosure_length(self, article):
-        try:
-            if article.primary_image:
-                return article.primary_image.version_generate("medium").\
-                    filesize
-            else:
-                return os.path.getsize(settings.STATIC_ROOT + LOGO)
-        except:
-            return os.path.getsize(settings.STATIC_ROOT + LOGO)
+        return article.get_enclosure()[1]
 
     def item_enclosure_mime_type(self, article):
-        try:
-            if article.primary_image:
-                suffix = article.primary_image.version_generate("medium").\
-                         url[-3:]
-            else:
-                suffix = LOGO[-3:]
-
-            if suffix.lower() == "png":
-                    return "image/png"
-            else:
-                return "image/jpeg"
-        except:
-            return "image/png"
+        return article.get_enclosure()[2]
+
+    def get_feed(self, obj, request):
+        # Editing an article in the feed without moving it only touches
+        # LATEST, so the cached feed depends on each article too
+        add_dependencies(request, LATEST, *self.items())
+        return super().get_feed(obj, request)
 
 
 class LatestArticlesAtomFeed(LatestArticlesRssFeed):
@@ -0,0 +1,127 @@
+'''Page fragments shared by the home page, the article lists and the article
+pages: the most popular list, the latest letters, the latest questions and
+answers, and the block groups. Each fragment is cached until one of the
+models it is built from is saved or deleted, which also purges the cached
+pages showing it.
+'''
+
+import datetime
+
+from agony.models import QandA
+from blocks.models import Block, BlockGroup, Group
+from clearcache.utils import add_dependencies, purge
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from letters.models import Letter
+from letters.settings import DAYS_AGO
+
+from . import settings
+from .models import MostPopular
+
+FRAGMENT_KEY_PREFIX = "fragment_"
+
+
+def get_fragment_key(name):
+    return FRAGMENT_KEY_PREFIX + name
+
+
+def get_fragment_dependency(name):
+    return "fragment:" + name
+
+
+def add_fragment_dependencies(request, *names):
+    '''Marks the cached page being rendered as showing the fragments, so
+    that it is purged when one of them is invalidated.
+    '''
+    add_dependencies(request,
+                     *[get_fragment_dependency(name) for name in names])
+
+
+def get_fragment(name, calc):
+    key = get_fragment_key(name)
+    value = cache.get(key)
+    if value is None:
+        value = calc()
+        cache.set(key, value, settings.FRAGMENT_CACHE_PERIOD)
+    return value
+
+
+def invalidate_fragment(name):
+    cache.delete(get_fragment_key(name))
+    purge(get_fragment_dependency(name))
+
+
+def get_most_popular_html():
+    return get_fragment("most_popular", MostPopular.get_most_popular_html)
+
+
+def calc_letters():
+    date_from = timezone.now() - datetime.timedelta(days=DAYS_AGO)
+    return list(Letter.objects.published().
+                filter(published__gte=date_from).
+                select_related("article").
+                order_by('-published')[:settings.SIDEBAR_ITEMS])
+
+
+def get_letters():
+    return get_fragment("letters", calc_letters)
+
+
+def calc_agony():
+    return list(QandA.objects.published().
+                order_by('-published')[:settings.SIDEBAR_ITEMS])
+
+
+def get_agony():
+    return get_fragment("agony", calc_agony)
+
+
+def calc_blocks(group_name):
+    try:
+        return list(Group.objects.get(name=group_name).get_blocks())
+    except Group.DoesNotExist:
+        return []
+
+
+def get_blocks(group_name="Home"):
+    return get_fragment("blocks_" + group_name,
+                        lambda: calc_blocks(group_name))
+
+
+# Signals
+
+
+@receiver([post_save, post_delete], sender=MostPopular)
+def invalidate_most_popular(sender, **kwargs):
+    invalidate_fragment("most_popular")
+
+
+@receiver([post_save, post_delete], sender=Letter)
+def invalidate_letters(sender, **kwargs):
+    invalidate_fragment("letters")
+
+
+@receiver([post_save, post_delete], sender=QandA)
+def invalidate_agony(sender, **kwargs):
+    invalidate_fragment("agony")
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_group_blocks(sender, instance, **kwargs):
+    invalidate_fragment("blocks_" + instance.name)
+
+
+@receiver([post_save, post_delete], sender=BlockGroup)
+def invalidate_block_group_blocks(sender, instance, **kwargs):
+    try:
+        invalidate_fragment("blocks_" + instance.group.name)
+    except Group.DoesNotExist:
+        pass
+
+
+@receiver([post_save, post_delete], sender=Block)
+def invalidate_block_blocks(sender, instance, **kwargs):
+    for group in Group.objects.filter(blocks=instance):
+        invalidate_fragment("blocks_" + group.name)
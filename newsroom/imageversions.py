@@ -0,0 +1,94 @@
+'''Background generation of the filebrowser image versions.
+
+Uploading or referencing an image only records the versions it needs in the
+ImageVersion table. The generateversions management command resizes the
+pending ones in a pool of worker processes and then refreshes the cached
+image URLs of the articles that use them. Until then the original image is
+used.
+'''
+
+import logging
+import multiprocessing
+
+from django.db import connections
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+from filebrowser.base import FileObject
+from filebrowser.settings import VERSIONS
+from filebrowser.signals import filebrowser_post_upload
+from gallery.models import Photograph
+
+from .models import Article, ImageVersion
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(filebrowser_post_upload)
+def queue_uploaded_versions(sender, path, file, site, **kwargs):
+    if file.filetype == "Image":
+        ImageVersion.queue(str(file), VERSIONS.keys())
+
+
+def generate_version(job):
+    '''Runs in a worker process, so it mustn't touch the database.'''
+    pk, path, version_suffix = job
+    try:
+        version = FileObject(path).version_generate(version_suffix)
+        if not version.exists:
+            return pk, "", None, "Version wasn't generated"
+        return pk, version.url, version.filesize, ""
+    except Exception as e:
+        return pk, "", None, str(e)
+
+
+def refresh_articles(paths):
+    '''Recomputes the cached image URLs and feed enclosures of the articles
+    and photographs using the images.
+    '''
+    images = [FileObject(path) for path in paths]
+    articles = Article.objects.filter(Q(primary_image__in=images) |
+                                      Q(summary_image__in=images))
+    for article in articles:
+        article.cached_primary_image = article.calc_primary_image()
+        article.cached_summary_image = article.calc_summary_image()
+        article.cached_small_image = article.calc_small_image()
+        article.set_enclosure()
+        # Saving through the model purges the article's cached pages
+        article.save()
+    for photograph in Photograph.objects.filter(image__in=images):
+        photograph.save()
+
+
+def process_pending(processes=None, limit=None):
+    '''Generates the pending versions. Returns (generated, failed).'''
+    image_versions = ImageVersion.objects.filter(status="pending"). \
+        order_by("modified")
+    if limit:
+        image_versions = image_versions[:limit]
+    jobs = list(image_versions.values_list("pk", "path", "version_suffix"))
+    if not jobs:
+        return 0, 0
+    # Forked workers mustn't share the parent's database connections
+    connections.close_all()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(generate_version, jobs)
+    paths = {pk: path for pk, path, version_suffix in jobs}
+    ready_paths = set()
+    generated = 0
+    failed = 0
+    for pk, url, filesize, error in results:
+        if error:
+            logger.error("Generating image version %s: %s", pk, error)
+            ImageVersion.objects.filter(pk=pk).update(
+                status="failed", error=error, modified=timezone.now())
+            failed = failed + 1
+        else:
+            ImageVersion.objects.filter(pk=pk).update(
+                status="ready", url=url, filesize=filesize, error="",
+                modified=timezone.now())
+            ready_paths.add(paths[pk])
+            generated = generated + 1
+    if ready_paths:
+        refresh_articles(ready_paths)
+    return generated, failed
@@ -1,6 +1,6 @@
 from ajax_select import LookupChannel, register
-from django.db.models import Q
 from newsroom.models import Article, Author
+from pgsearch import autocomplete
 
 
 @register('articles')
@@ -9,10 +9,7 @@ class ArticleLookup(LookupChannel):
     model = Article
 
     def get_query(self, q, request):
-        query = Q(title__icontains=q) | Q(pk__icontains=q) | \
-                Q(subtitle__icontains=q)
-        return self.model.objects.published().filter(query).\
-            order_by("-pk")[:10]
+        return autocomplete.search(self.model.objects.published(), q)
 
     def format_item_display(self, item):
         return str(item)
@@ -25,10 +22,9 @@ class AuthorLookup(LookupChannel):
     help_text = "Hello!"
 
     def get_query(self, q, request):
-        query = Q(last_name__icontains=q) | Q(pk__icontains=q) | \
-                Q(first_names__icontains=q)
-        return self.model.objects.filter(query).filter(email__isnull=False).\
-            order_by("last_name")
+        return autocomplete.search(
+            self.model.objects.filter(email__isnull=False), q,
+            ordering=["last_name"])
 
     def format_item_display(self, item):
         return str(item)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from newsroom.models import Article
+
+
+def process():
+    num_articles = 0
+    for article in Article.objects.all().iterator():
+        article.update_authors()
+        num_articles = num_articles + 1
+    return num_articles
+
+
+class Command(BaseCommand):
+    help = 'Build the index of article authors used to look up the ' \
+           'articles by an author.'
+
+    def handle(self, *args, **options):
+        print("BuildAuthors: {0}: Processing articles.".
+              format(str(timezone.now())))
+        num_articles = process()
+        print("BuildAuthors: Processed {0} articles.".format(num_articles))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+import datetime
+
+from newsroom.models import Article
+
+
+def process(days_back=None):
+    articles = Article.objects.published().filter(main_topic__isnull=False)
+    if days_back is not None:
+        date_from = timezone.now() - datetime.timedelta(days=days_back)
+        articles = articles.filter(published__gte=date_from)
+    num_articles = 0
+    for article in articles.iterator():
+        article.update_related(symmetric=False)
+        num_articles = num_articles + 1
+    return num_articles
+
+
+class Command(BaseCommand):
+    help = 'Build the index of related articles used for the ' \
+           '"More about" list on article pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Only rebuild articles published this "
+                            "many days back. Default is all articles.")
+
+    def handle(self, *args, **options):
+        print("BuildRelated: {0}: Processing articles.".
+              format(str(timezone.now())))
+        num_articles = process(options["days"])
+        print("BuildRelated: Processed {0} articles.".format(num_articles))
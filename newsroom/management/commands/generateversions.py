@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from filebrowser.settings import VERSIONS
+
+from gallery.models import Photograph
+from newsroom import settings
+from newsroom.imageversions import process_pending
+from newsroom.models import Article, ImageVersion
+
+
+def queue_all():
+    '''Queues the versions of every image used by articles and photographs
+    that aren't in the status table yet.
+    '''
+    paths = set()
+    for primary_image, summary_image in Article.objects. \
+            values_list("primary_image", "summary_image").iterator():
+        paths.update([primary_image, summary_image])
+    paths.update(Photograph.objects.values_list("image", flat=True))
+    paths.discard("")
+    paths.discard(None)
+    known = set(ImageVersion.objects.values_list("path", "version_suffix"))
+    image_versions = [ImageVersion(path=str(path), version_suffix=suffix)
+                      for path in paths for suffix in VERSIONS.keys()
+                      if (str(path), suffix) not in known]
+    ImageVersion.objects.bulk_create(image_versions, batch_size=500)
+    return len(image_versions)
+
+
+class Command(BaseCommand):
+    help = 'Generate the pending image versions in a pool of worker ' \
+           'processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int,
+                            default=settings.IMAGE_VERSION_PROCESSES,
+                            help='Number of worker processes')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Maximum number of versions per run')
+        parser.add_argument('--all', action='store_true',
+                            help='Queue the versions of all the images '
+                            'used by articles and photographs')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for pending versions')
+        parser.add_argument('--interval', type=int, default=10,
+                            help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            num_queued = queue_all()
+            print("GenerateVersions: {0}: Queued {1} versions.".
+                  format(str(timezone.now()), num_queued))
+        while True:
+            generated, failed = process_pending(options["processes"],
+                                                options["limit"])
+            if generated or failed or not options["loop"]:
+                print("GenerateVersions: {0}: Generated {1} versions, "
+                      "{2} failed.".format(str(timezone.now()),
+                                           generated, failed))
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
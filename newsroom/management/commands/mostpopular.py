@@ -102,7 +102,7 @@ def process(days, num_articles):
     results = get_results(service, profile, days)
 
     num_found = 1
-    article_list = []
+    ranking = []
     for result in results.get("rows"):
         if num_found > num_articles:
             break
@@ -114,13 +114,11 @@ def process(days, num_articles):
                     continue
                 if article.published >= timezone.now() - \
                    datetime.timedelta(days=days):
-                    article_list.append(article.slug + "|" + article.title)
+                    ranking.append((article, int(result[2])))
                     num_found = num_found + 1
             except ObjectDoesNotExist:
                 continue
-    mostpopular = MostPopular()
-    mostpopular.article_list = "\n".join(article_list)
-    mostpopular.save()
+    MostPopular.create(ranking)
 
 class Command(BaseCommand):
     help = 'Get the most popular GroundUp articles from Google Analytics'
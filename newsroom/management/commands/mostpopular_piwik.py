@@ -37,7 +37,7 @@ def get_most_visited_pages():
 
 def get_most_popular_urls(num_articles):
     results = get_most_visited_pages()
-    article_list = []
+    ranking = []
     num_found = 0
     for result in results:
         if num_found >= num_articles:
@@ -53,17 +53,15 @@ def get_most_popular_urls(num_articles):
                     continue
                 if article.published >= timezone.now() - \
                    datetime.timedelta(days=7):
-                    item = article.slug + "|" + article.title
-                    if item in article_list:
+                    if article in [item[0] for item in ranking]:
                         pass
                     else:
-                        article_list.append(item)
+                        ranking.append(
+                            (article, int(result.get("nb_uniq_visitors", 0))))
                         num_found = num_found + 1
             except ObjectDoesNotExist:
                 continue
-    mostpopular = MostPopular()
-    mostpopular.article_list = "\n".join(article_list)
-    mostpopular.save()
+    MostPopular.create(ranking)
 
 
 class Command(BaseCommand):
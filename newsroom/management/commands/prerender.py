@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from newsroom import prerender
+from newsroom.dependencies import purge_scheduled
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the out of date pages for anonymous readers to ' \
+           'NEWSROOM_PRERENDER_ROOT and remove unpublished articles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Render every page, even if up to date')
+        parser.add_argument('--loop', action='store_true',
+                            help='Then keep rendering the pages queued '
+                            'when articles are saved or go live')
+        parser.add_argument('--interval', type=int, default=5,
+                            help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        if not prerender.is_enabled():
+            raise CommandError("NEWSROOM_PRERENDER_ROOT isn't set.")
+        num_written, num_removed = prerender.update_all(options["all"])
+        print("Prerender: {0}: Wrote {1} pages, removed {2}.".
+              format(str(timezone.now()), num_written, num_removed))
+        while options["loop"]:
+            time.sleep(options["interval"])
+            # Nothing else notices scheduled articles going live while
+            # the web server serves the pre-rendered pages
+            purge_scheduled()
+            num_written = prerender.render_queued()
+            if num_written:
+                print("Prerender: {0}: Wrote {1} pages.".
+                      format(str(timezone.now()), num_written))
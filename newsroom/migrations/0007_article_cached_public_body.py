@@ -0,0 +1,23 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0006_auto_20190424_1331'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='cached_public_body',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='cached_public_body_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0007_article_cached_public_body'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MostPopularArticle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['mostpopular', 'rank'],
+            },
+        ),
+        migrations.AddField(
+            model_name='mostpopular',
+            name='html',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='mostpopulararticle',
+            name='article',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='newsroom.Article'),
+        ),
+        migrations.AddField(
+            model_name='mostpopulararticle',
+            name='mostpopular',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='articles', to='newsroom.MostPopular'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mostpopulararticle',
+            unique_together={('mostpopular', 'rank')},
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0008_mostpopulararticle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedArticle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0.0)),
+            ],
+            options={
+                'ordering': ['article', '-score'],
+            },
+        ),
+        migrations.AddField(
+            model_name='relatedarticle',
+            name='article',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_index', to='newsroom.Article'),
+        ),
+        migrations.AddField(
+            model_name='relatedarticle',
+            name='related',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='newsroom.Article'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='relatedarticle',
+            unique_together={('article', 'related')},
+        ),
+    ]
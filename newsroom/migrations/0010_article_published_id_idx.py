@@ -0,0 +1,17 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0009_relatedarticle'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['published', 'id'], name='article_published_id_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0010_article_published_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleAuthor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=1)),
+            ],
+            options={
+                'ordering': ['article', 'position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='articleauthor',
+            name='article',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='article_authors', to='newsroom.Article'),
+        ),
+        migrations.AddField(
+            model_name='articleauthor',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='article_authors', to='newsroom.Author'),
+        ),
+        migrations.AddIndex(
+            model_name='articleauthor',
+            index=models.Index(fields=['author', 'position'], name='article_author_position_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='articleauthor',
+            unique_together={('article', 'author', 'position')},
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_region_hierarchy(apps, schema_editor):
+    Region = apps.get_model('newsroom', 'Region')
+    # Names sort parents before children
+    for region in Region.objects.order_by('name'):
+        names = []
+        name = region.name.rpartition('/')[0]
+        while name:
+            names.append(name)
+            name = name.rpartition('/')[0]
+        ancestors = sorted(Region.objects.filter(name__in=names),
+                           key=lambda ancestor: len(ancestor.name))
+        if ancestors:
+            region.parent = ancestors[-1]
+            region.path = region.parent.path + str(region.parent.pk) + '/'
+        else:
+            region.parent = None
+            region.path = '/'
+        region.depth = region.name.count('/')
+        region.save(update_fields=['parent', 'depth', 'path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0011_articleauthor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='region',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='region',
+            name='parent',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='newsroom.Region'),
+        ),
+        migrations.AddField(
+            model_name='region',
+            name='path',
+            field=models.CharField(db_index=True, default='/', editable=False, max_length=400),
+        ),
+        migrations.RunPython(set_region_hierarchy,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0012_region_hierarchy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255)),
+                ('version_suffix', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('url', models.CharField(blank=True, max_length=500)),
+                ('filesize', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='imageversion',
+            index=models.Index(fields=['status', 'modified'], name='image_version_status_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='imageversion',
+            unique_together={('path', 'version_suffix')},
+        ),
+    ]
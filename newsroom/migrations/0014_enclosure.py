@@ -0,0 +1,28 @@
+# Generated by Django 2.1.7 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0013_imageversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='cached_enclosure_length',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='cached_enclosure_type',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='cached_enclosure_url',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+    ]
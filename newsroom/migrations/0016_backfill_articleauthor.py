@@ -0,0 +1,55 @@
+# Generated by Django 2.1.7 on 2026-10-18 06:10
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def get_author_name(author):
+    return " ".join([author.title, author.first_names,
+                     author.last_name]).strip().lower()
+
+
+def backfill_article_authors(apps, schema_editor):
+    '''Fills the index for the articles saved before it existed, as the
+    buildauthors command does.
+    '''
+    Article = apps.get_model('newsroom', 'Article')
+    ArticleAuthor = apps.get_model('newsroom', 'ArticleAuthor')
+    Author = apps.get_model('newsroom', 'Author')
+    names = [(author.pk, get_author_name(author))
+             for author in Author.objects.all()]
+    indexed = set(ArticleAuthor.objects.values_list('article_id', flat=True))
+    article_authors = []
+    for article in Article.objects.exclude(pk__in=indexed).iterator():
+        author_ids = [article.author_01_id, article.author_02_id,
+                      article.author_03_id, article.author_04_id,
+                      article.author_05_id]
+        positions = set((author_id, position + 1)
+                        for position, author_id in enumerate(author_ids)
+                        if author_id is not None)
+        if article.byline:
+            byline = article.byline.lower()
+            positions.update((pk, 0) for pk, name in names
+                             if name and name in byline and
+                             pk not in author_ids)
+        article_authors.extend(
+            ArticleAuthor(article_id=article.pk, author_id=author_id,
+                          position=position)
+            for author_id, position in positions)
+        if len(article_authors) >= BATCH_SIZE:
+            ArticleAuthor.objects.bulk_create(article_authors)
+            article_authors = []
+    ArticleAuthor.objects.bulk_create(article_authors)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0015_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_article_authors,
+                             migrations.RunPython.noop),
+    ]
@@ -1,15 +1,21 @@
 import datetime
 import logging
+import random
+import time
 import traceback
+from collections import defaultdict
 from urllib.parse import urlparse
 
 import smartypants
 from allauth.account.signals import password_changed
 from django.conf import settings as django_settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.db import models
+from django.db.models import Q
 from django.dispatch import receiver
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -188,13 +194,82 @@ class Author(models.Model):
         ordering = ["last_name", "first_names", ]
 
 
+'''The hierarchy of a region is encoded in its name, e.g.
+"Country/Province/Town". It is also stored as a parent pointer, a depth and
+a path of ancestor ids, e.g. "/1/5/", which are set when the region is
+saved. The path lets a region's ancestors and descendants be found with one
+indexed query.
+'''
+
+
+def calc_region_hierarchy(region, regions):
+    '''Sets the parent, depth and path of a region. The parent is the
+    nearest region whose name is a prefix of this one's. regions is the
+    queryset to look the ancestors up in.
+    '''
+    names = []
+    name = region.name.rpartition("/")[0]
+    while name:
+        names.append(name)
+        name = name.rpartition("/")[0]
+    ancestors = sorted(regions.filter(name__in=names),
+                       key=lambda ancestor: len(ancestor.name))
+    if ancestors:
+        region.parent = ancestors[-1]
+        region.path = region.parent.path + str(region.parent.pk) + "/"
+    else:
+        region.parent = None
+        region.path = "/"
+    region.depth = region.name.count("/")
+
+
 class Region(models.Model):
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(max_length=200, unique=True)
+    parent = models.ForeignKey("self", blank=True, null=True,
+                               related_name="children", editable=False,
+                               on_delete=models.SET_NULL)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    path = models.CharField(max_length=400, default="/", editable=False,
+                            db_index=True)
+
+    def get_descendants_path(self):
+        return self.path + str(self.pk) + "/"
 
     def get_descendants(self):
-        regions = Region.objects.filter(name__startswith=(self.name + "/"))
-        return regions
+        return Region.objects.filter(
+            path__startswith=self.get_descendants_path())
+
+    def get_ancestor_ids(self):
+        return [int(pk) for pk in self.path.split("/") if pk]
+
+    def get_ancestors(self):
+        return Region.objects.filter(pk__in=self.get_ancestor_ids()). \
+            order_by("depth")
+
+    def get_breadcrumbs(self):
+        return list(self.get_ancestors()) + [self]
+
+    def get_region_ids(self):
+        '''Ids of the region and its descendants.'''
+        return [self.pk] + list(self.get_descendants().
+                                values_list("pk", flat=True))
+
+    def save(self, *args, **kwargs):
+        old_path = None
+        if self.pk:
+            old_path = self.get_descendants_path()
+        calc_region_hierarchy(self, Region.objects.exclude(pk=self.pk))
+        super(Region, self).save(*args, **kwargs)
+        # Regions below this one may have been renamed, moved or had this
+        # region inserted above them. Names sort parents before children.
+        query = Q(name__startswith=(self.name + "/"))
+        if old_path:
+            query = query | Q(path__startswith=old_path)
+        for region in Region.objects.filter(query).order_by("name"):
+            calc_region_hierarchy(region, Region.objects.exclude(pk=region.pk))
+            super(Region, region).save(update_fields=["parent", "depth",
+                                                      "path"])
 
     def get_absolute_url(self):
         return reverse('newsroom:region.detail', args=[self.name, ])
@@ -275,10 +350,57 @@ class ArticleQuerySet(models.QuerySet):
     def list_view(self):
         return self.published().filter(exclude_from_list_views=False)
 
+    '''Articles by the author, looked up in the ArticleAuthor index. Set
+    first_author to only get articles on which the author is listed first,
+    or in_byline to also get articles whose customised byline names them.
+    '''
+
+    def by_author(self, author, first_author=False, in_byline=False):
+        article_authors = ArticleAuthor.objects.filter(author=author)
+        if first_author:
+            article_authors = article_authors.filter(position=1)
+        elif not in_byline:
+            article_authors = article_authors.filter(position__gte=1)
+        return self.filter(pk__in=article_authors.values("article"))
+
 
 # def latest_article(request):
 #    return Entry.objects.published().latest("modified").modified
 
+class ArticleManager(models.Manager.from_queryset(ArticleQuerySet)):
+    '''The search vector is only used inside the database by searches, so
+    it isn't loaded with articles.
+    '''
+
+    def get_queryset(self):
+        return super().get_queryset().defer("search_vector")
+
+
+# The fields each group of cached article fields is calculated from
+
+BYLINE_FIELDS = ("byline", "byline_style", "author_01_id", "author_02_id",
+                 "author_03_id", "author_04_id", "author_05_id",)
+PRIMARY_IMAGE_FIELDS = ("primary_image", "primary_image_size",
+                        "external_primary_image",)
+SUMMARY_TEXT_FIELDS = ("summary_text", "subtitle", "body",)
+SUMMARY_IMAGE_FIELDS = ("summary_image", "summary_image_size",
+                        "summary_image_alt", "primary_image_alt",) + \
+    PRIMARY_IMAGE_FIELDS
+SMALL_IMAGE_FIELDS = ("summary_image", "primary_image",
+                      "external_primary_image",)
+ENCLOSURE_FIELDS = ("primary_image",)
+TYPOGRAPHY_FIELDS = ("title", "subtitle", "primary_image_caption", "body",)
+
+# Changing only these doesn't bump an article's version. Publishing and
+# stickiness do, as the bulk operations do, so editors are told of them.
+FLAG_FIELDS = ("recommended", "notified_authors",
+               "commissions_processed", "last_tweeted",
+               "facebook_send_status", "modified", "cached_primary_image",
+               "cached_summary_image", "cached_small_image",
+               "cached_enclosure_url", "cached_enclosure_length",
+               "cached_enclosure_type",)
+
+
 class Article(models.Model):
     title = models.CharField(max_length=250)
     subtitle = models.CharField(max_length=250, blank=True)
@@ -441,8 +563,44 @@ class Article(models.Model):
     cached_summary_text_no_html = models.TextField(blank=True)
 
     cached_small_image = models.URLField(blank=True, max_length=500)
-
-    objects = ArticleQuerySet.as_manager()
+    cached_public_body = models.TextField(blank=True)
+    cached_public_body_version = models.PositiveIntegerField(default=0)
+    # The feed enclosure
+    cached_enclosure_url = models.CharField(blank=True, max_length=500)
+    cached_enclosure_length = models.PositiveIntegerField(default=0)
+    cached_enclosure_type = models.CharField(blank=True, max_length=50)
+    # Weighted full text index maintained by a database trigger (pgsearch)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ArticleManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Article, cls).from_db(db, field_names, values)
+        instance._loaded_published = instance.__dict__.get("published")
+        instance.set_loaded_values()
+        return instance
+
+    def set_loaded_values(self):
+        self._loaded_values = {field.attname: self.__dict__[field.attname]
+                               for field in self._meta.concrete_fields
+                               if field.attname in self.__dict__}
+
+    def get_changed_fields(self):
+        '''Returns the attribute names of the fields changed since the
+        article was loaded or saved, or None if it wasn't loaded.
+        '''
+        loaded_values = getattr(self, "_loaded_values", None)
+        if loaded_values is None:
+            return None
+        changed = set()
+        for field in self._meta.concrete_fields:
+            if field.attname in loaded_values and \
+               field.attname in self.__dict__ and \
+               field.get_prep_value(loaded_values[field.attname]) != \
+               field.get_prep_value(self.__dict__[field.attname]):
+                changed.add(field.attname)
+        return changed
 
     def is_published(self):
         return (self.published is not None) and \
@@ -461,33 +619,129 @@ class Article(models.Model):
         self.save()
 
     def make_top_story(self):
-        articles = Article.objects.filter(stickiness__gt=0)
-        for article in articles:
-            article.stickiness = 0
-            article.save()
-        self.stickiness = 1
-        self.save()
+        # The bulk operations import this module
+        from .bulk import make_top_story
+        make_top_story(self)
+        self.refresh_from_db(fields=["stickiness", "version", "modified",
+                                     "cached_public_body_version"])
+        self.set_loaded_values()
+
+    '''Next and previous articles are found by walking the (published, id)
+    index from this article. The primary keys found are cached under a
+    generation stamp that changes whenever an article's publish time
+    changes.
+    '''
 
-    def get_next_article(self):
-        next_article = None
-        if self.published:
-            try:
-                next_article = Article.objects.published().\
-                               filter(published__gt=self.published).last()
-            except Article.DoesNotExist:
-                pass
-        return next_article
+    @staticmethod
+    def get_neighbours_generation():
+        generation = cache.get("article_neighbours_generation")
+        if generation is None:
+            generation = Article.touch_neighbours_generation()
+        return generation
 
+    @staticmethod
+    def touch_neighbours_generation():
+        generation = str(time.time())
+        cache.set("article_neighbours_generation", generation, None)
+        return generation
+
+    def calc_next_article_pk(self):
+        return Article.objects.published(). \
+            filter(Q(published__gt=self.published) |
+                   Q(published=self.published, pk__gt=self.pk)). \
+            order_by("published", "pk").values_list("pk", flat=True).first()
+
+    def calc_prev_article_pk(self):
+        return Article.objects.published(). \
+            filter(Q(published__lt=self.published) |
+                   Q(published=self.published, pk__lt=self.pk)). \
+            order_by("-published", "-pk").values_list("pk", flat=True).first()
+
+    def get_neighbours(self):
+        if self.published is None:
+            return (None, None)
+        if not hasattr(self, "_neighbours"):
+            key = "article_neighbours_" + \
+                  Article.get_neighbours_generation() + "_" + str(self.pk)
+            pks = cache.get(key)
+            if pks is None:
+                pks = (self.calc_next_article_pk(),
+                       self.calc_prev_article_pk())
+                cache.set(key, pks, settings.CACHE_PERIOD)
+            articles = Article.objects.published().only("slug", "title"). \
+                in_bulk([pk for pk in pks if pk is not None])
+            self._neighbours = tuple(articles.get(pk) for pk in pks)
+        return self._neighbours
+
+    def get_next_article(self):
+        return self.get_neighbours()[0]
 
     def get_prev_article(self):
-        prev_article = None
-        if self.published:
-            try:
-                prev_article = Article.objects.published().\
-                               filter(published__lt=self.published).first()
-            except Article.DoesNotExist:
-                pass
-        return prev_article
+        return self.get_neighbours()[1]
+
+    def get_author_ids(self):
+        '''The ids of the authors in the order they are listed, without
+        fetching the authors.
+        '''
+        author_ids = [self.author_01_id, self.author_02_id,
+                      self.author_03_id, self.author_04_id,
+                      self.author_05_id]
+        return [author_id for author_id in author_ids
+                if author_id is not None]
+
+    def get_authors(self):
+        return [article_author.author for article_author in
+                self.article_authors.filter(position__gte=1).
+                select_related("author").order_by("position")]
+
+    def has_author(self, author):
+        return author is not None and author.pk in self.get_author_ids()
+
+    '''Positions of the authors for the ArticleAuthor index. Authors named
+    in a customised byline but not listed as one of the five authors get
+    position 0. Finding them means checking every author's name against
+    the byline, so pass the authors found last time as byline_author_ids
+    if the byline hasn't changed.
+    '''
+
+    def calc_author_positions(self, byline_author_ids=None):
+        author_ids = [self.author_01_id, self.author_02_id,
+                      self.author_03_id, self.author_04_id,
+                      self.author_05_id]
+        positions = set((author_id, position + 1)
+                        for position, author_id in enumerate(author_ids)
+                        if author_id is not None)
+        if self.byline and byline_author_ids is not None:
+            positions.update((author_id, 0)
+                             for author_id in byline_author_ids
+                             if author_id not in author_ids)
+        elif self.byline:
+            byline = self.byline.lower()
+            for author in Author.objects.exclude(
+                    pk__in=self.get_author_ids()):
+                name = str(author).lower()
+                if name and name in byline:
+                    positions.add((author.pk, 0))
+        return positions
+
+    def update_authors(self, byline_changed=True):
+        existing = {(article_author.author_id, article_author.position):
+                    article_author.pk
+                    for article_author in self.article_authors.all()}
+        byline_author_ids = None
+        if not byline_changed:
+            byline_author_ids = [author_id for author_id, position
+                                 in existing if position == 0]
+        positions = self.calc_author_positions(byline_author_ids)
+        stale = [pk for key, pk in existing.items() if key not in positions]
+        if stale:
+            ArticleAuthor.objects.filter(pk__in=stale).delete()
+        new = [ArticleAuthor(article=self, author_id=author_id,
+                             position=position)
+               for author_id, position in positions
+               if (author_id, position) not in existing]
+        if new:
+            ArticleAuthor.objects.bulk_create(new)
 
     # Methods that calculate cache fields
 
@@ -544,8 +798,8 @@ class Article(models.Model):
             if self.primary_image_size == "LEAVE":
                 return self.primary_image.url
             else:
-                return self.primary_image.version_generate(
-                    self.primary_image_size).url
+                return ImageVersion.get_url(self.primary_image,
+                                            self.primary_image_size)
         url = self.get_necessary_url(self.external_primary_image)
         return url
 
@@ -559,7 +813,7 @@ class Article(models.Model):
             if self.summary_image_size == 'LEAVE':
                 return self.summary_image.url
             else:
-                return self.summary_image.version_generate(image_size).url
+                return ImageVersion.get_url(self.summary_image, image_size)
 
         if self.summary_image_alt == "":
             self.summary_image_alt = self.primary_image_alt
@@ -568,7 +822,7 @@ class Article(models.Model):
             if self.summary_image_size == 'LEAVE':
                 return self.primary_image.url
             else:
-                return self.primary_image.version_generate(image_size).url
+                return ImageVersion.get_url(self.primary_image, image_size)
 
         return self.cached_primary_image
 
@@ -578,16 +832,46 @@ class Article(models.Model):
 
     def calc_small_image(self):
         if self.summary_image:
-            return self.summary_image.version_generate("small").url
+            return ImageVersion.get_url(self.summary_image, "small")
 
         if self.primary_image:
-            return self.primary_image.version_generate("small").url
+            return ImageVersion.get_url(self.primary_image, "small")
 
         if self.external_primary_image:
             return self.external_primary_image
 
         return ""
 
+    '''Used to generate the cached feed enclosure, (url, length, mime type),
+    upon model save so the feeds don't have to look at the image files.
+    '''
+
+    def calc_enclosure(self):
+        if not self.primary_image:
+            return utils.getLogoEnclosure()
+        image_version = ImageVersion.get_ready(self.primary_image, "medium")
+        if image_version:
+            url = image_version.url
+            length = image_version.filesize
+        else:
+            url = self.primary_image.url
+            length = self.primary_image.filesize
+        return url, length or 0, utils.getImageMimeType(url)
+
+    def set_enclosure(self):
+        try:
+            enclosure = self.calc_enclosure()
+        except:
+            enclosure = utils.getLogoEnclosure()
+        self.cached_enclosure_url, self.cached_enclosure_length, \
+            self.cached_enclosure_type = enclosure
+
+    def get_enclosure(self):
+        if not self.cached_enclosure_url:
+            self.set_enclosure()
+        return self.cached_enclosure_url, self.cached_enclosure_length, \
+            self.cached_enclosure_type
+
     '''Used to generate the cached summary text upon model save, so
     there's less processing for website user requests.
     '''
@@ -621,6 +905,27 @@ class Article(models.Model):
     def calc_summary_text_no_html(self):
         return strip_tags(self.cached_summary_text)
 
+    '''Used to generate the body as the public sees it, with support us
+    asides and adverts processed. This is stored per article version.
+    '''
+
+    def calc_public_body(self):
+        return utils.renderPublicBody(self.body)
+
+    '''Returns the public body for the current version, rendering and
+    storing it first if it is missing or stale. The support us image is
+    chosen afresh on every call.
+    '''
+
+    def get_public_body(self):
+        if self.cached_public_body_version != self.version:
+            self.cached_public_body = self.calc_public_body()
+            self.cached_public_body_version = self.version
+            Article.objects.filter(pk=self.pk, version=self.version).update(
+                cached_public_body=self.cached_public_body,
+                cached_public_body_version=self.cached_public_body_version)
+        return utils.chooseSupportUsImages(self.cached_public_body)
+
     def clean_typography(self, text):
         return smartypants.smartypants(text).\
             replace("&nbsp;", " ").\
@@ -630,37 +935,86 @@ class Article(models.Model):
             replace(u'&#8221;', u'”').\
             replace(u'\xa0 ', u' ').replace(u' \xa0', u' ')
 
-    def save(self, *args, **kwargs):
-        self.cached_byline = self.calc_byline(True)
-        self.cached_byline_no_links = self.calc_byline(False)
+    '''Only the cached fields that depend on fields changed since the
+    article was loaded are recomputed, and an article loaded from the
+    database is written with update_fields. So saves that only flip flags,
+    like those of the management commands, are cheap and don't bump the
+    version. Publishing and stickiness aren't flags: unsticky() and
+    publish_now() bump it so editors are told.
+    '''
 
-        try:
-            self.cached_primary_image = self.calc_primary_image()
-        except:
-            self.cached_primary_image = ""
-        try:
-            self.cached_summary_text = self.calc_summary_text()
-        except:
-            self.cached_summary_text = ""
-        try:
-            self.cached_summary_text_no_html = self.calc_summary_text_no_html()
-        except:
-            self.cached_summary_text_no_html = ""
-        try:
-            self.cached_summary_image = self.calc_summary_image()
-        except:
-            self.cached_summary_image = ""
-        try:
-            self.cached_small_image = self.calc_small_image()
-        except:
-            self.cached_small_image = ""
-        self.title = self.clean_typography(self.title)
-        self.subtitle = self.clean_typography(self.subtitle)
-        self.primary_image_caption = \
-            self.clean_typography(self.primary_image_caption)
-        self.body = self.clean_typography(self.body)
-        self.version = self.version + 1
+    def save(self, *args, **kwargs):
+        changed = self.get_changed_fields()
+        if changed is not None and kwargs.get("update_fields") is not None:
+            changed = changed & set(kwargs["update_fields"])
+
+        def needs(*field_names):
+            return changed is None or not changed.isdisjoint(field_names)
+
+        updated = set()
+        if needs(*BYLINE_FIELDS):
+            self.cached_byline = self.calc_byline(True)
+            self.cached_byline_no_links = self.calc_byline(False)
+            updated.update(["cached_byline", "cached_byline_no_links"])
+        if needs(*PRIMARY_IMAGE_FIELDS):
+            try:
+                self.cached_primary_image = self.calc_primary_image()
+            except:
+                self.cached_primary_image = ""
+            updated.add("cached_primary_image")
+        if needs(*SUMMARY_TEXT_FIELDS):
+            try:
+                self.cached_summary_text = self.calc_summary_text()
+            except:
+                self.cached_summary_text = ""
+            try:
+                self.cached_summary_text_no_html = \
+                    self.calc_summary_text_no_html()
+            except:
+                self.cached_summary_text_no_html = ""
+            updated.update(["cached_summary_text",
+                            "cached_summary_text_no_html"])
+        if needs(*SUMMARY_IMAGE_FIELDS):
+            try:
+                self.cached_summary_image = self.calc_summary_image()
+            except:
+                self.cached_summary_image = ""
+            updated.update(["cached_summary_image", "summary_image_alt"])
+        if needs(*SMALL_IMAGE_FIELDS):
+            try:
+                self.cached_small_image = self.calc_small_image()
+            except:
+                self.cached_small_image = ""
+            updated.add("cached_small_image")
+        if needs(*ENCLOSURE_FIELDS) or not self.cached_enclosure_url:
+            self.set_enclosure()
+            updated.update(["cached_enclosure_url", "cached_enclosure_length",
+                            "cached_enclosure_type"])
+        for field_name in TYPOGRAPHY_FIELDS:
+            if needs(field_name):
+                setattr(self, field_name,
+                        self.clean_typography(getattr(self, field_name)))
+                updated.add(field_name)
+        if changed is None or not changed.issubset(FLAG_FIELDS):
+            public_body_current = \
+                self.cached_public_body_version == self.version
+            self.version = self.version + 1
+            if needs("body") or not public_body_current:
+                self.cached_public_body = self.calc_public_body()
+            self.cached_public_body_version = self.version
+            updated.update(["version", "cached_public_body",
+                            "cached_public_body_version"])
+        if changed is not None:
+            kwargs["update_fields"] = changed | updated | {"modified"}
         super(Article, self).save(*args, **kwargs)
+        if needs(*BYLINE_FIELDS):
+            self.update_authors(needs("byline"))
+        if needs("published", "recommended"):
+            cache.delete(Article.get_recommended_pool_key())
+        if self.published != getattr(self, "_loaded_published", None):
+            Article.touch_neighbours_generation()
+            self._loaded_published = self.published
+        self.set_loaded_values()
 
     def get_absolute_url(self):
         return reverse('newsroom:article.detail', args=[self.slug, ])
@@ -668,22 +1022,243 @@ class Article(models.Model):
     def __str__(self):
         return str(self.pk) + " " + self.title
 
+    '''Related articles are read from the RelatedArticle index, which is
+    built by the buildrelated management command and updated by
+    update_related whenever an article is edited. Articles that aren't in
+    the index yet fall back to any articles on the main topic.
+    '''
+
     def get_related(self, num_to_choose=3):
+        related = RelatedArticle.objects.filter(
+            article=self,
+            related__published__lte=timezone.now(),
+            related__recommended=True).select_related("related"). \
+            order_by("-score")[:num_to_choose]
+        related = [item.related for item in related]
+        if related:
+            return related
         return Article.objects.published().                         \
             exclude(pk=self.pk). \
             filter(topics__in=[self.main_topic]). \
             exclude(recommended=False)[:num_to_choose]
 
-    def get_recommended(self, num_to_choose=3, days_back=10):
-        publication_date = timezone.make_aware(
-            datetime.datetime.now() - datetime.timedelta(days=days_back))
-        return Article.objects.published().                         \
-            filter(published__gt=publication_date).exclude(pk=self.pk). \
-            exclude(recommended=False).order_by("?")[:num_to_choose]
+    def get_terms(self):
+        return utils.get_terms(" ".join([self.title, self.subtitle,
+                                         self.cached_summary_text_no_html]))
+
+    '''Scores the articles on this article's main topic by how many topics
+    they share with it, whether they have the same category and region, and
+    how many words their titles and summaries have in common with it.
+    '''
+
+    def calc_related_scores(self):
+        if self.main_topic_id is None:
+            return {}
+        candidates = list(
+            Article.objects.filter(topics=self.main_topic_id).
+            exclude(pk=self.pk).filter(published__isnull=False).
+            only("title", "subtitle", "cached_summary_text_no_html",
+                 "category", "region", "main_topic").
+            order_by("-published")[:settings.RELATED_CANDIDATES])
+        topics = set(self.topics.values_list("pk", flat=True))
+        candidate_topics = defaultdict(set)
+        for article_id, topic_id in Article.topics.through.objects.filter(
+                article_id__in=[c.pk for c in candidates]). \
+                values_list("article_id", "topic_id"):
+            candidate_topics[article_id].add(topic_id)
+        terms = self.get_terms()
+        scores = {}
+        for candidate in candidates:
+            score = 2.0 * len(topics & candidate_topics[candidate.pk])
+            if candidate.category_id == self.category_id:
+                score = score + 1.0
+            if self.region_id and candidate.region_id == self.region_id:
+                score = score + 1.0
+            candidate_terms = candidate.get_terms()
+            if terms and candidate_terms:
+                score = score + 5.0 * len(terms & candidate_terms) / \
+                    len(terms | candidate_terms)
+            scores[candidate] = score
+        return scores
+
+    '''Rebuilds this article's entries in the related article index. If
+    symmetric is True, this article is also added to the entries of the
+    articles it is most related to, where it belongs on their main topic.
+    '''
+
+    def update_related(self, symmetric=True):
+        scores = self.calc_related_scores()
+        top = sorted(scores.items(), key=lambda item: -item[1])[
+            :settings.RELATED_INDEX_SIZE]
+        RelatedArticle.objects.filter(article=self).delete()
+        RelatedArticle.objects.bulk_create(
+            [RelatedArticle(article=self, related=candidate, score=score)
+             for candidate, score in top])
+        if symmetric is False:
+            return
+        topics = set(self.topics.values_list("pk", flat=True))
+        for candidate, score in top:
+            if candidate.main_topic_id not in topics:
+                continue
+            RelatedArticle.objects.update_or_create(
+                article=candidate, related=self, defaults={"score": score})
+            surplus = RelatedArticle.objects.filter(article=candidate). \
+                order_by("-score").values_list("pk", flat=True)[
+                    settings.RELATED_INDEX_SIZE:]
+            RelatedArticle.objects.filter(pk__in=list(surplus)).delete()
+
+    '''The primary keys of recently published recommended articles. This
+    is cached and refreshed every RECOMMENDED_POOL_PERIOD seconds, or when
+    an article is saved, so that choosing recommended articles doesn't sort
+    the candidates randomly in the database on every request.
+    '''
+
+    @staticmethod
+    def get_recommended_pool_key(days_back=settings.RECOMMENDED_DAYS_BACK):
+        return "recommended_pool_" + str(days_back)
+
+    @staticmethod
+    def get_recommended_pool(days_back=settings.RECOMMENDED_DAYS_BACK):
+        key = Article.get_recommended_pool_key(days_back)
+        pool = cache.get(key)
+        if pool is None:
+            publication_date = timezone.make_aware(
+                datetime.datetime.now() - datetime.timedelta(days=days_back))
+            pool = list(Article.objects.published().
+                        filter(published__gt=publication_date).
+                        exclude(recommended=False).
+                        values_list("pk", flat=True))
+            cache.set(key, pool, settings.RECOMMENDED_POOL_PERIOD)
+        return pool
+
+    def get_recommended(self, num_to_choose=3,
+                        days_back=settings.RECOMMENDED_DAYS_BACK):
+        pool = [pk for pk in Article.get_recommended_pool(days_back)
+                if pk != self.pk]
+        pks = random.sample(pool, min(num_to_choose, len(pool)))
+        articles = Article.objects.published().in_bulk(pks)
+        return [articles[pk] for pk in pks if pk in articles]
 
     class Meta:
         ordering = ["-stickiness", "-published", ]
+        indexes = [
+            models.Index(fields=["published", "id"],
+                         name="article_published_id_idx"),
+        ]
+
+
+
+class ArticleAuthor(models.Model):
+    '''Index of the authors of each article, kept in sync with the author
+    fields when an article is saved. Used to look up an author's articles
+    without checking all five author fields.
+    '''
+    article = models.ForeignKey(Article, on_delete=models.CASCADE,
+                                related_name="article_authors")
+    author = models.ForeignKey(Author, on_delete=models.CASCADE,
+                               related_name="article_authors")
+    position = models.PositiveSmallIntegerField(default=1)
+
+    def __str__(self):
+        return str(self.article) + " by " + str(self.author)
+
+    class Meta:
+        unique_together = ('article', 'author', 'position',)
+        ordering = ['article', 'position', ]
+        indexes = [
+            models.Index(fields=["author", "position"],
+                         name="article_author_position_idx"),
+        ]
+
+
+class RelatedArticle(models.Model):
+    '''Index of the articles most related to each article, used for the
+    "More about" list on article pages.
+    '''
+    article = models.ForeignKey(Article, on_delete=models.CASCADE,
+                                related_name="related_index")
+    related = models.ForeignKey(Article, on_delete=models.CASCADE,
+                                related_name="+")
+    score = models.FloatField(default=0.0)
+
+    def __str__(self):
+        return str(self.article) + " -> " + str(self.related)
+
+    class Meta:
+        unique_together = ('article', 'related',)
+        ordering = ['article', '-score', ]
+
 
+IMAGE_VERSION_STATUSES = (
+    ("pending", "Pending"),
+    ("ready", "Ready"),
+    ("failed", "Failed"),
+)
+
+
+class ImageVersion(models.Model):
+    '''Status of the filebrowser renditions (versions) of images. They are
+    generated by the generateversions management command, so that saves
+    and requests never wait for an image to be resized. Until a version is
+    ready the original image is used.
+    '''
+    path = models.CharField(max_length=255)
+    version_suffix = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=IMAGE_VERSION_STATUSES,
+                              default="pending")
+    url = models.CharField(max_length=500, blank=True)
+    filesize = models.PositiveIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.path + " (" + self.version_suffix + ")"
+
+    '''Returns the ready version of the image, queueing it for generation
+    if necessary. Versions already on disk are marked ready straight away.
+    Returns None if the version isn't ready yet.
+    '''
+
+    @staticmethod
+    def get_ready(fileobject, version_suffix):
+        path = str(fileobject)
+        image_version = ImageVersion.objects.filter(
+            path=path, version_suffix=version_suffix).first()
+        if image_version is None:
+            defaults = {}
+            version_path = fileobject.version_path(version_suffix)
+            if fileobject.site.storage.isfile(version_path):
+                version = fileobject.__class__(version_path,
+                                               site=fileobject.site)
+                defaults = {"status": "ready", "url": version.url,
+                            "filesize": version.filesize}
+            image_version, _ = ImageVersion.objects.get_or_create(
+                path=path, version_suffix=version_suffix, defaults=defaults)
+        if image_version.status == "ready":
+            return image_version
+        return None
+
+    @staticmethod
+    def get_url(fileobject, version_suffix):
+        image_version = ImageVersion.get_ready(fileobject, version_suffix)
+        if image_version is None:
+            return fileobject.url
+        return image_version.url
+
+    @staticmethod
+    def queue(path, version_suffixes):
+        '''Queues the versions of an image to be (re)generated.'''
+        for version_suffix in version_suffixes:
+            ImageVersion.objects.update_or_create(
+                path=path, version_suffix=version_suffix,
+                defaults={"status": "pending", "error": ""})
+
+    class Meta:
+        unique_together = ('path', 'version_suffix',)
+        indexes = [
+            models.Index(fields=["status", "modified"],
+                         name="image_version_status_idx"),
+        ]
 
 
 class UserEdit(models.Model):
@@ -711,20 +1286,51 @@ class UserEdit(models.Model):
 
 class MostPopular(models.Model):
     '''This table's records each contain a list of the
-    most popular articles as returned by the management command
-    mostpopular.
+    most popular articles as returned by the management commands
+    mostpopular and mostpopular_piwik.
     The latest (or only) record in this table can be obtained
     by views that display the most popular articles.
-    The most popular articles are stored as a comma-delimited list
-    in the article_list field.
+    The ranking is stored in MostPopularArticle and the list is
+    rendered to HTML once, when the record is created, so that views
+    only have to read the html field.
+    The article_list field is a newline and pipe delimited copy of the
+    list. Older records only have this.
     '''
     article_list = models.TextField()
+    html = models.TextField(blank=True)
     created = models.DateTimeField(auto_now_add=True, editable=False)
     modified = models.DateTimeField(auto_now=True, editable=False)
 
     def __str__(self):
         return self.article_list[0:100]
 
+    @staticmethod
+    def create(ranking):
+        '''Takes a list of (article, score) tuples, most popular first,
+        and stores it as the latest most popular list.
+        '''
+        mostpopular = MostPopular()
+        mostpopular.article_list = "\n".join(
+            [article.slug + "|" + article.title for article, _ in ranking])
+        mostpopular.html = MostPopular.calc_html(
+            [(article.get_absolute_url(), article.title)
+             for article, _ in ranking])
+        mostpopular.save()
+        MostPopularArticle.objects.bulk_create(
+            [MostPopularArticle(mostpopular=mostpopular, article=article,
+                                rank=rank, score=score)
+             for rank, (article, score) in enumerate(ranking, 1)])
+        return mostpopular
+
+    @staticmethod
+    def calc_html(items):
+        if len(items) == 0:
+            return ""
+        html = "<ol class='most-popular'>"
+        for url, title in items:
+            html = html + "<li><a href='" + url + "'>" + title + "</a></li>"
+        return html + "</ol>"
+
     @staticmethod
     def get_most_popular_list():
         try:
@@ -737,16 +1343,21 @@ class MostPopular(models.Model):
 
     @staticmethod
     def get_most_popular_html():
-        article_list = MostPopular.get_most_popular_list()
-        if article_list is not None and len(article_list) > 1:
+        try:
+            mostpopular = MostPopular.objects.only("html", "article_list").\
+                latest("modified")
+        except MostPopular.DoesNotExist:
+            return ""
+        if mostpopular.html:
+            return mostpopular.html
+        # Legacy record without pre-rendered html
+        article_list = [item.split("|") for item in
+                        mostpopular.article_list.split("\n")]
+        if len(article_list) > 1:
             try:
-                html = "<ol class='most-popular'>"
-                for article in article_list:
-                    entry = "<li><a href='" + \
-                            reverse('newsroom:article.detail', args=[article[0]]) + \
-                            "'>" + article[1] + "</a></li>"
-                    html = html + entry
-                html = html + "</ol>"
+                html = MostPopular.calc_html(
+                    [(reverse('newsroom:article.detail', args=[article[0]]),
+                      article[1]) for article in article_list])
             except:
                 html = ""
         else:
@@ -756,6 +1367,21 @@ class MostPopular(models.Model):
     class Meta:
         verbose_name_plural = "most popular"
 
+
+class MostPopularArticle(models.Model):
+    mostpopular = models.ForeignKey(MostPopular, on_delete=models.CASCADE,
+                                    related_name="articles")
+    article = models.ForeignKey(Article, on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.rank) + ": " + str(self.article)
+
+    class Meta:
+        unique_together = ('mostpopular', 'rank',)
+        ordering = ['mostpopular', 'rank', ]
+
 # Signals
 
 
@@ -0,0 +1,169 @@
+'''Cursor (keyset) pagination for the article lists.
+
+Instead of a page number, the next and previous links carry the sort key of
+the last or first article on the page, e.g. ?after=0_20190304100000000000_123
+for (stickiness, published, id). Each page is fetched with a WHERE on the
+sort key and a LIMIT, so there is no COUNT(*) and no OFFSET scan, and the
+links stay stable when new articles are published.
+'''
+
+import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import Http404
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+CURSOR_SEPARATOR = "_"
+DATETIME_FORMAT = "%Y%m%d%H%M%S%f"
+
+
+def get_ordering(queryset):
+    '''Returns the queryset's ordering as a list of (field name, descending)
+    with the primary key added to break ties.
+    '''
+    ordering = list(queryset.query.order_by) or \
+        list(queryset.model._meta.ordering)
+    fields = []
+    for field in ordering:
+        if field.startswith("-"):
+            fields.append((field[1:], True))
+        else:
+            fields.append((field, False))
+    if not fields:
+        fields = [("pk", False)]
+    if fields[-1][0] not in ["pk", "id"]:
+        fields.append(("pk", fields[-1][1]))
+    return fields
+
+
+def encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value, timezone.utc). \
+            strftime(DATETIME_FORMAT)
+    return str(value)
+
+
+def decode_value(model, name, value):
+    if name == "pk":
+        field = model._meta.pk
+    else:
+        field = model._meta.get_field(name)
+    if field.get_internal_type() == "DateTimeField":
+        value = datetime.datetime.strptime(value, DATETIME_FORMAT)
+        return value.replace(tzinfo=timezone.utc)
+    return field.to_python(value)
+
+
+def encode_cursor(obj, ordering):
+    return CURSOR_SEPARATOR.join([encode_value(getattr(obj, name))
+                                  for name, descending in ordering])
+
+
+def decode_cursor(model, cursor, ordering):
+    values = cursor.split(CURSOR_SEPARATOR)
+    if len(values) != len(ordering):
+        raise ValueError("Cursor doesn't match ordering")
+    return [decode_value(model, name, value)
+            for (name, descending), value in zip(ordering, values)]
+
+
+def get_cursor_query(ordering, values, forwards=True):
+    '''Q matching the rows after (or before) the values in the ordering.'''
+    query = Q()
+    equal = Q()
+    for (name, descending), value in zip(ordering, values):
+        if descending == forwards:
+            lookup = name + "__lt"
+        else:
+            lookup = name + "__gt"
+        query = query | (equal & Q(**{lookup: value}))
+        equal = equal & Q(**{name: value})
+    return query
+
+
+def get_order_by(ordering, forwards=True):
+    return [("-" if descending == forwards else "") + name
+            for name, descending in ordering]
+
+
+class CursorPage:
+    '''Stands in for a Django Page in the article list templates.'''
+
+    is_cursor_page = True
+    paginator = None
+
+    def __init__(self, queryset, per_page, after=None, before=None):
+        ordering = get_ordering(queryset)
+        model = queryset.model
+        forwards = before is None
+        cursor = after if forwards else before
+        if cursor:
+            try:
+                values = decode_cursor(model, cursor, ordering)
+            except (ValueError, TypeError):
+                raise Http404("Invalid page.")
+            queryset = queryset.filter(get_cursor_query(ordering, values,
+                                                        forwards))
+        queryset = queryset.order_by(*get_order_by(ordering, forwards))
+        object_list = list(queryset[:per_page + 1])
+        more = len(object_list) > per_page
+        object_list = object_list[:per_page]
+        if forwards:
+            self._has_next = more
+            self._has_previous = bool(after)
+        else:
+            object_list.reverse()
+            self._has_next = True
+            self._has_previous = more
+        self.object_list = object_list
+        self.next_cursor = None
+        self.previous_cursor = None
+        if object_list and self._has_next:
+            self.next_cursor = encode_cursor(object_list[-1], ordering)
+        if object_list and self._has_previous:
+            self.previous_cursor = encode_cursor(object_list[0], ordering)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class CappedPaginator(Paginator):
+    '''Counts at most max_count objects, so a broad search doesn't count
+    every match. Pages are still fetched with LIMIT and OFFSET.
+    '''
+
+    def __init__(self, object_list, per_page, max_count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.max_count = max_count
+        self.capped = False
+
+    @cached_property
+    def count(self):
+        try:
+            count = self.object_list[:self.max_count + 1].count()
+        except (AttributeError, TypeError):
+            count = len(self.object_list[:self.max_count + 1])
+        self.capped = count > self.max_count
+        return min(count, self.max_count)
+
+    def set_count(self, count, capped=False):
+        '''For a page whose count is already known, e.g. from a cache.'''
+        self.__dict__["count"] = count
+        self.capped = capped
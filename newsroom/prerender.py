@@ -0,0 +1,299 @@
+'''Pre-rendered copies of the pages anonymous readers see most: the home
+page, the published articles and the first pages of the categories, topics
+and regions.
+
+Each page is written to PRERENDER_ROOT as <path>/index.html so that the web
+server can serve it without Django to requests without a session cookie,
+e.g. with nginx:
+
+    location / {
+        if ($cookie_sessionid = "") {
+            try_files /prerender$uri/index.html @django;
+        }
+        ...
+    }
+
+A page's file is out of date when the stamp of any of its dependencies,
+the same ones that answer conditional GETs (see last_changed in
+clearcache), is newer than the file. Rendering a page takes as long as a
+request for it, so saving an article doesn't render anything in the
+editor's request. Once the transaction commits it only removes the files
+of the pages the article is on, and was on before the save under its old
+slug, category and region, so the web server hands them to Django until
+they are written again, and queues them. The same happens when scheduled
+articles go live (see purge_scheduled in dependencies). The queue is a
+directory, PRERENDER_QUEUE, with a file per page, so processes queueing
+the same page at once don't lose anything. Running the prerender
+management command with --loop renders the queued pages within seconds.
+Run without --loop, e.g. from cron, it re-renders whatever else is out of
+date, like pages showing a changed sidebar, and removes the files of
+articles that are no longer published.
+
+Pre-rendering is off unless PRERENDER_ROOT is set.
+'''
+
+import hashlib
+import logging
+import os
+import shutil
+import time
+from urllib.parse import unquote
+
+from clearcache.utils import get_dependency, get_stamp
+from django.contrib.sites.models import Site
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.test import Client
+from django.urls import reverse
+
+from . import settings, views
+from .dependencies import scheduled_published
+from .models import Article, Category, Region, Topic
+
+logger = logging.getLogger(__name__)
+
+FILE_NAME = "index.html"
+
+
+def is_enabled():
+    return bool(settings.PRERENDER_ROOT)
+
+
+def get_path(url):
+    '''Returns the file a page is written to, or None if the URL would
+    fall outside PRERENDER_ROOT.
+    '''
+    root = os.path.abspath(settings.PRERENDER_ROOT)
+    path = os.path.normpath(os.path.join(root, unquote(url).lstrip("/"),
+                                         FILE_NAME))
+    if not path.startswith(root + os.sep):
+        return None
+    return path
+
+
+def get_queue_path():
+    return settings.PRERENDER_QUEUE or \
+        os.path.abspath(settings.PRERENDER_ROOT) + "-queue"
+
+
+def get_home_page():
+    return (reverse("newsroom:home"), views.get_home_dependencies(None))
+
+
+def get_article_page(pk, slug):
+    return (reverse("newsroom:article.detail", args=[slug]),
+            views.get_article_page_dependencies(pk))
+
+
+def get_list_page(obj):
+    return (obj.get_absolute_url(),
+            views.get_page_dependencies(get_dependency(obj)))
+
+
+def get_article_urls(article, loaded_values=None):
+    '''The URLs of the pages an article appears on, or would if it were
+    published, and of those it appeared on with its loaded_values.
+    '''
+    loaded_values = loaded_values or {}
+    urls = {article.get_absolute_url(), reverse("newsroom:home"),
+            article.category.get_absolute_url()}
+    urls.update(topic.get_absolute_url() for topic in article.topics.all())
+    regions = [article.region] if article.region else []
+    if loaded_values.get("slug") and loaded_values["slug"] != article.slug:
+        urls.add(reverse("newsroom:article.detail",
+                         args=[loaded_values["slug"]]))
+    if loaded_values.get("category_id", article.category_id) != \
+       article.category_id:
+        urls.update(category.get_absolute_url() for category in
+                    Category.objects.filter(pk=loaded_values["category_id"]))
+    if loaded_values.get("region_id", article.region_id) != \
+       article.region_id:
+        regions = regions + \
+            list(Region.objects.filter(pk=loaded_values["region_id"]))
+    for region in regions:
+        urls.update(breadcrumb.get_absolute_url()
+                    for breadcrumb in region.get_breadcrumbs())
+    return urls
+
+
+def get_all_pages():
+    yield get_home_page()
+    for model in [Category, Topic, Region]:
+        for obj in model.objects.all().iterator():
+            yield get_list_page(obj)
+    for pk, slug in Article.objects.published(). \
+            values_list("pk", "slug").iterator():
+        yield get_article_page(pk, slug)
+
+
+def is_stale(path, dependencies):
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return True
+    return get_stamp(*dependencies) > mtime
+
+
+def remove(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+        return True
+    return False
+
+
+def render(client, url):
+    '''Writes the page as an anonymous reader gets it. Pages that can't be
+    shared, like those setting cookies, aren't written. Returns True if
+    the page was written.
+    '''
+    path = get_path(url)
+    if path is None:
+        return False
+    started = time.time()
+    response = client.get(url, secure=settings.PRERENDER_SECURE)
+    if response.status_code != 200 or response.cookies or \
+       response.get("Content-Type", "").split(";")[0] != "text/html":
+        remove(path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(response.content)
+    # Anything changed while the page was rendering makes it stale
+    os.utime(temp_path, (started, started))
+    os.replace(temp_path, path)
+    return True
+
+
+def get_client():
+    return Client(HTTP_HOST=Site.objects.get_current().domain)
+
+
+def update_pages(pages, force=False):
+    '''Renders the pages that are out of date, or all of them if force is
+    set. Returns the number of pages written.
+    '''
+    client = get_client()
+    num_pages = 0
+    for url, dependencies in pages:
+        path = get_path(url)
+        if path and (force or is_stale(path, dependencies)):
+            try:
+                if render(client, url):
+                    num_pages = num_pages + 1
+            except Exception:
+                logger.exception("Pre-rendering %s", url)
+                remove(path)
+    return num_pages
+
+
+def remove_unpublished():
+    '''Removes the files of articles that aren't published. Returns the
+    number removed.
+    '''
+    # The directory holding a directory per article slug
+    directory = os.path.dirname(os.path.dirname(
+        get_path(reverse("newsroom:article.detail", args=["slug"]))))
+    if not os.path.isdir(directory):
+        return 0
+    published = set(Article.objects.published().
+                    values_list("slug", flat=True))
+    num_removed = 0
+    for slug in os.listdir(directory):
+        if slug not in published:
+            shutil.rmtree(os.path.join(directory, slug), ignore_errors=True)
+            num_removed = num_removed + 1
+    return num_removed
+
+
+def queue(urls):
+    directory = get_queue_path()
+    os.makedirs(directory, exist_ok=True)
+    for url in urls:
+        path = os.path.join(directory,
+                            hashlib.md5(url.encode()).hexdigest())
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(url)
+        os.replace(temp_path, path)
+
+
+def expire(urls):
+    '''Removes the files of the pages and queues them to be rendered
+    again. Returns the number removed.
+    '''
+    urls = [url for url in urls if get_path(url)]
+    queue(urls)
+    return len([url for url in urls if remove(get_path(url))])
+
+
+def render_queued():
+    '''Renders the queued pages. Pages that can't be rendered, like those
+    of unpublished articles, are left without a file. Returns the number
+    of pages written.
+    '''
+    directory = get_queue_path()
+    if not os.path.isdir(directory):
+        return 0
+    client = get_client()
+    num_pages = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".tmp"):
+            continue
+        try:
+            with open(path) as f:
+                url = f.read()
+            # Queued again if it changes while it renders
+            os.remove(path)
+        except OSError:
+            continue
+        try:
+            if render(client, url):
+                num_pages = num_pages + 1
+        except Exception:
+            logger.exception("Pre-rendering %s", url)
+            remove(get_path(url))
+    return num_pages
+
+
+def get_articles_urls(pks):
+    urls = set()
+    for article in Article.objects.filter(pk__in=pks). \
+            select_related("category", "region"):
+        urls.update(get_article_urls(article))
+    return urls
+
+
+def update_all(force=False):
+    '''Returns (pages written, pages removed).'''
+    return update_pages(get_all_pages(), force), remove_unpublished()
+
+
+# Signals
+
+@receiver(post_save, sender=Article)
+def expire_saved_article(sender, instance, **kwargs):
+    if is_enabled():
+        # The article's values from before the save are replaced once the
+        # save is done
+        loaded_values = dict(getattr(instance, "_loaded_values", None) or {})
+        transaction.on_commit(
+            lambda: expire(get_article_urls(instance, loaded_values)))
+
+
+@receiver(post_delete, sender=Article)
+def expire_deleted_article(sender, instance, **kwargs):
+    if is_enabled():
+        urls = get_article_urls(instance)
+        transaction.on_commit(lambda: expire(urls))
+
+
+@receiver(scheduled_published)
+def expire_scheduled_articles(sender, articles, **kwargs):
+    if is_enabled():
+        urls = set()
+        for article in articles:
+            urls.update(get_article_urls(article))
+        expire(urls)
@@ -0,0 +1,184 @@
+'''Who is editing an article, and whether someone has saved it since an
+editor opened it.
+
+The article edit pages send heartbeats to check_concurrent_edit. Each
+editor of an article has a key in the cache that expires PRESENCE_TTL
+seconds after their last heartbeat, so heartbeats never overwrite each
+other. An index key lists the editors of the article. It is only written
+when an editor isn't in it or when editors in it have dropped out, and an
+editor lost when two heartbeats write it at once is added again by their
+next heartbeat. The latest version of each article is also kept in the
+cache and set when it is saved, so a heartbeat doesn't read the article
+row.
+
+Heartbeats read these keys from the shared store, bypassing the
+in-process tier of the cache, because the other workers write them.
+
+By default a heartbeat is answered at once and the page sends the next one
+PRESENCE_DELAY seconds later. With threaded or async workers, setting
+PRESENCE_WAIT makes heartbeats long polls: each is answered as soon as the
+article is saved or its other editors change, or after PRESENCE_WAIT
+seconds.
+
+The UserEdit table is only a record of who edited what. It is written in
+one batch per article at most every PRESENCE_FLUSH_PERIOD seconds instead
+of on every heartbeat.
+'''
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from clearcache.utils import get_many_shared
+
+from . import settings
+from .models import Article, UserEdit
+
+KEY_PREFIX = "presence_"
+
+# The saved version is read from the database again after this, in case
+# an article was updated without saving it through the model
+VERSION_PERIOD = 5 * 60
+
+# The index outlives the editors in it, so that it isn't lost while they
+# are still editing
+INDEX_PERIOD = 24 * 60 * 60
+
+
+def get_editors_key(article_pk):
+    return KEY_PREFIX + "editors_" + str(article_pk)
+
+
+def get_editor_key(article_pk, user_pk):
+    return KEY_PREFIX + "editor_" + str(article_pk) + "_" + str(user_pk)
+
+
+def get_version_key(article_pk):
+    return KEY_PREFIX + "version_" + str(article_pk)
+
+
+def get_flush_key(article_pk):
+    return KEY_PREFIX + "flush_" + str(article_pk)
+
+
+def set_version(article_pk, version, user_pk):
+    cache.set(get_version_key(article_pk), (version, user_pk),
+              VERSION_PERIOD)
+
+
+def get_version(article_pk):
+    '''Returns (version, pk of the user who saved it) or None if there is
+    no such article.
+    '''
+    key = get_version_key(article_pk)
+    version = get_many_shared([key]).get(key)
+    if version is None:
+        version = Article.objects.filter(pk=article_pk). \
+            values_list("version", "user_id").first()
+        if version is not None:
+            set_version(article_pk, *version)
+    return version
+
+
+def get_index(article_pk):
+    key = get_editors_key(article_pk)
+    return get_many_shared([key]).get(key, [])
+
+
+def get_editors(article_pk, index=None):
+    '''Returns {user pk: (name, changed, time of last heartbeat)}.'''
+    if index is None:
+        index = get_index(article_pk)
+    keys = {get_editor_key(article_pk, user_pk): user_pk
+            for user_pk in index}
+    return {keys[key]: editor
+            for key, editor in get_many_shared(list(keys)).items()}
+
+
+def get_editor_names(editors, exclude_pk=None):
+    '''Returns the names of the editors in the form check_concurrent_edit
+    has always returned them.
+    '''
+    names = []
+    for pk, (name, changed, seen) in sorted(editors.items(),
+                                            key=lambda item: item[1][2]):
+        if pk != exclude_pk:
+            names.append(name + " (changed)" if changed else name)
+    return names
+
+
+def flush_user_edits(article_pk, editors):
+    '''Writes the editors' UserEdit rows with one query for each value of
+    changed and one for new rows.
+    '''
+    now = timezone.now()
+    existing = set(UserEdit.objects.
+                   filter(article_id=article_pk, user_id__in=editors.keys()).
+                   values_list("user_id", flat=True))
+    for changed in [True, False]:
+        user_pks = [pk for pk, editor in editors.items()
+                    if pk in existing and editor[1] == changed]
+        if user_pks:
+            UserEdit.objects.filter(article_id=article_pk,
+                                    user_id__in=user_pks). \
+                update(changed=changed, edit_time=now)
+    new_edits = [UserEdit(article_id=article_pk, user_id=pk,
+                          changed=editor[1])
+                 for pk, editor in editors.items() if pk not in existing]
+    if new_edits:
+        try:
+            with transaction.atomic():
+                UserEdit.objects.bulk_create(new_edits)
+        except IntegrityError:
+            # Another process wrote them first
+            pass
+
+
+def heartbeat(article_pk, user, changed):
+    '''Records that the user is editing the article. Returns the editors.'''
+    editor = (str(user), changed, time.time())
+    cache.set(get_editor_key(article_pk, user.pk), editor,
+              settings.PRESENCE_TTL)
+    index = get_index(article_pk)
+    editors = get_editors(article_pk, index)
+    editors[user.pk] = editor
+    if user.pk not in index or len(editors) < len(index):
+        cache.set(get_editors_key(article_pk), sorted(editors), INDEX_PERIOD)
+    if cache.add(get_flush_key(article_pk), True,
+                 settings.PRESENCE_FLUSH_PERIOD):
+        flush_user_edits(article_pk, editors)
+    return editors
+
+
+def wait_for_change(article_pk, user, version, known_names, wait):
+    '''Waits up to wait seconds for the article to be saved after version or
+    for its other editors to differ from known_names. Returns
+    (latest version, pk of the user who saved it, other editors' names).
+    '''
+    deadline = time.time() + wait
+    while True:
+        latest_version, saved_by = get_version(article_pk)
+        names = get_editor_names(get_editors(article_pk), user.pk)
+        if latest_version > version or names != known_names or \
+           time.time() >= deadline:
+            return latest_version, saved_by, names
+        time.sleep(settings.PRESENCE_POLL_INTERVAL)
+
+
+def get_user_name(user_pk):
+    try:
+        return str(User.objects.get(pk=user_pk))
+    except User.DoesNotExist:
+        return str(None)
+
+
+# Signals
+
+@receiver(post_save, sender=Article)
+def set_saved_version(sender, instance, **kwargs):
+    set_version(instance.pk, instance.version, instance.user_id)
@@ -2,6 +2,8 @@ from django.conf import settings
 
 ARTICLE_COPYRIGHT = getattr(settings, 'NEWSROOM_ARTICLE_COPYRIGHT', "")
 ARTICLES_PER_PAGE = getattr(settings, 'NEWSROOM_ARTICLES_PER_PAGE', 16)
+# Paginate the article lists by sort key instead of page number
+CURSOR_PAGINATION = getattr(settings, 'NEWSROOM_CURSOR_PAGINATION', False)
 BEAUTIFUL_SOUP_PARSER = getattr(settings, 'NEWSROOM_BEAUTIFUL_SOUP_PARSER',
                                 "lxml")
 ARTICLE_SUMMARY_IMAGE_SIZE = getattr(settings,
@@ -10,7 +12,44 @@ ARTICLE_SUMMARY_IMAGE_SIZE = getattr(settings,
 ARTICLE_PRIMARY_IMAGE_SIZE = getattr(settings,
                                      'NEWSROOM_ARTICLE_TEASER_IMAGE_SIZE',
                                      "extra_large")
+# Worker processes for generateversions (None uses the number of CPUs)
+IMAGE_VERSION_PROCESSES = getattr(settings, 'NEWSROOM_IMAGE_VERSION_PROCESSES',
+                                  None)
 CACHE_PERIOD = getattr(settings, 'NEWSROOM_CACHE_PERIOD', 10 * 60)
+# Feed bodies are purged when articles are published, so can be kept longer
+FEED_CACHE_PERIOD = getattr(settings, 'NEWSROOM_FEED_CACHE_PERIOD', 60 * 60)
+# Sitemap shards are also rendered again when their content changes
+SITEMAP_CACHE_PERIOD = getattr(settings, 'NEWSROOM_SITEMAP_CACHE_PERIOD',
+                               7 * 24 * 60 * 60)
+# Directory the pages for anonymous readers are pre-rendered to (see
+# prerender.py). Pre-rendering is off if it isn't set.
+PRERENDER_ROOT = getattr(settings, 'NEWSROOM_PRERENDER_ROOT', None)
+# Directory of the pages waiting to be pre-rendered again. It must be
+# outside PRERENDER_ROOT and defaults to PRERENDER_ROOT with -queue added.
+PRERENDER_QUEUE = getattr(settings, 'NEWSROOM_PRERENDER_QUEUE', None)
+# Render the pages as if requested over HTTPS
+PRERENDER_SECURE = getattr(settings, 'NEWSROOM_PRERENDER_SECURE', False)
+FRAGMENT_CACHE_PERIOD = getattr(settings, 'NEWSROOM_FRAGMENT_CACHE_PERIOD',
+                                CACHE_PERIOD)
+# Editors drop out of an article's list this long after their last heartbeat
+PRESENCE_TTL = getattr(settings, 'NEWSROOM_PRESENCE_TTL', 60)
+# Longest a heartbeat is held open waiting for a change. Each waiting
+# heartbeat holds a worker, so only set this with threaded or async
+# workers. With 0 heartbeats are answered at once.
+PRESENCE_WAIT = getattr(settings, 'NEWSROOM_PRESENCE_WAIT', 0)
+PRESENCE_POLL_INTERVAL = getattr(settings, 'NEWSROOM_PRESENCE_POLL_INTERVAL',
+                                 1)
+# Seconds the edit page waits before sending the next heartbeat
+PRESENCE_DELAY = getattr(settings, 'NEWSROOM_PRESENCE_DELAY',
+                         1 if PRESENCE_WAIT else 10)
+PRESENCE_FLUSH_PERIOD = getattr(settings, 'NEWSROOM_PRESENCE_FLUSH_PERIOD',
+                                60)
+SIDEBAR_ITEMS = getattr(settings, 'NEWSROOM_SIDEBAR_ITEMS', 5)
+RELATED_INDEX_SIZE = getattr(settings, 'NEWSROOM_RELATED_INDEX_SIZE', 10)
+RELATED_CANDIDATES = getattr(settings, 'NEWSROOM_RELATED_CANDIDATES', 500)
+RECOMMENDED_DAYS_BACK = getattr(settings, 'NEWSROOM_RECOMMENDED_DAYS_BACK', 10)
+RECOMMENDED_POOL_PERIOD = getattr(settings,
+                                  'NEWSROOM_RECOMMENDED_POOL_PERIOD', 60 * 60)
 ADVERT_CODE = getattr(settings, 'NEWSROOM_ADVERT_CODE', '')
 # ADVERT_CODE_1 = getattr(settings, 'NEWSROOM_ADVERT_CODE_1', '')
 # ADVERT_CODE_2 = getattr(settings, 'NEWSROOM_ADVERT_CODE_2', '')
@@ -24,5 +63,15 @@ SEARCH_RESULTS_PER_PAGE = getattr(settings, 'NEWSROOM_SEARCH_RESULTS_PER_PAGE',
 MAX_SEARCH_RESULTS = getattr(settings, 'NEWSROOM_MAX_SEARCH_RESULTS', 50)
 SEARCH_CONFIG = getattr(settings, 'NEWSROOM_SEARCH_CONFIG', 'english')
 SEARCH_MAXLEN = getattr(settings, 'NEWSROOM_SEARCH_MAXLEN', 60)
+# Most results returned by the autocomplete lookups
+AUTOCOMPLETE_LIMIT = getattr(settings, 'NEWSROOM_AUTOCOMPLETE_LIMIT', 10)
+SEARCH_CACHE_PERIOD = getattr(settings, 'NEWSROOM_SEARCH_CACHE_PERIOD',
+                              10 * 60)
+# Searches count at most this many results
+SEARCH_MAX_COUNT = getattr(settings, 'NEWSROOM_SEARCH_MAX_COUNT', 1000)
+SEARCH_SNIPPET_LENGTH = getattr(settings, 'NEWSROOM_SEARCH_SNIPPET_LENGTH',
+                                1000)
+SEARCH_SNIPPET_CONTEXT = getattr(settings, 'NEWSROOM_SEARCH_SNIPPET_CONTEXT',
+                                 200)
 
 LOGO = getattr(settings, 'NEWSROOM_LOGO', 'newsroom/images/GroundUpLogo.png')
@@ -0,0 +1,174 @@
+'''Sitemap index split by section and by month or year.
+
+The index lists one sitemap per section and period, e.g.
+/sitemap-articles-2019-03.xml, with its lastmod taken from a grouped
+aggregate query. Each shard is rendered once and kept in the cache with the
+latest modified time and row count of its range, so it is only rendered
+again when something in that range is added, changed or removed. The index
+is cached the same way, against the latest modified time and row count of
+each section.
+'''
+
+import datetime
+from collections import OrderedDict
+
+from django.contrib.flatpages.sitemaps import FlatPageSitemap
+from django.contrib.sitemaps import GenericSitemap
+from django.contrib.sitemaps import views as sitemap_views
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.db.models.functions import TruncMonth, TruncYear
+from django.http import Http404, HttpResponse
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from gallery.models import Photograph
+
+from . import settings
+from .models import Article, Author
+
+SHARD_KEY_PREFIX = "sitemap_"
+INDEX_KEY = SHARD_KEY_PREFIX + "index"
+PAGES_SECTION = "pages"
+
+
+class Section:
+    '''A section of the sitemap sharded by the month or year of
+    shard_field. Items' lastmod is date_field, as with GenericSitemap.
+    '''
+
+    def __init__(self, get_queryset, shard_field, date_field,
+                 period="month", modified_field="modified", priority=0.5,
+                 changefreq=None):
+        self.get_queryset = get_queryset
+        self.shard_field = shard_field
+        self.date_field = date_field
+        self.period = period
+        self.modified_field = modified_field
+        self.priority = priority
+        self.changefreq = changefreq
+
+    def format_shard(self, start):
+        if self.period == "month":
+            return start.strftime("%Y-%m")
+        return start.strftime("%Y")
+
+    def get_range(self, shard):
+        try:
+            if self.period == "month":
+                start = datetime.datetime.strptime(shard, "%Y-%m")
+                if start.month == 12:
+                    end = start.replace(year=start.year + 1, month=1)
+                else:
+                    end = start.replace(month=start.month + 1)
+            else:
+                start = datetime.datetime.strptime(shard, "%Y")
+                end = start.replace(year=start.year + 1)
+        except (TypeError, ValueError):
+            raise Http404("No such sitemap")
+        return timezone.make_aware(start), timezone.make_aware(end)
+
+    def get_shards(self):
+        '''Returns (shard, lastmod) for each shard, latest first.'''
+        if self.period == "month":
+            trunc = TruncMonth(self.shard_field)
+        else:
+            trunc = TruncYear(self.shard_field)
+        shards = self.get_queryset(). \
+            filter(**{self.shard_field + "__isnull": False}). \
+            annotate(shard=trunc).values_list("shard"). \
+            annotate(lastmod=Max(self.modified_field)).order_by("-shard")
+        return [(self.format_shard(timezone.localtime(start)
+                                   if timezone.is_aware(start) else start),
+                 lastmod)
+                for start, lastmod in shards]
+
+    def get_shard_queryset(self, shard):
+        start, end = self.get_range(shard)
+        return self.get_queryset().filter(
+            **{self.shard_field + "__gte": start,
+               self.shard_field + "__lt": end})
+
+    def get_state(self, queryset):
+        '''What a cached shard is checked against.'''
+        return queryset.aggregate(lastmod=Max(self.modified_field),
+                                  count=Count("pk"))
+
+    def get_sitemap(self, queryset):
+        return GenericSitemap({'queryset': queryset,
+                               'date_field': self.date_field},
+                              priority=self.priority,
+                              changefreq=self.changefreq)
+
+
+SECTIONS = OrderedDict([
+    ("articles", Section(lambda: Article.objects.published(),
+                         "published", "published")),
+    ("authors", Section(lambda: Author.objects.all(), "created", "modified",
+                        period="year", changefreq="weekly")),
+    ("photos", Section(lambda: Photograph.objects.all(), "created",
+                       "modified")),
+])
+
+
+def get_location(request, name, shard=None):
+    if shard:
+        location = reverse("sitemap.section", args=[name, shard])
+    else:
+        location = reverse("sitemap.pages")
+    return request.build_absolute_uri(location)
+
+
+def index(request):
+    # The locations are absolute
+    state = [request.build_absolute_uri("/")] + \
+        [section.get_state(section.get_queryset())
+         for section in SECTIONS.values()]
+    cached = cache.get(INDEX_KEY)
+    if cached and cached[0] == state:
+        return HttpResponse(cached[1], content_type="application/xml")
+    sitemaps = []
+    for name, section in SECTIONS.items():
+        for shard, lastmod in section.get_shards():
+            sitemaps.append({"location": get_location(request, name, shard),
+                             "lastmod": lastmod})
+    sitemaps.append({"location": get_location(request, PAGES_SECTION)})
+    response = TemplateResponse(request, "sitemaps/index.xml",
+                                {"sitemaps": sitemaps},
+                                content_type="application/xml")
+    content = response.render().content
+    cache.set(INDEX_KEY, (state, content), settings.SITEMAP_CACHE_PERIOD)
+    return response
+
+
+def pages(request):
+    return sitemap_views.sitemap(request, {PAGES_SECTION: FlatPageSitemap})
+
+
+def section(request, name, shard):
+    try:
+        sitemap_section = SECTIONS[name]
+    except KeyError:
+        raise Http404("No such sitemap")
+    queryset = sitemap_section.get_shard_queryset(shard)
+    state = sitemap_section.get_state(queryset)
+    if state["count"] == 0:
+        raise Http404("No such sitemap")
+    page = request.GET.get("p", "1")
+    key = SHARD_KEY_PREFIX + "_".join([name, shard, page])
+    cached = cache.get(key)
+    if cached and cached[0] == state:
+        content = cached[1]
+    else:
+        response = sitemap_views.sitemap(
+            request, {name: sitemap_section.get_sitemap(queryset)})
+        if response.status_code != 200:
+            return response
+        content = response.render().content
+        cache.set(key, (state, content), settings.SITEMAP_CACHE_PERIOD)
+    response = HttpResponse(content, content_type="application/xml")
+    response["X-Robots-Tag"] = "noindex, noodp, noarchive"
+    if state["lastmod"]:
+        response["Last-Modified"] = http_date(state["lastmod"].timestamp())
+    return response
@@ -38,13 +38,15 @@ $(document).ready(function() {
 	    data: {
                 "pk": {{pk}},
                 "version": {{version}},
-                "changed": checkFormChanged()
+                "changed": checkFormChanged(),
+                "users": other_users
             },
 	    dataType: 'json',
 	    success: function(json){
 	        edited_by = json["edited_by"];
+	        other_users = json["users"];
 	        if (edited_by != "(None)") {
-		    clearTimeout(timerCheckConcurrency);
+		    checking = false;
 		    $("form :input").attr("readonly","readonly");
 		    for(name in CKEDITOR.instances) {
 		        CKEDITOR.instances[name].setReadOnly();
@@ -83,17 +85,28 @@ $(document).ready(function() {
 	    },
 	    error: function(data){
 	        console.log("Error: ", data);
+	    },
+	    complete: function(xhr){
+	        // The server says how long to wait before the next check: a
+	        // few seconds, or less if it held the request open
+	        var delay = 10;
+	        if (xhr.responseJSON && "delay" in xhr.responseJSON)
+		    delay = xhr.responseJSON["delay"];
+	        if (checking) {
+		    timerCheckConcurrency = window.setTimeout(
+		        manageConcurrentEditing, delay * 1000);
+	        }
 	    }
         });
     }
 
+    var checking = true;
+    var other_users = [];
+    var timerCheckConcurrency;
     manageConcurrentEditing();
 
-    timerCheckConcurrency = window.setInterval(function(){
-        manageConcurrentEditing();
-    }, 10000);
-
     $('#saveedits').click(function(event){
+        checking = false;
         clearTimeout(timerCheckConcurrency);
     });
 
@@ -108,6 +121,7 @@ $(document).ready(function() {
     });
 
     $("#article_form").submit(function() {
+        checking = false;
         clearTimeout(timerCheckConcurrency);
         save_clicked = true;
         return true;
@@ -0,0 +1,54 @@
+'''Caches the parts of a page that are the same for staff and readers.
+
+Staff get uncached pages (see cache_except_staff), because parts of them,
+like the staff menu, the edit form and the notices, are theirs alone. The
+include_shared tag renders the rest from the cache for them too:
+
+    {% load shared_fragments %}
+    {% include_shared "newsroom/list.html" articles=article_list %}
+
+The rendered template is cached against the path and the latest stamp of
+every dependency the view has added to the request, like the related and
+next articles on an article page, so it is rendered again as soon as
+anything on the page changes. Positional
+arguments after the template name are added to the key, for values the
+template varies on like can_edit. Keyword arguments are added to the
+context, as with include's "with".
+
+Pages without dependencies and requests other than GETs, like an article
+edit that is redisplayed with errors, are never cached.
+'''
+
+import hashlib
+
+from clearcache.utils import get_stamp
+from django import template
+from django.utils.safestring import mark_safe
+
+from newsroom import fragments
+
+register = template.Library()
+
+
+def get_shared_fragment_name(request, template_name, vary_on):
+    stamp = get_stamp(*sorted(request.cache_dependencies))
+    key = ":".join([template_name, repr(stamp),
+                    request.get_full_path()] +
+                   [str(value) for value in vary_on])
+    return "shared_" + hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+@register.simple_tag(takes_context=True)
+def include_shared(context, template_name, *vary_on, **values):
+    request = context.get("request")
+    shared_template = context.template.engine.get_template(template_name)
+
+    def render():
+        with context.push(**values):
+            return shared_template.render(context)
+
+    if request is None or request.method != "GET" or \
+       not getattr(request, "cache_dependencies", None):
+        return mark_safe(render())
+    name = get_shared_fragment_name(request, template_name, vary_on)
+    return mark_safe(fragments.get_fragment(name, render))
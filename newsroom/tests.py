@@ -1,17 +1,31 @@
 import datetime
+import os
+import shutil
+import tempfile
 from decimal import *
+from unittest import mock
 
 from bs4 import BeautifulSoup as bs
+from django.conf import settings as django_settings
+from django.contrib.auth.models import Permission, User
 from django.db import IntegrityError
-from django.test import Client, TestCase
+from django.test import Client, RequestFactory, TestCase
 from django.utils import timezone
+from filebrowser.base import FileObject
+from PIL import Image
 from letters.models import Letter
-from newsroom import utils
-from newsroom.models import Article, Category, Topic, Author
+from newsroom import bulk, dependencies, fragments, imageversions, \
+    prerender, presence, settings, sitemaps, utils, views
+from newsroom.models import Article, Category, Topic, Author, ImageVersion, \
+    MostPopular, Region, UserEdit
+from pgsearch.cache import getSearchStats
 from pgsearch.utils import searchPostgresDB
 from django.contrib.sites.models import Site
 from django.contrib.flatpages.models import FlatPage
 from django.urls import reverse
+from django.core.cache import cache
+from agony.models import QandA
+from clearcache.utils import get_dependency, get_stamp
 
 class HtmlCleanUp(TestCase):
 
@@ -45,6 +59,36 @@ class HtmlCleanUp(TestCase):
         html3 = str(utils.processDashes(bs(html1, "html.parser")))
         self.assertEqual(html2, html3)
 
+    def test_single_pass_cleaner(self):
+        """All the editor fixes are applied in one walk of the tree"""
+
+        html = '<p><span id="docs-internal-guid-1234">Hello <b>there</b> -- you</span></p>'
+        self.assertEqual(utils.replaceBadHtmlWithGood(html),
+                         '<p>Hello <b>there</b> \u2013 you</p>')
+        html = '<ul><li><div class="editor-summary">One</div></li>' \
+               '<li><div class="editor-summary">Two</div></li></ul>'
+        self.assertEqual(utils.replaceBadHtmlWithGood(html),
+                         '<div class="editor-summary"><ul><li><div>One</div></li>'
+                         '<li><div>Two</div></li></ul></div>')
+        html = '<div class="youtube">&lt;iframe src="https://youtube.com/x"&gt;&lt;/iframe&gt;</div>'
+        self.assertEqual(utils.replaceBadHtmlWithGood(html),
+                         '<div class="embed-responsive embed-responsive-16by9">'
+                         '<iframe src="https://youtube.com/x"></iframe></div>')
+        html = '<p><img src="/media/_versions/images/dog_extra_large.jpg" height="10" width="20"/></p>'
+        self.assertEqual(utils.replaceBadHtmlWithGood(html),
+                         '<p><a class="bigger-image" href="/media/uploads/images/dog.jpg" target="_blank">'
+                         '<img src="/media/_versions/images/dog_extra_large.jpg"/></a></p>')
+
+    def test_public_body(self):
+        """Support us asides are pre-rendered with a placeholder image"""
+
+        html = '<p>Hello</p><aside class="supportus-edit">Support us</aside>'
+        rendered = utils.renderPublicBody(html)
+        self.assertIn('<aside class="supportus">', rendered)
+        self.assertIn(utils.SUPPORT_US_IMAGE_PLACEHOLDER, rendered)
+        served = utils.chooseSupportUsImages(rendered)
+        self.assertNotIn(utils.SUPPORT_US_IMAGE_PLACEHOLDER, served)
+
 
 class ArticleTest(TestCase):
 
@@ -157,6 +201,16 @@ class ArticleTest(TestCase):
         response = client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    def test_public_body_version(self):
+        article = Article.objects.get(slug="test-article-1")
+        self.assertEqual(article.cached_public_body_version, article.version)
+        Article.objects.filter(pk=article.pk).update(
+            cached_public_body_version=0)
+        article = Article.objects.get(slug="test-article-1")
+        self.assertEqual(article.get_public_body(), article.body)
+        article = Article.objects.get(slug="test-article-1")
+        self.assertEqual(article.cached_public_body_version, article.version)
+
     def test_duplicate_save(self):
         a = Article()
         a.title = "Test article 3"
@@ -250,6 +304,478 @@ class ArticleTest(TestCase):
         for l in letters:
             self.assertEqual(l.notified_letter_writer, True)
 
+    def test_sidebar_fragments(self):
+        cache.delete(fragments.get_fragment_key("agony"))
+        self.assertEqual(fragments.get_agony(), [])
+        qanda = QandA()
+        qanda.summary_question = "Can I get a refund?"
+        qanda.published = timezone.now()
+        qanda.save()
+        self.assertEqual(fragments.get_agony(), [qanda])
+        qanda.delete()
+        self.assertEqual(fragments.get_agony(), [])
+
+    def test_most_popular(self):
+        cache.delete(fragments.get_fragment_key("most_popular"))
+        self.assertEqual(fragments.get_most_popular_html(), "")
+        articles = Article.objects.published()
+        MostPopular.create([(articles[1], 20), (articles[0], 10)])
+        html = "<ol class='most-popular'>" \
+               "<li><a href='/article/test-article-1/'>Test article 1</a></li>" \
+               "<li><a href='/article/test-article-2/'>Test article 2</a></li>" \
+               "</ol>"
+        self.assertEqual(MostPopular.get_most_popular_html(), html)
+        self.assertEqual(fragments.get_most_popular_html(), html)
+        mostpopular = MostPopular.objects.latest("modified")
+        self.assertEqual([item.article for item in mostpopular.articles.all()],
+                         [articles[1], articles[0]])
+
+    def test_recommended(self):
+        article = Article.objects.get(slug="test-article-1")
+        recommended = article.get_recommended()
+        self.assertEqual([a.slug for a in recommended], ["test-article-2"])
+        self.assertIn(article.pk, Article.get_recommended_pool())
+        article.recommended = False
+        article.save()
+        self.assertNotIn(article.pk, Article.get_recommended_pool())
+
+    def test_related(self):
+        topic = Topic.objects.get(slug="government")
+        other = Topic.objects.create(name="health", slug="health")
+        articles = []
+        for i, title in enumerate(["Budget cuts hit clinics",
+                                   "Clinics face budget cuts",
+                                   "Election results announced"]):
+            a = Article()
+            a.title = title
+            a.slug = "related-" + str(i)
+            a.category = Category.objects.get(name="News")
+            a.main_topic = topic
+            a.save()
+            a.topics.add(topic)
+            a.publish_now()
+            articles.append(a)
+        articles[0].topics.add(other)
+        articles[1].topics.add(other)
+        from newsroom.management.commands import buildrelated
+        self.assertEqual(buildrelated.process(), 3)
+        self.assertEqual(articles[0].get_related(),
+                         [articles[1], articles[2]])
+        self.assertEqual(set(articles[2].get_related()),
+                         set([articles[0], articles[1]]))
+
+    def test_next_prev(self):
+        article1 = Article.objects.get(slug="test-article-1")
+        article2 = Article.objects.get(slug="test-article-2")
+        self.assertEqual(article1.get_next_article(), article2)
+        self.assertEqual(article1.get_prev_article(), None)
+        self.assertEqual(article2.get_prev_article(), article1)
+        a = Article()
+        a.title = "Test article 3"
+        a.slug = "test-article-3"
+        a.category = Category.objects.get(name="News")
+        a.save()
+        a.publish_now()
+        article2 = Article.objects.get(slug="test-article-2")
+        self.assertEqual(article2.get_next_article(), a)
+
+    def test_article_authors(self):
+        author = Author.objects.get(last_name="Bloggs")
+        other = Author.objects.create(first_names="Jane", last_name="Doe")
+        article = Article.objects.get(slug="test-article-2")
+        self.assertEqual(article.get_authors(), [author])
+        self.assertEqual(list(Article.objects.by_author(author)), [article])
+        article.author_01 = other
+        article.author_02 = author
+        article.save()
+        self.assertEqual(article.get_authors(), [other, author])
+        self.assertEqual(list(Article.objects.by_author(author)), [article])
+        self.assertEqual(Article.objects.by_author(
+            author, first_author=True).count(), 0)
+        article = Article.objects.get(slug="test-article-1")
+        article.byline = "Text and photos by Joe Bloggs"
+        article.save()
+        self.assertEqual(article.get_authors(), [])
+        self.assertEqual(Article.objects.by_author(author).count(), 1)
+        self.assertEqual(Article.objects.by_author(
+            author, in_byline=True).count(), 2)
+        # The byline is only checked against every author when it changes
+        article.author_01 = other
+        with mock.patch.object(Author.objects, "exclude") as exclude:
+            article.save()
+            exclude.assert_not_called()
+        self.assertEqual(Article.objects.by_author(
+            author, in_byline=True).count(), 2)
+        response = Client().get(reverse("newsroom:author.detail",
+                                        args=(author.pk,)))
+        self.assertContains(response, "test-article-1")
+
+    def test_regions(self):
+        town = Region.objects.create(name="South Africa/Western Cape/Paarl",
+                                     slug="paarl")
+        country = Region.objects.create(name="South Africa",
+                                        slug="south-africa")
+        town.refresh_from_db()
+        self.assertEqual(town.parent, country)
+        self.assertEqual(town.depth, 2)
+        province = Region.objects.create(name="South Africa/Western Cape",
+                                         slug="western-cape")
+        town.refresh_from_db()
+        self.assertEqual(town.parent, province)
+        self.assertEqual(town.get_breadcrumbs(), [country, province, town])
+        self.assertEqual(set(country.get_descendants()), {province, town})
+        self.assertEqual(set(country.get_region_ids()),
+                         {country.pk, province.pk, town.pk})
+        article = Article.objects.get(slug="test-article-1")
+        article.region = town
+        article.save()
+        response = Client().get(reverse("newsroom:region.detail",
+                                        args=("South Africa/Western Cape",)))
+        self.assertContains(response, "test-article-1")
+        self.assertContains(response, ">Western Cape</a>")
+        province.name = "South Africa/Cape"
+        province.save()
+        town.refresh_from_db()
+        self.assertEqual(town.parent, country)
+        self.assertEqual(town.path, "/" + str(country.pk) + "/")
+
+    def test_cursor_pagination(self):
+        category = Category.objects.create(name="Cursor", slug="cursor")
+        now = timezone.now()
+        for i in range(5):
+            Article.objects.create(title="Cursor " + str(i),
+                                   slug="cursor-" + str(i),
+                                   category=category,
+                                   published=now - datetime.timedelta(
+                                       days=i % 3))
+        expected = list(Article.objects.list_view().filter(
+            category=category).order_by("-stickiness", "-published", "-id"))
+        view = views.CategoryDetail.as_view(cursor_pagination=True,
+                                            paginate_by=2)
+        articles = []
+        query = {}
+        while True:
+            response = view(RequestFactory().get("/category/cursor/", query),
+                            "Cursor")
+            page = response.context_data["page_obj"]
+            articles = articles + page.object_list
+            if not page.has_next():
+                break
+            query = {"after": page.next_cursor}
+        self.assertEqual(articles, expected)
+        response = view(RequestFactory().get(
+            "/category/cursor/", {"before": page.previous_cursor}), "Cursor")
+        page = response.context_data["page_obj"]
+        self.assertEqual(page.object_list, expected[2:4])
+        response.render()
+        self.assertIn("?after=" + page.next_cursor,
+                      response.content.decode("utf-8"))
+        response = view(RequestFactory().get("/category/cursor/",
+                                             {"page": 2}), "Cursor")
+        # Numbered pages don't break ties on the publication time by id
+        self.assertEqual(set(response.context_data["page_obj"]),
+                         set(expected[2:4]))
+
+    def test_changed_fields(self):
+        article = Article.objects.get(slug="test-article-1")
+        version = article.version
+        self.assertEqual(article.get_changed_fields(), set())
+        with mock.patch.object(Article, "calc_byline") as calc_byline, \
+                mock.patch.object(Article, "calc_public_body") as calc_body:
+            article.notified_authors = True
+            article.save()
+            self.assertEqual(Article.objects.get(pk=article.pk).version,
+                             version)
+            article.stickiness = 1
+            article.save()
+            article.unsticky()
+            calc_byline.assert_not_called()
+            calc_body.assert_not_called()
+        article = Article.objects.get(slug="test-article-1")
+        self.assertEqual(article.version, version + 2)
+        self.assertEqual(article.stickiness, 0)
+        self.assertTrue(article.notified_authors)
+        article.title = "It's a test"
+        article.author_01 = Author.objects.get(last_name="Bloggs")
+        article.save()
+        self.assertEqual(article.get_changed_fields(), set())
+        article = Article.objects.get(slug="test-article-1")
+        self.assertEqual(article.version, version + 3)
+        self.assertEqual(article.title, "It’s a test")
+        self.assertEqual(article.cached_byline_no_links, "By Joe Bloggs")
+
+    def test_bulk_operations(self):
+        articles = Article.objects.filter(slug__startswith="test-article")
+        versions = dict(articles.values_list("pk", "version"))
+        opinion = Category.objects.get(slug="opinion")
+        topic = Topic.objects.get(slug="government")
+        stamp = get_stamp(get_dependency(opinion))
+        generation = Article.get_neighbours_generation()
+        with mock.patch.object(Article, "calc_byline") as calc_byline, \
+                mock.patch.object(Article, "clean_typography") as clean:
+            self.assertEqual(bulk.unpublish(articles), 2)
+            self.assertEqual(bulk.unpublish(articles), 0)
+            self.assertEqual(Article.objects.published().count(), 0)
+            self.assertNotEqual(Article.get_neighbours_generation(),
+                                generation)
+            self.assertGreater(get_stamp(get_dependency(opinion)), stamp)
+            self.assertEqual(bulk.publish(articles), 2)
+            self.assertEqual(bulk.set_category(articles, opinion), 1)
+            self.assertEqual(bulk.add_topic(articles, topic), 2)
+            self.assertEqual(bulk.set_include_in_rss(articles, False), 2)
+            calc_byline.assert_not_called()
+            clean.assert_not_called()
+        for article in articles:
+            self.assertEqual(article.category, opinion)
+            self.assertFalse(article.include_in_rss)
+            self.assertIn(topic, article.topics.all())
+            self.assertGreater(article.version, versions[article.pk])
+            self.assertEqual(article.cached_public_body_version,
+                             article.version)
+        article = articles.get(slug="test-article-1")
+        article.main_topic = topic
+        article.save()
+        self.assertEqual(bulk.remove_topic(articles, topic), 2)
+        self.assertIsNone(articles.get(slug="test-article-1").main_topic)
+        # Editors with the article open see the new version
+        self.assertEqual(presence.get_version(article.pk)[0],
+                         articles.get(pk=article.pk).version)
+        article.make_top_story()
+        self.assertEqual(article.stickiness, 1)
+        other = articles.exclude(pk=article.pk).get()
+        other.user = User.objects.create_user("editor")
+        other.save()
+        other.make_top_story()
+        self.assertEqual(list(Article.objects.filter(stickiness__gt=0).
+                              values_list("slug", flat=True)),
+                         ["test-article-2"])
+        # Making it the top story doesn't claim the article it replaced
+        self.assertEqual(articles.get(pk=article.pk).user, article.user)
+
+    def test_prerender(self):
+        root = tempfile.mkdtemp()
+        try:
+            with mock.patch.object(settings, "PRERENDER_ROOT", root):
+                written, removed = prerender.update_all()
+                self.assertGreater(written, 2)
+                self.assertEqual(prerender.update_all(), (0, 0))
+                article = Article.objects.get(slug="test-article-1")
+                path = prerender.get_path(article.get_absolute_url())
+                with open(path) as f:
+                    self.assertIn("Test article 1", f.read())
+                # Saving removes the pages the article is on and was on
+                # under its old slug and category, to be rendered again
+                category_path = prerender.get_path(
+                    article.category.get_absolute_url())
+                article.title = "Prerendered article"
+                article.slug = "prerendered-article"
+                article.category = Category.objects.get(slug="opinion")
+                with mock.patch("newsroom.prerender.transaction.on_commit",
+                                lambda func: func()):
+                    article.save()
+                self.assertFalse(os.path.exists(path))
+                self.assertFalse(os.path.exists(category_path))
+                self.assertEqual(prerender.render_queued(), 4)
+                self.assertTrue(os.path.exists(category_path))
+                new_path = prerender.get_path(article.get_absolute_url())
+                with open(new_path) as f:
+                    self.assertIn("Prerendered article", f.read())
+                with open(prerender.get_path("/")) as f:
+                    self.assertIn("Prerendered article", f.read())
+                article.published = None
+                article.save()
+                prerender.expire(prerender.get_article_urls(article))
+                self.assertEqual(prerender.render_queued(), 2)
+                self.assertFalse(os.path.exists(new_path))
+                # Scheduled articles are rendered when they go live
+                cache.delete(dependencies.SCHEDULED_KEY)
+                dependencies.purge_scheduled()
+                publish_time = timezone.now() + datetime.timedelta(hours=1)
+                Article.objects.create(
+                    title="Scheduled article", slug="scheduled-article",
+                    category=Category.objects.get(slug="news"),
+                    published=publish_time)
+                with mock.patch("django.utils.timezone.now",
+                                return_value=publish_time +
+                                datetime.timedelta(minutes=1)):
+                    self.assertEqual(dependencies.purge_scheduled(), 1)
+                    self.assertGreater(prerender.render_queued(), 2)
+                with open(prerender.get_path("/")) as f:
+                    self.assertIn("Scheduled article", f.read())
+        finally:
+            shutil.rmtree(root)
+            shutil.rmtree(root + "-queue", ignore_errors=True)
+
+    def test_image_versions(self):
+        path = os.path.join(django_settings.MEDIA_ROOT, "uploads", "tests",
+                            "imageversion-test.png")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new("RGB", (200, 150)).save(path)
+        image = FileObject("uploads/tests/imageversion-test.png")
+        try:
+            article = Article.objects.get(slug="test-article-1")
+            article.primary_image = image
+            article.save()
+            self.assertEqual(article.cached_small_image, image.url)
+            self.assertEqual(ImageVersion.objects.get(
+                path=str(image), version_suffix="small").status, "pending")
+            with mock.patch("newsroom.imageversions.connections"):
+                generated, failed = imageversions.process_pending(1)
+            self.assertEqual(failed, 0)
+            self.assertTrue(generated > 0)
+            image_version = ImageVersion.objects.get(path=str(image),
+                                                     version_suffix="small")
+            self.assertEqual(image_version.status, "ready")
+            self.assertNotEqual(image_version.url, image.url)
+            article = Article.objects.get(slug="test-article-1")
+            self.assertEqual(article.cached_small_image, image_version.url)
+        finally:
+            image.delete_versions()
+            image.delete()
+
+    def test_scheduled_publishing(self):
+        cache.delete(dependencies.SCHEDULED_KEY)
+        client = Client()
+        client.get("/")
+        publish_time = timezone.now() + datetime.timedelta(hours=1)
+        Article.objects.create(title="Scheduled article",
+                               slug="scheduled-article",
+                               category=Category.objects.get(slug="news"),
+                               published=publish_time)
+        self.assertEqual(cache.get(dependencies.SCHEDULED_KEY),
+                         (publish_time,))
+        etag = client.get("/")["ETag"]
+        self.assertEqual(client.get("/", HTTP_IF_NONE_MATCH=etag).
+                         status_code, 304)
+        # It goes live without a save
+        with mock.patch("django.utils.timezone.now",
+                        return_value=publish_time +
+                        datetime.timedelta(minutes=1)):
+            response = client.get("/", HTTP_IF_NONE_MATCH=etag)
+            self.assertContains(response, "Scheduled article")
+            self.assertEqual(cache.get(dependencies.SCHEDULED_KEY),
+                             (None,))
+            self.assertEqual(dependencies.purge_scheduled(), 0)
+
+    def test_sitemap(self):
+        client = Client()
+        cache.delete(sitemaps.INDEX_KEY)
+        response = client.get("/sitemap.xml")
+        self.assertEqual(response.status_code, 200)
+        # The index is cached until a section changes
+        with self.assertNumQueries(len(sitemaps.SECTIONS)):
+            self.assertEqual(client.get("/sitemap.xml").content,
+                             response.content)
+        soup = bs(response.content, "html.parser")
+        locations = [loc.text for loc in soup.find_all("loc")]
+        month = timezone.localtime(timezone.now()).strftime("%Y-%m")
+        url = "http://testserver/sitemap-articles-" + month + ".xml"
+        self.assertIn(url, locations)
+        self.assertIn("http://testserver/sitemap-pages.xml", locations)
+        cache.delete(sitemaps.SHARD_KEY_PREFIX + "articles_" + month + "_1")
+        response = client.get(url)
+        self.assertContains(response, "/article/test-article-1/")
+        # Unchanged shards are served from the cache
+        with self.assertNumQueries(1):
+            response = client.get(url)
+        self.assertContains(response, "/article/test-article-1/")
+        article = Article.objects.get(slug="test-article-1")
+        article.published = None
+        article.save()
+        response = client.get(url)
+        self.assertNotContains(response, "/article/test-article-1/")
+        self.assertContains(response, "/article/test-article-2/")
+        Article.objects.exclude(pk=article.pk).update(published=None)
+        response = client.get("/sitemap.xml")
+        self.assertNotIn(url, [loc.text for loc in
+                               bs(response.content, "html.parser").
+                               find_all("loc")])
+        self.assertEqual(client.get("/sitemap-articles-1900-01.xml").
+                         status_code, 404)
+
+    def test_advanced_search(self):
+        client = Client()
+        with mock.patch.object(settings, "SEARCH_MAX_COUNT", 1):
+            response = client.get("/advanced_search/",
+                                  {"adv_search": "brown",
+                                   "search_type": "article"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["num_items"], 1)
+        self.assertTrue(response.context["num_items_capped"])
+        result = response.context["page"].object_list[0]
+        self.assertNotIn("body", result)
+        self.assertIn("brown", result["snippet"])
+        # The same search, normalised, comes from the cache until an
+        # article is published
+        stats = dict(getSearchStats())
+        with mock.patch.object(settings, "SEARCH_MAX_COUNT", 1), \
+                mock.patch("newsroom.views.searchArticlesAndPhotos") as search:
+            search.return_value = Article.objects.none()
+            response = client.get("/advanced_search/",
+                                  {"adv_search": "BROWN",
+                                   "search_type": "article"})
+            self.assertTrue(response.context["num_items_capped"])
+            self.assertEqual(dict(getSearchStats())["hits"],
+                             stats["hits"] + 1)
+            Article.objects.create(title="Brown bread", slug="brown-bread",
+                                   published=timezone.now(),
+                                   category=Category.objects.get(slug="news"))
+            response = client.get("/advanced_search/",
+                                  {"adv_search": "brown",
+                                   "search_type": "article"})
+            self.assertEqual(dict(getSearchStats())["misses"],
+                             stats["misses"] + 1)
+
+    def test_concurrent_edit(self):
+        article = Article.objects.get(slug="test-article-1")
+        users = []
+        for name in ["editor1", "editor2"]:
+            user = User.objects.create_user(name, password="pw",
+                                            is_staff=True)
+            user.user_permissions.add(
+                Permission.objects.get(codename="change_article"))
+            users.append(user)
+            cache.delete(presence.get_editor_key(article.pk, user.pk))
+        cache.delete(presence.get_editors_key(article.pk))
+        cache.delete(presence.get_flush_key(article.pk))
+        cache.delete(presence.get_version_key(article.pk))
+        client = Client()
+        client.login(username="editor1", password="pw")
+        url = reverse("newsroom:article.concurrent_check")
+        data = {"pk": article.pk, "version": article.version,
+                "changed": "false"}
+        with mock.patch.object(settings, "PRESENCE_WAIT", 0):
+            response = client.post(url, data)
+            self.assertEqual(response.json()["edited_by"], "(None)")
+            self.assertEqual(response.json()["users"], [])
+            presence.heartbeat(article.pk, users[1], True)
+            response = client.post(url, data)
+            self.assertEqual(response.json()["users"], ["editor2 (changed)"])
+            # Only the first heartbeat in the flush period was written
+            self.assertEqual(UserEdit.objects.filter(article=article).count(),
+                             1)
+            article.user = users[1]
+            article.save()
+            response = client.post(url, data)
+            self.assertEqual(response.json()["edited_by"], "editor2")
+        # A heartbeat returns as soon as something changes
+        with mock.patch.object(settings, "PRESENCE_WAIT", 60), \
+                mock.patch("newsroom.presence.time.sleep") as sleep:
+            response = client.post(url, dict(data, version=article.version,
+                                              **{"users[]": ["other"]}))
+            self.assertEqual(response.json()["users"], ["editor2 (changed)"])
+            sleep.assert_not_called()
+        # Editors drop out when their key expires, and the index with them
+        cache.delete(presence.get_editor_key(article.pk, users[1].pk))
+        self.assertEqual(list(presence.heartbeat(article.pk, users[0],
+                                                 False)),
+                         [users[0].pk])
+        self.assertEqual(presence.get_index(article.pk), [users[0].pk])
+        presence.heartbeat(article.pk, users[1], True)
+        presence.flush_user_edits(article.pk,
+                                  presence.get_editors(article.pk))
+        self.assertEqual(UserEdit.objects.filter(article=article).count(), 2)
+
     def test_search(self):
         articles = searchPostgresDB("cow dog", Article, 'english', False,
                                     "title", "subtitle", "body")
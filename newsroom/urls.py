@@ -1,5 +1,5 @@
+from clearcache.utils import cache_page_with_dependencies, last_changed
 from django.conf.urls import url
-from django.views.decorators.cache import cache_page
 from django.views.generic.base import RedirectView
 
 from . import feeds, settings, views
@@ -10,8 +10,10 @@ app_name = "newsroom"
 
 urlpatterns = [
     url(r'^$',
-        cache_except_staff(decorator=cache_page(settings.CACHE_PERIOD))
-        (views.home_page_view),
+        last_changed(views.get_home_dependencies)(
+            cache_except_staff(decorator=cache_page_with_dependencies(
+                settings.CACHE_PERIOD))
+            (views.home_page_view)),
         name='home'),
 
     # url(r'^search/$', views.search, name='article.search'),
@@ -19,30 +21,38 @@ urlpatterns = [
     url(r'^advanced_search/$', views.advanced_search, name='advanced.search'),
 
     url(r'^category/opinion_and_analysis/$',
-        cache_except_staff(decorator=cache_page(settings.CACHE_PERIOD))
-        (views.OpinionAnalysisList.as_view()),
+        last_changed(views.get_latest_dependencies)(
+            cache_except_staff(decorator=cache_page_with_dependencies(
+                settings.CACHE_PERIOD))
+            (views.OpinionAnalysisList.as_view())),
         name='article.opinion_analysis'),
 
     url(r'^category/$', views.CategoryList.as_view(),
         name="category.list"),
 
     url(r'^category/([-\s\w]+)/$',
-        cache_except_staff(decorator=cache_page(settings.CACHE_PERIOD))
-        (views.CategoryDetail.as_view()), name='category.detail'),
+        last_changed(views.get_category_dependencies)(
+            cache_except_staff(decorator=cache_page_with_dependencies(
+                settings.CACHE_PERIOD))
+            (views.CategoryDetail.as_view())), name='category.detail'),
 
     url(r'^region/$', views.RegionList.as_view(),
         name="region.list"),
 
     url(r'^region/(.*)$',
-        cache_except_staff(decorator=cache_page(settings.CACHE_PERIOD))
-        (views.RegionDetail.as_view()), name='region.detail'),
+        last_changed(views.get_region_dependencies)(
+            cache_except_staff(decorator=cache_page_with_dependencies(
+                settings.CACHE_PERIOD))
+            (views.RegionDetail.as_view())), name='region.detail'),
 
     url(r'^topic/$', views.TopicList.as_view(),
         name="topic.list"),
 
     url(r'^topic/([-\s\w]+)/$',
-        cache_except_staff(decorator=cache_page(settings.CACHE_PERIOD))
-        (views.TopicDetail.as_view()), name='topic.detail'),
+        last_changed(views.get_topic_dependencies)(
+            cache_except_staff(decorator=cache_page_with_dependencies(
+                settings.CACHE_PERIOD))
+            (views.TopicDetail.as_view())), name='topic.detail'),
 
     url(r'^user/$', views.account_profile,
         name="user.profile"),
@@ -197,10 +207,11 @@ urlpatterns = [
     ###############################
 
     url(r'^article/(?P<slug>[-\w]+)/$',
-        cache_except_staff(
-            decorator=cache_page(settings.CACHE_PERIOD,
-                                 key_prefix='article'))
-        (views.article_detail), name='article.detail'),
+        last_changed(views.get_article_dependencies)(
+            cache_except_staff(
+                decorator=cache_page_with_dependencies(settings.CACHE_PERIOD,
+                                                       key_prefix='article'))
+            (views.article_detail)), name='article.detail'),
 
     url(r'^copy_article/(?P<slug>[-\w]+)/$',
         views.copy_article, name='article.copy'),
@@ -212,8 +223,10 @@ urlpatterns = [
         name="author.list"),
 
     url(r'^author/([0-9]+)/$',
-        cache_except_staff(decorator=cache_page(settings.CACHE_PERIOD))
-        (views.AuthorDetail.as_view()), name='author.detail'),
+        last_changed(views.get_author_dependencies)(
+            cache_except_staff(decorator=cache_page_with_dependencies(
+                settings.CACHE_PERIOD))
+            (views.AuthorDetail.as_view())), name='author.detail'),
 
     url(r'^sites/default/(?P<path>.*)$',
         views.RedirectOldImages.as_view(), name='old_image.redirect'),
@@ -237,6 +250,14 @@ urlpatterns = [
 
     ####################################
 
-    url(r'^sitenews/rss/$', feeds.LatestArticlesRssFeed()),
-    url(r'^sitenews/atom/$', feeds.LatestArticlesAtomFeed()),
+    url(r'^sitenews/rss/$',
+        last_changed(views.get_feed_dependencies)(
+            cache_page_with_dependencies(settings.FEED_CACHE_PERIOD,
+                                         key_prefix='feed')
+            (feeds.LatestArticlesRssFeed()))),
+    url(r'^sitenews/atom/$',
+        last_changed(views.get_feed_dependencies)(
+            cache_page_with_dependencies(settings.FEED_CACHE_PERIOD,
+                                         key_prefix='feed')
+            (feeds.LatestArticlesAtomFeed()))),
 ]
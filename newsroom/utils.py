@@ -1,15 +1,21 @@
+import mimetypes
+import os
 import random
 import re
 import string
+from functools import lru_cache
 from random import randint
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString
 from django.conf import settings
+from django.utils.html import strip_tags
 # from newsroom.settings import ADVERT_CODE
-from newsroom.settings import SUPPORT_US_IMAGES
+from newsroom.settings import LOGO, SUPPORT_US_IMAGES
 
 
-''' Can be used to prevent staff from getting cached pages.
+''' Can be used to prevent staff from getting cached pages. The parts of the
+pages they share with readers are still cached (see the include_shared
+template tag).
 '''
 
 
@@ -149,16 +155,24 @@ def processSoundCloudDivs(soup):
     return soup
 
 
-def processSupportUs(soup):
+# Stands in for the support us image in pre-rendered article bodies
+# so that the image can still be chosen randomly when the page is served.
+SUPPORT_US_IMAGE_PLACEHOLDER = "__support_us_image__"
+
+
+def processSupportUs(soup, image_src=None):
     asides = soup.find_all('aside', {'class': "supportus-edit"})
     for aside in asides:
         aside['class'] = "supportus"
         aside.string = ""
-        ad_to_run = randint(0, len(SUPPORT_US_IMAGES) - 1)
-        image_url = SUPPORT_US_IMAGES[ad_to_run]
+        if image_src is None:
+            ad_to_run = randint(0, len(SUPPORT_US_IMAGES) - 1)
+            src = settings.STATIC_URL + SUPPORT_US_IMAGES[ad_to_run]
+        else:
+            src = image_src
         supporta = soup.new_tag('a', href=settings.DONATE_PAGE)
         supportimage = soup.new_tag('img',
-                                    src=settings.STATIC_URL + image_url,
+                                    src=src,
                                     alt="Support GroundUp image")
         supporta.append(supportimage)
         aside.append(supporta)
@@ -189,6 +203,37 @@ def processAdverts(soup):
     return soup
 
 
+'''Renders the article body as the public sees it. This is expensive so it
+is done once per article version and stored. The support us images are
+left as placeholders for chooseSupportUsImages to fill in on each request.
+'''
+
+
+def renderPublicBody(html):
+    try:
+        soup = BeautifulSoup(html, "html.parser")
+        soup = processSupportUs(soup, SUPPORT_US_IMAGE_PLACEHOLDER)
+        soup = processAdverts(soup)
+        return str(soup)
+    except:
+        html = html.replace(
+            '<aside class="article-advert-edit">',
+            '<aside class="article-advert" style="display:none;">')
+        html = html.replace(
+            '<aside class="supportus-edit">',
+            '<aside class="supportus" style="display:none;">')
+        return html
+
+
+def chooseSupportUsImages(html):
+    if SUPPORT_US_IMAGE_PLACEHOLDER not in html or not SUPPORT_US_IMAGES:
+        return html
+    return re.sub(SUPPORT_US_IMAGE_PLACEHOLDER,
+                  lambda match: settings.STATIC_URL +
+                  random.choice(SUPPORT_US_IMAGES),
+                  html)
+
+
 def linkImages(soup):
     soup_copy = soup
     try:
@@ -233,23 +278,160 @@ def linkImages(soup):
         return soup_copy
 
 
+'''Applies the fixes of replaceImgHeightWidthWithClass, fixEditorSummary,
+removeGoogleDocsSpans, processDashes, processYouTubeDivs,
+processSoundCloudDivs and linkImages in a single walk of the tree. Calling
+each of those in turn walks the tree seven times, and saves of long
+articles were timing out.
+'''
+
+
+def replaceDashesInText(text):
+    if ' --- ' in text:
+        text = text.replace('---', "\u2014")
+    if ' -- ' in text:
+        text = text.replace('--', "\u2013")
+    return text
+
+
+def _has_class(tag, name):
+    return tag.has_attr("class") and name in tag["class"]
+
+
+def _clean_img(tag):
+    if _has_class(tag, "leave"):
+        return
+    # This deals with CKEditor's image insertion
+    if tag.has_attr("style"):
+        del tag["style"]
+    # This deals with TinyMCE's image insertion
+    if tag.has_attr("height") and tag.has_attr("width"):
+        del tag["height"]
+        del tag["width"]
+
+
+def _link_img(soup, img):
+    if _has_class(img, "leave") or not img.has_attr("src"):
+        return
+    url = img["src"]
+    if not ("_versions" in url and ("_extra_large" in url or "_huge" in url)):
+        return
+    vBegin = url.find("_versions/")
+    vEnd = vBegin + len("_versions/")
+    eBegin = url.find("_extra_large")
+    if eBegin > -1:
+        eEnd = eBegin + len("_extra_large")
+    else:
+        eBegin = url.find("_huge")
+        eEnd = eBegin + len("_huge")
+    urlnew = url[:vBegin] + "uploads/" + url[vEnd:eBegin] + url[eEnd:]
+    if img.parent.name == 'a':
+        img.parent["href"] = urlnew
+        img.parent["class"] = "bigger-image"
+        img.parent["target"] = "_blank"
+    else:
+        link = soup.new_tag("a")
+        link["href"] = urlnew
+        link["target"] = "_blank"
+        link["class"] = "bigger-image"
+        img.wrap(link)
+
+
+def _replace_div_string(div):
+    fragment = BeautifulSoup(replaceDashesInText(div.string), "html.parser")
+    div.string = ""
+    div.append(fragment)
+    return fragment
+
+
+def normaliseSoup(soup):
+    summary_lists = []
+    for node in list(soup.descendants):
+        if node.parent is None:
+            # Detached by an earlier rule, e.g. the old text of a YouTube div
+            continue
+        if isinstance(node, NavigableString):
+            text = replaceDashesInText(node)
+            if text != node:
+                node.replace_with(text)
+        elif node.name == "img":
+            _clean_img(node)
+            try:
+                _link_img(soup, node)
+            # Not important enough to be worth crashing the site on
+            except:
+                pass
+        elif node.name == "span":
+            if node.has_attr("id") and \
+               node["id"][0:18] == 'docs-internal-guid':
+                node.unwrap()
+        elif node.name == "div":
+            if _has_class(node, "editor-summary"):
+                ul = node.parent.parent if node.parent else None
+                if ul is not None and \
+                   not any(ul is item for item in summary_lists):
+                    summary_lists.append(ul)
+            if _has_class(node, "youtube"):
+                node["class"] = "embed-responsive embed-responsive-16by9"
+                _replace_div_string(node)
+            elif _has_class(node, "soundcloud"):
+                node["class"] = ""
+                fragment = _replace_div_string(node)
+                fragment.find("iframe")["height"] = 100
+    for ul in summary_lists:
+        for div in ul.find_all("div", "editor-summary"):
+            del div["class"]
+        d = soup.new_tag("div")
+        d["class"] = "editor-summary"
+        ul.wrap(d)
+    return soup
+
+
 def replaceBadHtmlWithGood(html):
     html = html.replace('dir="ltr"', "")
     html = remove_unnecessary_white_space(html)
     soup = BeautifulSoup(html, "html.parser")
-    soup = replaceImgHeightWidthWithClass(soup)
     # While nice to make images into figures, it is a real struggle for
     # users of CKEditor.
     # soup = replacePImgWithFigureImg(soup)
-    soup = fixEditorSummary(soup)
-    soup = removeGoogleDocsSpans(soup)
-    soup = processDashes(soup)
-    soup = processYouTubeDivs(soup)
-    soup = processSoundCloudDivs(soup)
-    soup = linkImages(soup)
+    soup = normaliseSoup(soup)
     return str(soup)
 
 
+'''Used to compare articles by the words in them.
+'''
+
+word_regex = re.compile(r'\w+')
+
+stop_words = frozenset(["about", "after", "also", "been", "from", "have",
+                        "into", "more", "said", "says", "than", "that",
+                        "their", "there", "they", "this", "were", "what",
+                        "when", "which", "will", "with", "would"])
+
+
+def getImageMimeType(url):
+    mime_type = mimetypes.guess_type(url)[0]
+    if mime_type and mime_type.startswith("image/"):
+        return mime_type
+    return "image/jpeg"
+
+
+@lru_cache()
+def getLogoEnclosure():
+    '''Feed enclosure (url, length, mime type) for items without images.'''
+    url = settings.STATIC_URL + LOGO
+    try:
+        length = os.path.getsize(os.path.join(settings.STATIC_ROOT, LOGO))
+    except (OSError, TypeError):
+        length = 0
+    return url, length, getImageMimeType(url)
+
+
+def get_terms(text):
+    return set([word for word in word_regex.findall(strip_tags(text).lower())
+                if len(word) > 3 and word not in stop_words])
+
+
 def get_edit_lock_msg(user):
     message = \
               "Changes not saved. User " + str(user) + " edited the article " \
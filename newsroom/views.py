@@ -1,39 +1,32 @@
-import datetime
 import logging
 
-from blocks.models import Group
-from bs4 import BeautifulSoup
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.sites.models import Site
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger
 from django.db.models import Q
 from django.http import (Http404, HttpResponseForbidden, HttpResponseRedirect,
                          JsonResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.utils import timezone
 from django.utils.html import strip_tags
 from django.views import generic
-from django.views.decorators.http import last_modified
 from django.views.generic import View
-from letters.models import Letter
-from letters.settings import DAYS_AGO
-from agony.models import QandA
+from clearcache.utils import LATEST, add_dependencies, get_dependency
+from pgsearch.cache import getCachedSearch, getSearchKey, setCachedSearch
 from pgsearch.utils import searchPostgresDB, searchArticlesAndPhotos
 from django.conf import settings as django_settings
 
-from . import models, settings, utils
+from . import fragments, models, presence, settings, utils
+from .dependencies import purge_scheduled
 from .forms import ArticleForm, ArticleListForm, AdvancedSearchForm
+from .pagination import CappedPaginator, CursorPage
 
 logger = logging.getLogger(__name__)
 
 
 def get_blocks(group_name="Home"):
-    try:
-        return Group.objects.get(name=group_name).get_blocks()
-    except:
-        return []
+    return fragments.get_blocks(group_name)
 
 
 def get_blocks_in_context(context, group_name="Home", context_key="blocks"):
@@ -45,24 +38,100 @@ class ArticleList(generic.ListView):
     context_object_name = 'article_list'
     template_name = "newsroom/article_list.html"
     paginate_by = settings.ARTICLES_PER_PAGE
+    cursor_pagination = settings.CURSOR_PAGINATION
 
     def get_queryset(self):
         return models.Article.objects.list_view()
 
+    '''In cursor pagination mode pages are fetched by sort key, so that
+    deep pages don't need a count or an offset scan. Old ?page= links
+    still get the numbered pages.
+    '''
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.cursor_pagination and "page" not in self.request.GET:
+            page = CursorPage(queryset, page_size,
+                              after=self.request.GET.get("after"),
+                              before=self.request.GET.get("before"))
+            return (None, page, page.object_list, page.has_other_pages())
+        return super(ArticleList, self).paginate_queryset(queryset,
+                                                          page_size)
+
     def get_context_data(self, **kwargs):
         context = super(ArticleList, self).get_context_data(**kwargs)
         #  context = get_blocks_in_context(context)
-        context['most_popular_html'] = \
-            models.MostPopular.get_most_popular_html()
-        date_from = timezone.now() - datetime.timedelta(days=DAYS_AGO)
-        context['letters'] = Letter.objects.published().\
-            filter(published__gte=date_from).order_by('-published')
-        context['agony'] = QandA.objects.published().order_by('-published')
+        context['most_popular_html'] = fragments.get_most_popular_html()
+        context['letters'] = fragments.get_letters()
+        context['agony'] = fragments.get_agony()
+        add_dependencies(self.request, *context['article_list'])
+        fragments.add_fragment_dependencies(self.request, "most_popular",
+                                            "letters", "agony")
         return context
 
 
-def last_article_modified(request):
-    return models.Article.objects.published().latest("modified").modified
+# Dependencies of the pages, used to answer conditional GETs. See
+# clearcache.utils.last_changed. Looking them up first purges the lists
+# scheduled articles have gone live in, so their stamps are current.
+
+SIDEBAR_FRAGMENTS = ["most_popular", "letters", "agony"]
+
+
+def get_page_dependencies(*dependencies, fragment_names=SIDEBAR_FRAGMENTS):
+    purge_scheduled()
+    return list(dependencies) + \
+        [fragments.get_fragment_dependency(name) for name in fragment_names]
+
+
+def get_object_dependencies(model, **kwargs):
+    pks = model.objects.filter(**kwargs).values_list("pk", flat=True)[:1]
+    if not pks:
+        return []
+    return get_page_dependencies(get_dependency(model, pks[0]))
+
+
+def get_home_dependencies(request):
+    return get_page_dependencies(LATEST,
+                                 fragments.get_fragment_dependency(
+                                     "blocks_Home_Top"))
+
+
+def get_latest_dependencies(request, *args, **kwargs):
+    return get_page_dependencies(LATEST)
+
+
+def get_feed_dependencies(request):
+    purge_scheduled()
+    return [LATEST]
+
+
+def get_author_dependencies(request, pk):
+    return get_object_dependencies(models.Author, pk=pk)
+
+
+def get_category_dependencies(request, name):
+    return get_object_dependencies(models.Category, name__iexact=name)
+
+
+def get_region_dependencies(request, name):
+    return get_object_dependencies(models.Region, name=name)
+
+
+def get_topic_dependencies(request, slug):
+    return get_object_dependencies(models.Topic, slug=slug)
+
+
+def get_article_page_dependencies(pk):
+    return get_page_dependencies(
+        get_dependency(models.Article, pk),
+        fragments.get_fragment_dependency("blocks_Article"))
+
+
+def get_article_dependencies(request, slug):
+    pks = models.Article.objects.filter(slug=slug). \
+        values_list("pk", flat=True)[:1]
+    if not pks:
+        return []
+    return get_article_page_dependencies(pks[0])
 
 
 class HomePage(ArticleList):
@@ -71,6 +140,8 @@ class HomePage(ArticleList):
     def get_context_data(self, **kwargs):
         context = super(HomePage, self).get_context_data(**kwargs)
         context = get_blocks_in_context(context, "Home_Top", "topblocks")
+        add_dependencies(self.request, LATEST)
+        fragments.add_fragment_dependencies(self.request, "blocks_Home_Top")
         return context
 
     # LEAVE THIS COMMENTED OUT CODE IN CASE OF EMERGENCY IN
@@ -87,7 +158,6 @@ class HomePage(ArticleList):
 
 
 home_page_view = HomePage.as_view()
-home_page_view = last_modified(last_article_modified)(home_page_view)
 
 
 class OpinionAnalysisList(ArticleList):
@@ -100,6 +170,7 @@ class OpinionAnalysisList(ArticleList):
     def get_context_data(self, **kwargs):
         context = super(OpinionAnalysisList, self).get_context_data(**kwargs)
         context['heading'] = "Opinion and Analysis"
+        add_dependencies(self.request, LATEST)
         return context
 
 
@@ -110,17 +181,15 @@ class AuthorDetail(ArticleList):
 
     def get_queryset(self):
         self.author = get_object_or_404(models.Author, pk=self.args[0])
-        return models.Article.objects.list_view().filter(
-            Q(author_01=self.author) | Q(author_02=self.author) |
-            Q(author_03=self.author) | Q(author_04=self.author) |
-            Q(author_05=self.author) |
-            Q(cached_byline_no_links__icontains=str(self.author)))
+        return models.Article.objects.list_view(). \
+            by_author(self.author, in_byline=True)
 
     def get_context_data(self, **kwargs):
         context = super(AuthorDetail, self).get_context_data(**kwargs)
         context['heading'] = "Articles by " + str(self.author)
         context['image'] = self.author.photo
         context['description'] = self.author.description
+        add_dependencies(self.request, self.author)
         return context
 
 
@@ -139,6 +208,7 @@ class CategoryDetail(ArticleList):
     def get_context_data(self, **kwargs):
         context = super(CategoryDetail, self).get_context_data(**kwargs)
         context['heading'] = self.category.name
+        add_dependencies(self.request, self.category)
         return context
 
 
@@ -151,23 +221,17 @@ class RegionDetail(ArticleList):
     def get_queryset(self):
         self.region = get_object_or_404(models.Region, name=self.args[0])
         return models.Article.objects.list_view(). \
-            filter(Q(region__in=self.region.get_descendants()) |
-                   Q(region=self.region))
+            filter(region__in=self.region.get_region_ids())
 
     def get_context_data(self, **kwargs):
         context = super(RegionDetail, self).get_context_data(**kwargs)
-        query = Q(name=self.region.name)
-        region_name = str(self.region)
-        while region_name:
-            region_name = region_name.rpartition("/")[0]
-            query = query | Q(name=region_name)
-        regions = models.Region.objects.filter(query)
         regions = ["<a href='" + reverse("newsroom:region.detail",
                                          args=(region.name, )) + "'>"
                    + region.name.rpartition("/")[2] + "</a>"
-                   for region in regions]
+                   for region in self.region.get_breadcrumbs()]
         context['title'] = str(self.region).rpartition("/")[2]
         context['heading'] = "|".join(regions)
+        add_dependencies(self.request, self.region)
         return context
 
 
@@ -190,6 +254,7 @@ class TopicDetail(ArticleList):
         context = super(TopicDetail, self).get_context_data(**kwargs)
         context['heading'] = self.topic.name.upper()
         context['topic'] = self.topic
+        add_dependencies(self.request, self.topic)
         return context
 
     def get_template_names(self):
@@ -200,7 +265,9 @@ class TopicDetail(ArticleList):
 
 def check_concurrent_edit(request):
     '''This is an Ajax callback on article update pages to
-    check if another user has updated the article.
+    check if another user has updated the article. It is answered when the
+    article is saved or the other editors change, or after PRESENCE_WAIT
+    seconds (see presence.py).
     '''
     if request.method == "POST" and \
        request.is_ajax and \
@@ -211,32 +278,20 @@ def check_concurrent_edit(request):
             changed = True
         else:
             changed = False
-        article = get_object_or_404(models.Article, pk=pk)
-        if article.version > version:
-            edited_by = str(article.user)
+        if presence.get_version(pk) is None:
+            raise Http404
+        presence.heartbeat(pk, request.user, changed)
+        latest_version, saved_by, users = presence.wait_for_change(
+            pk, request.user, version, request.POST.getlist("users[]"),
+            settings.PRESENCE_WAIT)
+        if latest_version > version:
+            edited_by = presence.get_user_name(saved_by)
         else:
             edited_by = "(None)"
-        try:
-            user_edit = models.UserEdit.objects.get(
-                article__pk=article.pk,
-                user=request.user)
-            user_edit.changed = changed
-        except models.UserEdit.DoesNotExist:
-            user_edit = models.UserEdit()
-            user_edit.article = article
-            user_edit.changed = changed
-            user_edit.user = request.user
-        finally:
-            user_edit.save()
-        cutoff = timezone.now() - datetime.timedelta(seconds=30)
-        user_edits = models.UserEdit.objects. \
-            filter(article=article). \
-            exclude(user=request.user). \
-            filter(edit_time__gte=cutoff)
-        users = [obj.editStatusPlusName() for obj in user_edits]
         return JsonResponse({
             'edited_by': edited_by,
-            'users': users
+            'users': users,
+            'delay': settings.PRESENCE_DELAY
         }, safe=False)
     else:
         raise Http404
@@ -275,6 +330,7 @@ def article_post(request, slug):
                 setattr(article, field, form.cleaned_data[field])
             article.user = request.user
             article.save()
+            article.update_related()
             # Check if user clicked "Publish" button
             if request.POST["is_published"] == "Now":
                 article.publish_now()
@@ -335,37 +391,32 @@ def article_detail(request, slug):
                    query_edit.lower() == "false":
                     can_edit = False
 
-            article_body = article.body
             if can_edit is False:
-                try:
-                    soup = BeautifulSoup(article_body, "html.parser")
-                    soup = utils.processSupportUs(soup)
-                    soup = utils.processAdverts(soup)
-                    article_body = str(soup)
-                except:
-                    article_body = article_body.replace(
-                        '<aside class="article-advert-edit">',
-                        '<aside class="article-advert" style="display:none;">')
-                    article_body = article_body.replace(
-                        '<aside class="supportus-edit">',
-                        '<aside class="supportus" style="display:none;">')
-
-            date_from = timezone.now() - datetime.timedelta(days=DAYS_AGO)
-            # most_popular = models.MostPopular.get_most_popular_html()
+                article_body = article.get_public_body()
+            else:
+                article_body = article.body
+
+            related = list(article.get_related())
+            recommended = article.get_recommended()
+            # The page shows these articles' titles too
+            add_dependencies(request, article, *related, *recommended,
+                             *article.get_neighbours())
+            fragments.add_fragment_dependencies(request, "most_popular",
+                                                "letters", "agony",
+                                                "blocks_Article")
             return render(request, article.template,
                           {'article': article,
                            'display_region': display_region,
-                           'recommended': article.get_recommended(),
-                           'related': article.get_related(),
+                           'recommended': recommended,
+                           'related': related,
                            'blocks': get_blocks('Article'),
                            'can_edit': can_edit,
                            'article_body': article_body,
                            'article_letters': article.letter_set.published(),
-                           'most_popular_html': models.MostPopular.get_most_popular_html(),
-                           'letters': Letter.objects.published().
-                           filter(published__gte=date_from).
-                           order_by('-published'),
-                           'agony': QandA.objects.published().order_by("-published"),
+                           'most_popular_html':
+                           fragments.get_most_popular_html(),
+                           'letters': fragments.get_letters(),
+                           'agony': fragments.get_agony(),
                            'content_type': 'article',
                            'form': form})
         else:
@@ -498,11 +549,33 @@ def advanced_search(request):
 
     adv_search_form = AdvancedSearchForm(request.GET or None)
 
+    try:
+        num_results = int(request.GET.get('results_per_page'))
+    except:
+        if search_type == 'image':
+            num_results = settings.SEARCH_RESULTS_PER_PAGE * 2
+        else:
+            num_results = settings.SEARCH_RESULTS_PER_PAGE
+
+    page_num = request.GET.get('page')
+    if page_num is None:
+        page_num = 1
+
+    search_key = None
     if adv_search_form.is_valid():
         cleaned_adv_form = adv_search_form.cleaned_data
         author_pk = cleaned_adv_form.get("author").pk if cleaned_adv_form.get("author") else None
         category_pk = cleaned_adv_form.get("category").pk if cleaned_adv_form.get("category") else None
         topic_pk = cleaned_adv_form.get("topics").pk if cleaned_adv_form.get("topics") else None
+        search_key = getSearchKey(cleaned_adv_form.get("adv_search"),
+                                  inc_articles, inc_photos,
+                                  author_pk=author_pk,
+                                  first_author=first_author_only,
+                                  category_pk=category_pk,
+                                  topic_pk=topic_pk,
+                                  date_from=cleaned_adv_form.get("date_from"),
+                                  date_to=cleaned_adv_form.get("date_to"),
+                                  page=page_num, per_page=num_results)
         try:
             article_list = searchArticlesAndPhotos(cleaned_adv_form.get("adv_search"),
                                                    inc_articles,
@@ -519,39 +592,39 @@ def advanced_search(request):
     else:
         article_list = models.Article.objects.none()
 
-    try:
-        num_results = int(request.GET.get('results_per_page'))
-    except:
-        if search_type == 'image':
-            num_results = settings.SEARCH_RESULTS_PER_PAGE * 2
-        else:
-            num_results = settings.SEARCH_RESULTS_PER_PAGE
-
-    paginator = Paginator(article_list, num_results)
-    page_num = request.GET.get('page')
-    if page_num is None:
-        page_num = 1
-    try:
-        page = paginator.page(page_num)
-    except PageNotAnInteger:
-        page = paginator.page(1)
-    except EmptyPage:
-        page = paginator.page(paginator.num_pages)
-    except:
-        logger.error("Advanced Search Failed in pagination")
-    finally:
+    paginator = CappedPaginator(article_list, num_results,
+                                settings.SEARCH_MAX_COUNT)
+    cached = getCachedSearch(search_key) if search_key else None
+    if cached is not None:
+        paginator.set_count(cached["count"], cached["capped"])
+        page = Page(cached["object_list"], cached["number"], paginator)
+    else:
         try:
-            num_pages = paginator.num_pages
+            page = paginator.page(page_num)
+        except PageNotAnInteger:
+            page = paginator.page(1)
+        except EmptyPage:
+            page = paginator.page(paginator.num_pages)
         except:
-            logger.error("Advanced Search failed to get num_pages")
-            num_pages = 1
-
+            logger.error("Advanced Search Failed in pagination")
+        if search_key and page is not None:
+            setCachedSearch(search_key,
+                            {"object_list": list(page.object_list),
+                             "number": page.number,
+                             "count": paginator.count,
+                             "capped": paginator.capped})
+    try:
+        num_pages = paginator.num_pages
+    except:
+        logger.error("Advanced Search failed to get num_pages")
+        num_pages = 1
 
     return render(request, 'search/search.html', {'query': query,
                                                   'page': page,
                                                   'page_num': page_num,
                                                   'num_pages': num_pages,
-                                                  'num_items': len(article_list),
+                                                  'num_items': paginator.count,
+                                                  'num_items_capped': paginator.capped,
                                                   'search_type': search_type,
                                                   'adv_search_form': adv_search_form})
 
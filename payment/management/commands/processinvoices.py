@@ -28,11 +28,8 @@ def generate_commissions():
                     process_commissions = True
 
             if process_commissions is True:
-                authors = [article.author_01, article.author_02,
-                           article.author_03, article.author_04,
-                           article.author_05]
-                for author in authors:
-                    if author is not None and author.freelancer is not "n":
+                for author in article.get_authors():
+                    if author.freelancer is not "n":
                         commission = Commission()
                         # commission.author = author
                         commission.article = article
@@ -312,14 +312,15 @@ class Commission(models.Model):
 
     def estimate_bonus(self):
         if self.article and self.article.is_published() \
-           and self.article.author_01 == self.invoice.author:
+           and self.article.author_01_id == self.invoice.author_id:
             month_start = make_aware(timezone.datetime(self.article.published.year,
                                             self.article.published.month, 1))
             publish_time = self.article.published
             published_this_month = Article.objects.published().\
                                    filter(published__gte=month_start).\
                                    filter(published__lt=publish_time).\
-                                   filter(author_01=self.invoice.author).count() + 1
+                                   by_author(self.invoice.author,
+                                             first_author=True).count() + 1
             return BONUSES[published_this_month]
         else:
             return 0.00
@@ -333,18 +334,13 @@ class Commission(models.Model):
         estimate['experience'] = experience
 
 
-        if self.article.author_01 is None:
-            shared = 1.0
-        elif self.article.author_02 is None:
-            shared = 1.0
-        elif self.article.author_03 is None:
-            shared = 2.0
-        elif self.article.author_04 is None:
-            shared = 3.0
-        elif self.article.author_05 is None:
-            shared = 4.0
-        else:
-            shared = 5.0
+        # Only the authors listed before the first blank author field share
+        author_ids = [self.article.author_01_id, self.article.author_02_id,
+                      self.article.author_03_id, self.article.author_04_id,
+                      self.article.author_05_id]
+        if None in author_ids:
+            author_ids = author_ids[:author_ids.index(None)]
+        shared = float(max(len(author_ids), 1))
 
         estimate['shared'] = shared
 
@@ -410,11 +406,11 @@ class Commission(models.Model):
 
     def estimate_payment_tp(self, estimate):
         estimate['shared'] = 1
-        if not (self.article.author_01 and self.article.author_02):
+        if not (self.article.author_01_id and self.article.author_02_id):
             return estimate
-        if self.invoice.author == self.article.author_01:
+        if self.invoice.author_id == self.article.author_01_id:
             return self.estimate_payment_writer(estimate)
-        elif self.invoice.author == self.article.author_02:
+        elif self.invoice.author_id == self.article.author_02_id:
             return self.estimate_payment_photographer(estimate)
         else:
             return estimate
@@ -434,11 +430,7 @@ class Commission(models.Model):
         try:
             if self.article and self.description == "Article author":
 
-                if self.article.author_01 == self.invoice.author or \
-                   self.article.author_02 == self.invoice.author or \
-                   self.article.author_03 == self.invoice.author or \
-                   self.article.author_04 == self.invoice.author or \
-                   self.article.author_05 == self.invoice.author:
+                if self.article.has_author(self.invoice.author):
 
                     if self.article.byline_style == "ST":
                         estimate = self.estimate_payment_st(estimate)
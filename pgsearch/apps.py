@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class PgsearchConfig(AppConfig):
     name = 'pgsearch'
+
+    def ready(self):
+        # Connects the signals that keep photograph search vectors and the
+        # autocomplete indexes current
+        from . import autocomplete, triggers
+        autocomplete.connect_signals()
@@ -0,0 +1,155 @@
+'''Autocomplete for the ajax_select lookups and the grappelli autocomplete
+fields in the admin.
+
+On PostgreSQL the name columns have pg_trgm GIN indexes (see the pgsearch
+migrations), so substring matches don't scan the table, and results are
+ranked by trigram similarity. On other databases each process keeps an
+in-memory index of the words in those columns and looks up word prefixes
+in it. It is rebuilt when the model's change stamp moves.
+
+Either way at most AUTOCOMPLETE_LIMIT results are returned.
+'''
+
+import bisect
+from threading import Lock
+
+from clearcache.utils import get_stamp, touch
+from django.apps import apps
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils.text import slugify
+from newsroom.settings import AUTOCOMPLETE_LIMIT
+
+# The text columns searched for each model
+AUTOCOMPLETE_FIELDS = {
+    "newsroom.article": ("title", "subtitle",),
+    "newsroom.author": ("first_names", "last_name",),
+    "newsroom.category": ("name",),
+    "newsroom.region": ("name",),
+    "newsroom.topic": ("name",),
+    "gallery.keyword": ("name",),
+}
+
+STAMP_PREFIX = "autocomplete:"
+
+# Candidates checked against the queryset's filters per query
+CANDIDATE_BATCH = 500
+
+_indexes = {}
+_lock = Lock()
+
+
+def hasTrigramIndexes(connection):
+    return connection.vendor == "postgresql"
+
+
+def getWords(text):
+    return slugify(text or "").split("-")
+
+
+class PrefixIndex:
+    '''A sorted list of (word, pk) to find the rows with words starting
+    with a prefix by bisection.
+    '''
+
+    def __init__(self, rows):
+        entries = set()
+        for row in rows:
+            pk = row[0]
+            for text in row[1:]:
+                for word in getWords(text):
+                    if word:
+                        entries.add((word, pk))
+        self.entries = sorted(entries)
+
+    def search_prefix(self, prefix):
+        pks = set()
+        i = bisect.bisect_left(self.entries, (prefix,))
+        while i < len(self.entries) and \
+                self.entries[i][0].startswith(prefix):
+            pks.add(self.entries[i][1])
+            i = i + 1
+        return pks
+
+    def search(self, term):
+        result = None
+        for word in getWords(term):
+            if word:
+                pks = self.search_prefix(word)
+                result = pks if result is None else result & pks
+        return result or set()
+
+
+def getPrefixIndex(model):
+    label = model._meta.label_lower
+    stamp = get_stamp(STAMP_PREFIX + label)
+    with _lock:
+        cached = _indexes.get(label)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    rows = model._default_manager.values_list("pk",
+                                              *AUTOCOMPLETE_FIELDS[label])
+    index = PrefixIndex(rows.iterator())
+    with _lock:
+        _indexes[label] = (stamp, index)
+    return index
+
+
+def searchIds(queryset, term, limit=AUTOCOMPLETE_LIMIT):
+    '''Returns the pks of at most limit objects in the queryset matching the
+    term, best matches first.
+    '''
+    model = queryset.model
+    fields = AUTOCOMPLETE_FIELDS[model._meta.label_lower]
+    term = term.strip()
+    if not term:
+        return []
+    pk_query = Q(pk=int(term)) if term.isdigit() else Q(pk__in=[])
+    if hasTrigramIndexes(connections[queryset.db]):
+        query = Q()
+        for word in term.split():
+            word_query = Q()
+            for field in fields:
+                word_query |= Q(**{field + "__icontains": word})
+            query &= word_query
+        return list(queryset.filter(query | pk_query).
+                    annotate(similarity=TrigramSimilarity(fields[0], term)).
+                    order_by("-similarity", "-pk").
+                    values_list("pk", flat=True)[:limit])
+    ids = list(queryset.filter(pk_query).values_list("pk", flat=True))
+    # Most recent first
+    candidates = sorted(getPrefixIndex(model).search(term), reverse=True)
+    for start in range(0, len(candidates), CANDIDATE_BATCH):
+        if len(ids) >= limit:
+            break
+        batch = candidates[start:start + CANDIDATE_BATCH]
+        ids.extend(sorted(queryset.filter(pk__in=batch).
+                          values_list("pk", flat=True), reverse=True))
+    return ids[:limit]
+
+
+def search(queryset, term, limit=AUTOCOMPLETE_LIMIT, ordering=None):
+    '''Returns at most limit matching objects, in ordering if given.'''
+    ids = searchIds(queryset, term, limit)
+    objects = queryset.filter(pk__in=ids)
+    if ordering:
+        return list(objects.order_by(*ordering))
+    objects = {obj.pk: obj for obj in objects}
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+# Signals
+
+def touch_autocomplete(sender, **kwargs):
+    touch(STAMP_PREFIX + sender._meta.label_lower)
+
+
+def connect_signals():
+    for label in AUTOCOMPLETE_FIELDS:
+        model = apps.get_model(label)
+        post_save.connect(touch_autocomplete, sender=model,
+                          dispatch_uid="autocomplete_save_" + label)
+        post_delete.connect(touch_autocomplete, sender=model,
+                            dispatch_uid="autocomplete_delete_" + label)
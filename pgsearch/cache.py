@@ -0,0 +1,65 @@
+'''Caches advanced search result pages.
+
+The key is made from the normalised query (the parsed search terms, the
+filters, the result type and the page) plus the stamps of when published
+articles and the gallery last changed. So a cached page is only reused
+until new or changed content could alter it.
+'''
+
+import hashlib
+
+from clearcache.utils import LATEST, get_stamp
+from django.core.cache import cache
+from gallery.dependencies import GALLERY
+from newsroom.settings import SEARCH_CACHE_PERIOD
+
+from .utils import getSearchTerms
+
+SEARCH_KEY_PREFIX = "search_"
+STATS_KEY_PREFIX = "searchstats_"
+STAT_NAMES = ["hits", "misses"]
+
+
+def normaliseQuery(search_string, **filters):
+    terms = [term.lower() for term in getSearchTerms(search_string or "")]
+    return repr((terms, sorted(filters.items())))
+
+
+def getSearchKey(search_string, inc_articles, inc_photos, **filters):
+    watermarks = []
+    if inc_articles:
+        watermarks.append(get_stamp(LATEST))
+    if inc_photos:
+        watermarks.append(get_stamp(GALLERY))
+    normalised = normaliseQuery(search_string, inc_articles=inc_articles,
+                                inc_photos=inc_photos, **filters) + \
+        repr(watermarks)
+    return SEARCH_KEY_PREFIX + \
+        hashlib.md5(normalised.encode("utf-8")).hexdigest()
+
+
+def countSearch(name):
+    key = STATS_KEY_PREFIX + name
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def getCachedSearch(key):
+    result = cache.get(key)
+    if result is None:
+        countSearch("misses")
+    else:
+        countSearch("hits")
+    return result
+
+
+def setCachedSearch(key, result):
+    cache.set(key, result, SEARCH_CACHE_PERIOD)
+
+
+def getSearchStats():
+    values = cache.get_many([STATS_KEY_PREFIX + name for name in STAT_NAMES])
+    return [(name, values.get(STATS_KEY_PREFIX + name, 0))
+            for name in STAT_NAMES]
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from pgsearch.triggers import hasSearchVectors, installTriggers, \
+    rebuildVectors
+
+
+class Command(BaseCommand):
+    help = 'Reinstall the search vector triggers and indexes and recompute ' \
+           'the stored search vectors of all articles and photographs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows updated per statement')
+
+    def handle(self, *args, **options):
+        if not hasSearchVectors(connection):
+            print("RebuildSearch: Stored search vectors need PostgreSQL.")
+            return
+        print("RebuildSearch: {0}: Installing triggers.".
+              format(str(timezone.now())))
+        installTriggers(connection)
+        num_rows = rebuildVectors(connection, options["batch_size"])
+        print("RebuildSearch: {0}: Rebuilt {1} search vectors.".
+              format(str(timezone.now()), num_rows))
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def install_triggers(apps, schema_editor):
+    from pgsearch.triggers import installTriggers, rebuildVectors
+    installTriggers(schema_editor.connection)
+    rebuildVectors(schema_editor.connection)
+
+
+def remove_triggers(apps, schema_editor):
+    from pgsearch.triggers import removeTriggers
+    removeTriggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsroom', '0015_search_vector'),
+        ('gallery', '0003_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_triggers, remove_triggers),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# (table, column) pairs searched by the autocomplete lookups
+TRIGRAM_COLUMNS = [
+    ("newsroom_article", "title"),
+    ("newsroom_article", "subtitle"),
+    ("newsroom_author", "first_names"),
+    ("newsroom_author", "last_name"),
+    ("newsroom_category", "name"),
+    ("newsroom_region", "name"),
+    ("newsroom_topic", "name"),
+    ("gallery_keyword", "name"),
+]
+
+
+def get_index_name(table, column):
+    return table + "_" + column + "_trgm_idx"
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # icontains compares UPPER(column::text), so that is what is indexed
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS {0} ON {1} "
+            "USING gin ((UPPER({2}::text)) gin_trgm_ops)".
+            format(get_index_name(table, column), table, column))
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute("DROP INDEX IF EXISTS {0}".
+                              format(get_index_name(table, column)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pgsearch', '0001_search_triggers'),
+        ('newsroom', '0015_search_vector'),
+        ('gallery', '0003_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
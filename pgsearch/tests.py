@@ -1,5 +1,11 @@
+from django.db import connection
 from django.test import TestCase
-from .utils import parseSearchString
+from django.utils import timezone
+from newsroom.lookups import ArticleLookup, AuthorLookup
+from newsroom.models import Article, Author, Category
+from . import autocomplete
+from .triggers import getArticleVectorSQL, hasSearchVectors
+from .utils import parseSearchString, searchArticles
 
 class TextSearch(TestCase):
 
@@ -9,3 +15,46 @@ class TextSearch(TestCase):
         comparator = ['The', 'quick', 'brown fox jumps',
                       'over', 'the', 'lazy', 'dog']
         self.assertEqual(result, comparator)
+
+    def test_search_articles(self):
+        self.assertIn("setweight(to_tsvector('english', "
+                      "coalesce(NEW.title, '')), 'A')", getArticleVectorSQL())
+        category = Category.objects.create(name="News", slug="news")
+        Article.objects.create(title="Fox in the henhouse", slug="fox",
+                               body="<p>The brown fox got in.</p>",
+                               category=category, published=timezone.now())
+        Article.objects.create(title="Cows", slug="cows",
+                               body="<p>How now brown cow.</p>",
+                               category=category, published=timezone.now())
+        articles = list(searchArticles("fox"))
+        self.assertEqual([article.slug for article in articles], ["fox"])
+        self.assertEqual(len(searchArticles("brown")), 2)
+        if hasSearchVectors(connection):
+            self.assertTrue(articles[0].rank > 0)
+
+    def test_autocomplete(self):
+        category = Category.objects.create(name="News", slug="news")
+        for i in range(15):
+            Article.objects.create(title="Water crisis day " + str(i),
+                                   slug="water-" + str(i), category=category,
+                                   published=timezone.now())
+        article = Article.objects.create(title="Drought", slug="drought",
+                                         subtitle="No water in the Cape",
+                                         category=category,
+                                         published=timezone.now())
+        Author.objects.create(first_names="Joe", last_name="Bloggs",
+                              email="joe@example.com")
+        Author.objects.create(first_names="Jane", last_name="Bloggs-Smith",
+                              email="jane@example.com")
+        lookup = ArticleLookup()
+        results = lookup.get_query("wat", None)
+        self.assertEqual(len(results), autocomplete.AUTOCOMPLETE_LIMIT)
+        self.assertEqual(lookup.get_query("cape wat", None), [article])
+        self.assertEqual(lookup.get_query(str(article.pk), None), [article])
+        authors = AuthorLookup().get_query("blog", None)
+        self.assertEqual([author.first_names for author in authors],
+                         ["Joe", "Jane"])
+        # Saving rebuilds the index
+        article.title = "Flooding"
+        article.save()
+        self.assertEqual(lookup.get_query("flood", None), [article])
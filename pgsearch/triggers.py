@@ -0,0 +1,160 @@
+'''Triggers that keep the stored, weighted search vectors of articles and
+photographs up to date, and the GIN indexes on them. PostgreSQL only; on
+other databases search falls back to icontains lookups.
+'''
+
+from django.apps import apps
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from gallery.models import Keyword, Photograph
+from newsroom.settings import SEARCH_CONFIG
+
+# (column, weight) of the text making up each model's search vector
+ARTICLE_VECTOR_FIELDS = (
+    ("title", "A"),
+    ("subtitle", "B"),
+    ("cached_byline_no_links", "B"),
+    ("primary_image_caption", "C"),
+    ("body", "D"),
+)
+
+PHOTOGRAPH_VECTOR_FIELDS = (
+    ("alt", "A"),
+    ("suggested_caption", "B"),
+)
+
+VECTOR_COLUMN = "search_vector"
+
+
+def hasSearchVectors(connection):
+    return connection.vendor == "postgresql"
+
+
+def weighted(expression, weight, config=SEARCH_CONFIG):
+    return "setweight(to_tsvector('{0}', coalesce({1}, '')), '{2}')". \
+        format(config, expression, weight)
+
+
+def getArticleVectorSQL():
+    return " || ".join([weighted("NEW." + column, weight)
+                        for column, weight in ARTICLE_VECTOR_FIELDS])
+
+
+def getPhotographVectorSQL():
+    Photograph = apps.get_model("gallery", "Photograph")
+    through = Photograph.keywords.through
+    keyword_table = apps.get_model("gallery", "Keyword")._meta.db_table
+    keywords = "(SELECT string_agg(k.name, ' ') FROM {0} k " \
+        "JOIN {1} pk ON pk.keyword_id = k.id " \
+        "WHERE pk.photograph_id = NEW.id)". \
+        format(keyword_table, through._meta.db_table)
+    return " || ".join([weighted("NEW." + column, weight)
+                        for column, weight in PHOTOGRAPH_VECTOR_FIELDS] +
+                       [weighted(keywords, "A")])
+
+
+def getTriggers():
+    '''Returns (table, name, vector SQL, columns that trigger an update).
+    Photographs are updated on every save, because the keywords are in
+    another table.
+    '''
+    Article = apps.get_model("newsroom", "Article")
+    Photograph = apps.get_model("gallery", "Photograph")
+    return [
+        (Article._meta.db_table, "pgsearch_article_vector",
+         getArticleVectorSQL(),
+         [column for column, weight in ARTICLE_VECTOR_FIELDS]),
+        (Photograph._meta.db_table, "pgsearch_photograph_vector",
+         getPhotographVectorSQL(), []),
+    ]
+
+
+def installTriggers(connection):
+    if not hasSearchVectors(connection):
+        return
+    with connection.cursor() as cursor:
+        for table, name, vector, columns in getTriggers():
+            cursor.execute(
+                "CREATE OR REPLACE FUNCTION {0}() RETURNS trigger AS $$ "
+                "BEGIN NEW.{1} := {2}; RETURN NEW; END "
+                "$$ LANGUAGE plpgsql".format(name, VECTOR_COLUMN, vector))
+            cursor.execute("DROP TRIGGER IF EXISTS {0} ON {1}".
+                           format(name, table))
+            if columns:
+                update = "UPDATE OF " + ", ".join(columns)
+            else:
+                update = "UPDATE"
+            cursor.execute(
+                "CREATE TRIGGER {0} BEFORE INSERT OR {1} ON {2} "
+                "FOR EACH ROW EXECUTE PROCEDURE {0}()".
+                format(name, update, table))
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS {0}_idx ON {1} "
+                "USING gin({2})".format(name, table, VECTOR_COLUMN))
+
+
+def removeTriggers(connection):
+    if not hasSearchVectors(connection):
+        return
+    with connection.cursor() as cursor:
+        for table, name, vector, columns in getTriggers():
+            cursor.execute("DROP INDEX IF EXISTS {0}_idx".format(name))
+            cursor.execute("DROP TRIGGER IF EXISTS {0} ON {1}".
+                           format(name, table))
+            cursor.execute("DROP FUNCTION IF EXISTS {0}()".format(name))
+
+
+def rebuildVectors(connection, batch_size=1000):
+    '''Recomputes the stored vectors by touching every row, in batches.
+    Returns the number of rows.
+    '''
+    if not hasSearchVectors(connection):
+        return 0
+    num_rows = 0
+    with connection.cursor() as cursor:
+        for table, name, vector, columns in getTriggers():
+            column = columns[0] if columns else "id"
+            cursor.execute("SELECT id FROM {0} ORDER BY id".format(table))
+            ids = [row[0] for row in cursor.fetchall()]
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                cursor.execute(
+                    "UPDATE {0} SET {1} = {1} WHERE id BETWEEN %s AND %s".
+                    format(table, column), [batch[0], batch[-1]])
+            num_rows = num_rows + len(ids)
+    return num_rows
+
+
+# Signals
+
+@receiver(m2m_changed, sender=Photograph.keywords.through)
+def update_photograph_keywords(sender, instance, action, reverse, pk_set,
+                               using, **kwargs):
+    '''The photograph trigger looks up the keywords, so saving the rows
+    again updates their vectors.
+    '''
+    if not hasSearchVectors(connections[using]):
+        return
+    if not reverse:
+        if action in ["post_add", "post_remove", "post_clear"]:
+            Photograph.objects.filter(pk=instance.pk). \
+                update(search_vector=None)
+    elif action in ["post_add", "post_remove"]:
+        Photograph.objects.filter(pk__in=pk_set).update(search_vector=None)
+    elif action == "pre_clear":
+        # Remember which photographs had the keyword before it is cleared
+        instance._cleared_photograph_ids = list(
+            Photograph.objects.filter(keywords=instance).
+            values_list("pk", flat=True))
+    elif action == "post_clear":
+        Photograph.objects.filter(
+            pk__in=getattr(instance, "_cleared_photograph_ids", [])). \
+            update(search_vector=None)
+
+
+@receiver(post_save, sender=Keyword)
+def update_keyword_photographs(sender, instance, created, using, **kwargs):
+    if hasSearchVectors(connections[using]) and not created:
+        Photograph.objects.filter(keywords=instance). \
+            update(search_vector=None)
@@ -1,8 +1,13 @@
 from django.db.models import Q, F, ExpressionWrapper, Value
-from django.db.models import IntegerField, CharField, DateTimeField
-from django.db.models.functions import Concat
-from newsroom.models import Article, Author, Category, Topic
-from newsroom.settings import SEARCH_MAXLEN
+from django.db import connections
+from django.db.models import IntegerField, CharField, DateTimeField, \
+    FloatField
+from django.db.models.functions import Concat, Greatest, Lower, StrIndex, \
+    Substr
+from newsroom.models import Article, ArticleAuthor, Author, Category, Topic
+from newsroom.settings import SEARCH_CONFIG, SEARCH_MAXLEN, \
+    SEARCH_SNIPPET_CONTEXT, SEARCH_SNIPPET_LENGTH
+from pgsearch.triggers import hasSearchVectors
 from gallery.models import Photograph
 from django.utils import timezone
 
@@ -25,16 +30,50 @@ def parseSearchString(search_string):
     return search_strings
 
 
-def createSearchQuery(list_of_terms):
+def createSearchQuery(list_of_terms, config=None):
     if len(list_of_terms) > 0:
-        q = SearchQuery(list_of_terms[0])
+        q = SearchQuery(list_of_terms[0], config=config)
         for term in list_of_terms[1:]:
-            q = q & SearchQuery(term)
+            q = q & SearchQuery(term, config=config)
         return q
     else:
         return None
 
 
+def getSearchTerms(search_string):
+    return [term for term in
+            parseSearchString(search_string[:SEARCH_MAXLEN])
+            if term not in ignored_words]
+
+
+def searchVectors(queryset, search_string):
+    '''Filters on the stored search vector and annotates the rank. Returns
+    None if the database doesn't have stored search vectors.
+    '''
+    if not hasSearchVectors(connections[queryset.db]):
+        return None
+    search_query = createSearchQuery(getSearchTerms(search_string),
+                                     SEARCH_CONFIG)
+    if search_query is None:
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(search_vector=search_query). \
+        annotate(rank=SearchRank(F("search_vector"), search_query))
+
+
+def getSnippet(field_name, search_string):
+    '''Only SEARCH_SNIPPET_LENGTH characters of the field, starting a little
+    before the first search term, are fetched for the result list.
+    '''
+    terms = getSearchTerms(search_string or "")
+    if terms:
+        position = StrIndex(Lower(field_name), Value(terms[0].lower()))
+        start = Greatest(position - SEARCH_SNIPPET_CONTEXT, Value(1))
+    else:
+        start = Value(1)
+    return Substr(field_name, start, SEARCH_SNIPPET_LENGTH,
+                  output_field=CharField())
+
+
 def searchPostgresDB(search_string, Table, config, rank, *fields):
     list_of_terms = parseSearchString(search_string)
     search_query = createSearchQuery(list_of_terms)
@@ -55,27 +94,27 @@ def searchArticles(search_string=None,
                    from_date=None, to_date=None):
 
     query = Q()
-    if search_string:
-        list_of_terms = parseSearchString(search_string[:SEARCH_MAXLEN])
-        for term in list_of_terms:
-            if term not in ignored_words:
-                query = (query & (Q(title__icontains=term) |
-                         Q(subtitle__icontains=term) |
-                         Q(primary_image_caption__icontains=term) |
-                         Q(cached_byline_no_links__icontains=term) |
-                         Q(body__icontains=term)))
+    articles = Article.objects.published()
+    ranked = searchVectors(articles, search_string or "")
+    if ranked is not None:
+        articles = ranked
+    elif search_string:
+        for term in getSearchTerms(search_string):
+            query = (query & (Q(title__icontains=term) |
+                     Q(subtitle__icontains=term) |
+                     Q(primary_image_caption__icontains=term) |
+                     Q(cached_byline_no_links__icontains=term) |
+                     Q(body__icontains=term)))
 
     if author_pk:
         try:
             author = Author.objects.get(pk=author_pk)
+            article_authors = ArticleAuthor.objects.filter(author=author)
             if first_author is True:
-                query = query & Q(author_01=author)
+                article_authors = article_authors.filter(position=1)
             else:
-                query = query & (Q(author_01=author) |
-                                 Q(author_02=author) |
-                                 Q(author_03=author) |
-                                 Q(author_04=author) |
-                                 Q(author_05=author))
+                article_authors = article_authors.filter(position__gte=1)
+            query = query & Q(pk__in=article_authors.values("article"))
         except:
             pass
 
@@ -105,7 +144,10 @@ def searchArticles(search_string=None,
         except:
             pass
 
-    articles = Article.objects.published().filter(query).order_by("-published").distinct()
+    if ranked is None:
+        articles = articles.annotate(rank=Value(0.0,
+                                                output_field=FloatField()))
+    articles = articles.filter(query).order_by("-rank", "-published").distinct()
 
     return articles
 
@@ -114,15 +156,16 @@ def searchPhotos(search_string=None,
                  author_pk=None,
                  from_date=None, to_date=None):
     query = Q()
-
-    if search_string:
-        list_of_terms = parseSearchString(search_string[:SEARCH_MAXLEN])
-        for term in list_of_terms:
-            if term not in ignored_words:
-                query = (query & \
-                        (Q(suggested_caption__icontains=term) |
-                         Q(alt__icontains=term) |
-                         Q(keywords__name=term)))
+    photos = Photograph.objects.all()
+    ranked = searchVectors(photos, search_string or "")
+    if ranked is not None:
+        photos = ranked
+    elif search_string:
+        for term in getSearchTerms(search_string):
+            query = (query & \
+                    (Q(suggested_caption__icontains=term) |
+                     Q(alt__icontains=term) |
+                     Q(keywords__name=term)))
 
     if author_pk:
         try:
@@ -145,7 +188,9 @@ def searchPhotos(search_string=None,
             pass
 
 
-    photos = Photograph.objects.filter(query).order_by("-date_taken").distinct()
+    if ranked is None:
+        photos = photos.annotate(rank=Value(0.0, output_field=FloatField()))
+    photos = photos.filter(query).order_by("-rank", "-date_taken").distinct()
 
     return photos
 
@@ -163,10 +208,11 @@ def searchArticlesAndPhotos(search_string=None,
                                   from_date, to_date). \
                                   annotate(obj_type=Value(0,
                                                           output_field=IntegerField()),
-                                           fullname=F("cached_byline_no_links")). \
+                                           fullname=F("cached_byline_no_links"),
+                                           snippet=getSnippet("body", search_string)). \
                                   values("pk", "title", "subtitle", "cached_summary_image",
-                                         "obj_type", "slug", "body",
-                                         "fullname",  "published")
+                                         "obj_type", "slug", "snippet",
+                                         "fullname",  "published", "rank")
 
     if inc_photos:
         photos = searchPhotos(search_string, author_pk,
@@ -176,13 +222,14 @@ def searchArticlesAndPhotos(search_string=None,
                                        fullname=Concat("photographer__first_names" ,
                                                        Value(" "),
                                                        "photographer__last_name",
-                                                       output_field=CharField())). \
+                                                       output_field=CharField()),
+                                       snippet=Value("", output_field=CharField())). \
                               values("pk", "alt", "suggested_caption", "image",
-                                     "obj_type", "alt", "alt",
-                                     "fullname", "date_taken")
+                                     "obj_type", "alt", "snippet",
+                                     "fullname", "date_taken", "rank")
 
     if inc_articles and inc_photos:
-        result = articles.union(photos).order_by('-published')
+        result = articles.union(photos).order_by('-rank', '-published')
     elif inc_articles:
         result = articles
     elif inc_photos:
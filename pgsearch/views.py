@@ -0,0 +1,22 @@
+from grappelli.views.related import AutocompleteLookup as \
+    GrappelliAutocompleteLookup
+
+from . import autocomplete
+
+
+class AutocompleteLookup(GrappelliAutocompleteLookup):
+    '''Grappelli's autocomplete lookup, with the models that have indexes
+    searched through pgsearch.autocomplete instead of icontains on every
+    autocomplete_search_fields field.
+    '''
+
+    def get_searched_queryset(self, qs):
+        if self.model._meta.label_lower not in \
+                autocomplete.AUTOCOMPLETE_FIELDS:
+            return super().get_searched_queryset(qs)
+        term = self.GET["term"]
+        try:
+            term = self.model.autocomplete_term_adjust(term)
+        except AttributeError:
+            pass
+        return qs.filter(pk__in=autocomplete.searchIds(qs, term))